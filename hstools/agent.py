@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+
+"""
+A long-lived background process that runs hs commands on behalf of the hs
+script. The agent keeps the hstools modules imported and holds an
+authenticated HydroShare session with open connections, so a forwarded
+command only pays for one local IPC call plus its remote requests.
+
+Commands are received over a Unix socket that is accessible only to the
+user that started the agent. This module is imported by the hs script
+before anything else, so it must stay free of heavy imports.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import struct
+import threading
+
+from . import cache
+
+# commands that are always executed locally, e.g. because they prompt
+# for input, manage the agent itself, or measure local startup time
+LOCAL_COMMANDS = ('agent', 'init', '--importtime')
+
+
+def socket_path():
+    """Gets the path of the agent socket. This can be changed using the
+    HS_AGENT_SOCKET environment variable.
+
+    returns:
+    -- path to the unix socket
+    """
+
+    default = os.path.join(cache.cache_dir(), f'agent-{os.getuid()}.sock')
+    return os.path.expanduser(os.environ.get('HS_AGENT_SOCKET', default))
+
+
+def _connect(path=None):
+    path = path or socket_path()
+    if not os.path.exists(path):
+        return None
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(path)
+    except OSError:
+        s.close()
+        return None
+    return s
+
+
+def _send(s, msg):
+    s.sendall((json.dumps(msg) + '\n').encode())
+
+
+def request(msg, path=None):
+    """Sends a control message to the agent.
+
+    args:
+    -- msg: message, e.g. {'cmd': 'status'} (dict)
+    -- path: path to the agent socket (str, default=>socket_path())
+
+    returns:
+    -- the agent reply (dict), or None if the agent is not running
+    """
+
+    s = _connect(path)
+    if s is None:
+        return None
+    with s, s.makefile('r') as f:
+        _send(s, msg)
+        line = f.readline()
+    return json.loads(line) if line else None
+
+
+def should_forward(argv):
+    """Determines if a command can be forwarded to the agent.
+
+    args:
+    -- argv: command line arguments (list)
+
+    returns:
+    -- True if the command can be forwarded
+    """
+
+    if os.environ.get('HS_NO_AGENT') or len(argv) == 0:
+        return False
+    if argv[0] in LOCAL_COMMANDS:
+        return False
+    # the agent cannot read this process' stdin
+    if '-' in argv:
+        return False
+    return True
+
+
+def forward(argv):
+    """Runs a command in the agent and relays its output.
+
+    args:
+    -- argv: command line arguments (list)
+
+    returns:
+    -- exit code of the command, or None if the agent is not running
+    """
+
+    s = _connect()
+    if s is None:
+        return None
+
+    with s, s.makefile('r') as f:
+        _send(s, {'argv': argv,
+                  'cwd': os.getcwd(),
+                  'env': dict(os.environ)})
+        for line in f:
+            msg = json.loads(line)
+            if 'out' in msg:
+                sys.stdout.write(msg['out'])
+                sys.stdout.flush()
+            elif 'err' in msg:
+                sys.stderr.write(msg['err'])
+                sys.stderr.flush()
+            elif 'exit' in msg:
+                return msg['exit']
+
+    sys.stderr.write('hs agent closed the connection unexpectedly\n')
+    return 1
+
+
+class _Output(object):
+    """
+    file-like object that relays writes to the agent client
+    """
+
+    def __init__(self, sock, stream):
+        self.sock = sock
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def write(self, data):
+        if data:
+            with self.lock:
+                _send(self.sock, {self.stream: data})
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class Agent(object):
+    def __init__(self, path=None, idle_timeout=3600):
+
+        """
+        path is the unix socket to listen on, idle_timeout is the number
+        of seconds without requests after which the agent exits (0 to
+        run until stopped).
+        """
+
+        self.path = path or socket_path()
+        self.idle_timeout = idle_timeout
+        self.last_request = time.time()
+        self.started = time.time()
+        self.commands = 0
+        self.running = False
+
+        # commands change the working directory, environment and standard
+        # streams of the process, so only one runs at a time
+        self.lock = threading.Lock()
+
+    def _warm_up(self):
+        """
+        imports the command modules and opens an authenticated session
+        """
+
+        from . import cli, hydroshare
+
+        cli.build_parser([])
+        hydroshare.share_clients()
+        try:
+            hydroshare.hydroshare()
+        except Exception:
+            # authentication is retried by the first command
+            pass
+
+    def _authorized(self, conn):
+        if not hasattr(socket, 'SO_PEERCRED'):
+            return True
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                                struct.calcsize('3i'))
+        pid, uid, gid = struct.unpack('3i', creds)
+        return uid == os.getuid()
+
+    def _run(self, conn, msg):
+        from . import cli, log
+
+        out = _Output(conn, 'out')
+        err = _Output(conn, 'err')
+        code = 0
+
+        with self.lock:
+            cwd = os.getcwd()
+            env = dict(os.environ)
+            streams = sys.stdout, sys.stderr
+            try:
+                os.chdir(msg.get('cwd', cwd))
+                os.environ.clear()
+                os.environ.update(msg.get('env', env))
+                sys.stdout, sys.stderr = out, err
+                log.handler.setStream(out)
+                log.set_verbose()
+                cli.main(msg['argv'])
+            except SystemExit as e:
+                if isinstance(e.code, int):
+                    code = e.code
+                elif e.code is not None:
+                    err.write(f'{e.code}\n')
+                    code = 1
+            except Exception as e:
+                err.write(f'{e}\n')
+                code = 1
+            finally:
+                sys.stdout, sys.stderr = streams
+                log.handler.setStream(sys.stdout)
+                os.environ.clear()
+                os.environ.update(env)
+                os.chdir(cwd)
+                self.commands += 1
+
+        _send(conn, {'exit': code})
+
+    def _handle(self, conn):
+        with conn, conn.makefile('r') as f:
+            if not self._authorized(conn):
+                return
+            line = f.readline()
+            if not line:
+                return
+            msg = json.loads(line)
+            self.last_request = time.time()
+
+            cmd = msg.get('cmd')
+            if cmd == 'status':
+                _send(conn, {'pid': os.getpid(),
+                             'socket': self.path,
+                             'uptime': time.time() - self.started,
+                             'commands': self.commands})
+            elif cmd == 'stop':
+                _send(conn, {'stopping': True})
+                self.running = False
+            elif 'argv' in msg:
+                self._run(conn, msg)
+
+    def serve(self):
+        """Listens for commands until stopped or idle for too long.
+        """
+
+        if _connect(self.path) is not None:
+            raise Exception(f'hs agent is already running at {self.path}')
+        if os.path.exists(self.path):
+            # left behind by an agent that did not exit cleanly
+            os.remove(self.path)
+
+        self._warm_up()
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        server.listen(16)
+        server.settimeout(1)
+
+        self.running = True
+        try:
+            while self.running:
+                if self.idle_timeout > 0 and \
+                        time.time() - self.last_request > self.idle_timeout:
+                    break
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(None)
+                threading.Thread(target=self._handle, args=(conn,),
+                                 daemon=True).start()
+        finally:
+            server.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+if __name__ == '__main__':
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run the hs agent')
+    parser.add_argument('--socket', default=None,
+                        help='path of the unix socket to listen on')
+    parser.add_argument('--idle-timeout', default=3600, type=int,
+                        help='seconds without requests before the agent '
+                             'exits, 0 to run until stopped')
+    args = parser.parse_args()
+
+    Agent(args.socket, args.idle_timeout).serve()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+"""
+Asyncio interface to HydroShare. The coroutines of the hydroshare class
+below mirror the methods of hstools.hydroshare.hydroshare, so many
+requests can be started from one event loop, e.g. in a notebook or an
+async service.
+
+Requests use the authenticated session of a hstools.hydroshare.hydroshare
+instance and run on the workers of the shared scheduler. The event loop is
+never blocked: coroutines wait for the scheduler's futures. The number of
+requests and transfers in flight is bounded by semaphores, so any number
+of coroutines can be started at once. Listings and file contents are
+streamed through async generators that only buffer a few items, and
+cancelling a coroutine stops its transfer at the next chunk.
+"""
+
+import asyncio
+import threading
+import concurrent.futures
+
+from . import download
+from . import scheduler
+
+# marks the end of a stream
+_DONE = object()
+
+
+class _Stream(object):
+    """
+    Runs a blocking iterator on the scheduler and hands its items to an
+    event loop, holding at most size items that were not consumed yet.
+    The iterator is started when the first item is requested.
+    """
+
+    def __init__(self, make, args, kwargs, size):
+        self.make = make
+        self.args = args
+        self.kwargs = kwargs
+        self.size = size
+        self.loop = None
+        self.queue = None
+        self.stopped = threading.Event()
+
+    def _put(self, item):
+        # blocks the producer until the consumer made room, or stopped
+        try:
+            future = asyncio.run_coroutine_threadsafe(self.queue.put(item),
+                                                      self.loop)
+        except RuntimeError:
+            # the event loop was closed
+            return False
+        while True:
+            try:
+                future.result(timeout=.1)
+                return True
+            except concurrent.futures.TimeoutError:
+                if self.stopped.is_set() or self.loop.is_closed():
+                    future.cancel()
+                    return False
+
+    def _produce(self):
+        it = None
+        try:
+            it = self.make(*self.args, **self.kwargs)
+            for item in it:
+                if self.stopped.is_set() or not self._put((item, None)):
+                    return
+            self._put((_DONE, None))
+        except Exception as e:
+            if not self.stopped.is_set():
+                self._put((_DONE, e))
+        finally:
+            # closing the generator closes its connections
+            if hasattr(it, 'close'):
+                it.close()
+
+    async def items(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.size)
+        scheduler.shared().submit(self._produce, kind=scheduler.STREAM)
+        try:
+            while True:
+                item, err = await self.queue.get()
+                if err is not None:
+                    raise err
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            self.stopped.set()
+
+
+class hydroshare():
+    def __init__(self, hs, max_requests=16, max_transfers=8, buffer=2):
+
+        """
+        hs is an authenticated hstools.hydroshare.hydroshare instance, see
+        connect. max_requests and max_transfers bound the number of
+        metadata requests and file transfers that are in flight at once,
+        and buffer is the number of items a stream fetches ahead of its
+        consumer.
+        """
+
+        self.hs = hs
+        self.max_requests = max_requests
+        self.max_transfers = max_transfers
+        self.buffer = buffer
+        self._semaphores = {}
+
+        # the scheduler must be able to run as many tasks as the
+        # semaphores let through. Requests are GENERAL tasks because some
+        # of them wait for METADATA tasks themselves. The caps are
+        # restored by close
+        scheduler.shared().reserve(scheduler.GENERAL, max_requests)
+        scheduler.shared().reserve(scheduler.TRANSFER, max_transfers)
+        self._reserved = True
+
+    @classmethod
+    async def connect(cls, save_dir=None, authfile='~/.hs_auth',
+                      cache=True, **kwargs):
+        """Authorizes with HydroShare without blocking the event loop.
+
+        args:
+        -- save_dir: location of downloaded resources (str, default=>None)
+        -- authfile: path to the hstools auth file (str)
+        -- cache: reuse a recently validated session (bool, default=>True)
+        -- kwargs: arguments of the hydroshare class
+
+        returns:
+        -- hydroshare
+        """
+
+        from .hydroshare import hydroshare as sync_hydroshare
+        hs = await cls._wait(scheduler.shared().submit(
+                sync_hydroshare, (save_dir, authfile, cache)))
+        return cls(hs, **kwargs)
+
+    async def close(self):
+        """
+        closes the connection to HydroShare
+        """
+        try:
+            await self._call(scheduler.GENERAL, self.hs.close)
+        finally:
+            if self._reserved:
+                self._reserved = False
+                scheduler.shared().release(scheduler.GENERAL,
+                                           self.max_requests)
+                scheduler.shared().release(scheduler.TRANSFER,
+                                           self.max_transfers)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _semaphore(self, kind):
+        # created on first use, so the semaphores belong to the running
+        # event loop
+        if kind not in self._semaphores:
+            n = self.max_transfers if kind == scheduler.TRANSFER \
+                else self.max_requests
+            self._semaphores[kind] = asyncio.Semaphore(n)
+        return self._semaphores[kind]
+
+    @staticmethod
+    async def _wait(future):
+        # cancelling the coroutine cancels the task if it has not started
+        return await asyncio.wrap_future(future)
+
+    async def _call(self, kind, fn, *args, **kwargs):
+        async with self._semaphore(kind):
+            return await self._wait(scheduler.shared().submit(
+                    fn, args, kwargs, kind=kind))
+
+    async def _transfer(self, fn, *args, **kwargs):
+        # a running transfer checks the event between chunks, it is set
+        # when the coroutine is cancelled
+        cancel = threading.Event()
+        try:
+            return await self._call(scheduler.TRANSFER, fn, *args,
+                                    cancel=cancel, **kwargs)
+        finally:
+            cancel.set()
+
+    def _stream(self, make, *args, **kwargs):
+        return _Stream(make, args, kwargs, self.buffer).items()
+
+    def userInfo(self):
+        return self.hs.userInfo()
+
+    async def getResourceMetadata(self, resid, cached=False):
+        """Gets the system and science metadata of a resource, see
+        hstools.hydroshare.hydroshare.getResourceMetadata.
+
+        args:
+        -- resid: hydroshare resource id (str)
+        -- cached: use previously fetched metadata (bool, default=>False)
+
+        returns:
+        -- resource metadata object
+        """
+
+        return await self._call(scheduler.GENERAL,
+                                self.hs.getResourceMetadata, resid, cached)
+
+    async def getResourceFiles(self, resid, cached=False):
+        """Gets the files of a resource.
+
+        args:
+        -- resid: hydroshare resource id (str)
+        -- cached: use a previously fetched listing (bool, default=>False)
+
+        returns:
+        -- list of file dicts
+        """
+
+        return await self._call(scheduler.GENERAL,
+                                self.hs.getResourceFiles, resid, cached)
+
+    def iterResourceFiles(self, resid):
+        """Iterates over the files of a resource, following every page of
+        the file listing.
+
+        args:
+        -- resid: hydroshare resource id (str)
+
+        returns:
+        -- async generator of file dicts
+        """
+
+        return self._stream(self.hs.iterResourceFiles, resid)
+
+    def iterResources(self, filters={}, count=None):
+        """Iterates over the resources that match filters, see
+        hstools.hydroshare.hydroshare.iterResources.
+
+        args:
+        -- filters: hydroshare search filters (dict, default=>{})
+        -- count: maximum number of resources (int, default=>all)
+
+        returns:
+        -- async generator of resource dicts
+        """
+
+        return self._stream(self.hs.iterResources, filters, count)
+
+    def iterResourceFile(self, resid, name, chunk_size=download.CHUNK_SIZE):
+        """Streams the content of a resource file without saving it.
+
+        args:
+        -- resid: hydroshare resource id (str)
+        -- name: path of the file relative to the resource contents (str)
+        -- chunk_size: number of bytes per chunk
+                       (int, default=>download.CHUNK_SIZE)
+
+        returns:
+        -- async generator of bytes
+        """
+
+        return self._stream(download.iter_file, self.hs.hs, resid, name,
+                            chunk_size)
+
+    async def getResource(self, resourceid, stream=False, members=None,
+                          verify=False):
+        """Downloads the content of a resource, see
+        hstools.hydroshare.hydroshare.getResource. Cancelling the
+        coroutine stops the download, a download that is not streamed
+        resumes where it stopped on the next call.
+
+        returns:
+        -- path to the downloaded resource, or None if the download failed
+        """
+
+        return await self._transfer(self.hs.getResource, resourceid,
+                                    stream, members, verify)
+
+    async def getResources(self, resourceids, stream=False, members=None,
+                           verify=False):
+        """Downloads the content of many resources concurrently.
+
+        args:
+        -- resourceids: ids of the hydroshare resources (list)
+        -- stream: extract bags while they download (bool, default=>False)
+        -- members: glob patterns of bag members to extract
+                    (list, default=>all)
+        -- verify: check the extracted files against the bag manifests
+                   (bool, default=>False)
+
+        returns:
+        -- async generator of (resourceid, path, error) tuples, yielded as
+           each download finishes. Downloads that did not finish are
+           cancelled if the caller stops iterating early.
+        """
+
+        async def get(resid):
+            try:
+                path = await self._transfer(self.hs._downloadResource,
+                                            resid, stream, members, verify)
+                return resid, path, None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                return resid, None, e
+
+        tasks = [asyncio.ensure_future(get(resid))
+                 for resid in dict.fromkeys(resourceids)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def addContentToExistingResource(self, resid, source, target=None):
+        """Adds a file to an existing resource. Cancelling the coroutine
+        aborts the upload.
+
+        args:
+        -- resid: id of an existing hydroshare resource (str)
+        -- source: file path to be added to resource
+        -- target: target path relative to the root directory of the resource
+
+        returns:
+        -- resid
+        """
+
+        return await self._transfer(self.hs.addContentToExistingResource,
+                                    resid, source, target)
+
+    async def addFilesToExistingResource(self, resid, files):
+        """Uploads files to an existing resource concurrently.
+
+        args:
+        -- resid: id of an existing hydroshare resource (str)
+        -- files: (source path, target path) pairs (list)
+
+        returns:
+        -- async generator of (source, target, error) tuples, yielded as
+           each upload finishes
+        """
+
+        async def add(source, target):
+            try:
+                await self.addContentToExistingResource(resid, source,
+                                                        target)
+                return source, target, None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                return source, target, e
+
+        tasks = [asyncio.ensure_future(add(s, t)) for s, t in files]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def deleteResource(self, resid):
+        """Deletes a hydroshare resource.
+
+        args:
+        -- resid: hydroshare resource id (str)
+        """
+
+        return await self._call(scheduler.GENERAL, self.hs.deleteResource,
+                                resid)
@@ -2,10 +2,45 @@
 
 import os
 import json
+import time
 import base64
 import pickle
+import hashlib
 import hs_restclient
 
+from . import cache
+
+# number of seconds a validated session is reused before it is checked
+# with HydroShare again. Set HS_AUTH_CACHE_TTL=0 to disable the cache.
+AUTH_CACHE_TTL = int(os.environ.get('HS_AUTH_CACHE_TTL', 900))
+
+
+def _basic_client(authfile):
+    """
+    creates an hs_restclient instance from a basic auth file without
+    validating the credentials
+    """
+
+    with open(authfile, 'r') as f:
+        txt = f.read()
+        d = base64.b64decode(txt)
+        creds = json.loads(d.decode())
+        a = hs_restclient.HydroShareAuthBasic(username=creds['usr'],
+                                              password=creds['pwd'])
+        return hs_restclient.HydroShare(auth=a)
+
+
+def _oauth2_client(authfile, token=None):
+    """
+    creates an hs_restclient instance from an OAuth2 auth file without
+    validating the token
+    """
+
+    with open(authfile, 'rb') as f:
+        file_token, cid = pickle.load(f)
+    a = hs_restclient.HydroShareAuthOAuth2(cid, '', token=token or file_token)
+    return hs_restclient.HydroShare(auth=a)
+
 
 def basic_authorization(authfile='~/.hs_auth_basic'):
     """
@@ -28,15 +63,9 @@ def basic_authorization(authfile='~/.hs_auth_basic'):
                         f'[.hs_auth] at {authfile}')
 
     try:
-        with open(authfile, 'r') as f:
-            txt = f.read()
-            d = base64.b64decode(txt)
-            creds = json.loads(d.decode())
-            a = hs_restclient.HydroShareAuthBasic(username=creds['usr'],
-                                                  password=creds['pwd'])
-            hs = hs_restclient.HydroShare(auth=a)
-            hs.getUserInfo()
-            return hs
+        hs = _basic_client(authfile)
+        hs.getUserInfo()
+        return hs
     except Exception as e:
         raise Exception(e)
 
@@ -60,14 +89,108 @@ def oauth2_authorization(authfile='~/.hs_auth'):
                         f'[.hs_auth] at {authfile}')
 
     try:
-        with open(authfile, 'rb') as f:
-            token, cid = pickle.load(f)
-            a = hs_restclient.HydroShareAuthOAuth2(cid, '', token=token)
-            hs = hs_restclient.HydroShare(auth=a)
-            hs.getUserInfo()
-            return hs
+        hs = _oauth2_client(authfile)
+        hs.getUserInfo()
+        return hs
     except Exception as e:
         raise Exception(e)
 
     # authorization failed
     return None
+
+
+def authorize(authfile='~/.hs_auth'):
+    """
+    performs HS authorization by trying OAuth2 and then basic credentials
+    stored in authfile. Each attempt validates the credentials by
+    requesting the user info, which is returned so that it does not need
+    to be requested again.
+
+    Returns (auth mode, hs_restclient instance, user info)
+    """
+
+    authfile = os.path.expanduser(authfile)
+    if not os.path.exists(authfile):
+        raise Exception(f'Could not find authentication file '
+                        f'[.hs_auth] at {authfile}')
+
+    for mode, client in (('oauth2', _oauth2_client),
+                         ('basic', _basic_client)):
+        try:
+            hs = client(authfile)
+            return mode, hs, hs.getUserInfo()
+        except Exception:
+            pass
+
+    raise Exception(f'Authentication failed using: {authfile}')
+
+
+def _cache_file(authfile):
+    key = hashlib.sha1(os.path.abspath(authfile).encode()).hexdigest()
+    return cache.cache_path(f'auth-{key}.json')
+
+
+def load_cached_authorization(authfile='~/.hs_auth', ttl=None):
+    """
+    restores a session that was validated within the last ttl seconds,
+    without contacting HydroShare. The cache is keyed by the auth file and
+    is invalidated when the auth file changes.
+
+    Returns (hs_restclient instance, user info) or None
+    """
+
+    ttl = AUTH_CACHE_TTL if ttl is None else ttl
+    authfile = os.path.expanduser(authfile)
+    if ttl <= 0 or not os.path.exists(authfile):
+        return None
+
+    dat = cache.read_json(_cache_file(authfile))
+    if dat is None:
+        return None
+    if dat.get('authfile_mtime') != os.stat(authfile).st_mtime or \
+            time.time() - dat.get('created', 0) > ttl:
+        return None
+
+    try:
+        if dat['mode'] == 'oauth2':
+            hs = _oauth2_client(authfile, token=dat['token'])
+        else:
+            hs = _basic_client(authfile)
+    except Exception:
+        return None
+
+    return hs, dat['user_info']
+
+
+def save_cached_authorization(authfile, mode, hs, user_info):
+    """
+    caches a validated session so that subsequent hs invocations can skip
+    authorization. The cache file is readable only by its owner.
+    """
+
+    authfile = os.path.expanduser(authfile)
+    if AUTH_CACHE_TTL <= 0:
+        return
+
+    token = None
+    if mode == 'oauth2':
+        token = hs.auth.token
+
+    try:
+        cache.write_json(_cache_file(authfile),
+                         {'mode': mode,
+                          'token': token,
+                          'user_info': user_info,
+                          'authfile_mtime': os.stat(authfile).st_mtime,
+                          'created': time.time()})
+    except Exception:
+        # caching is an optimization, never fail because of it
+        pass
+
+
+def clear_cached_authorization(authfile='~/.hs_auth'):
+    """
+    removes the cached session for authfile
+    """
+
+    cache.remove(_cache_file(os.path.expanduser(authfile)))
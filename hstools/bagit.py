@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+"""
+Minimal support for reading and rewriting the metadata of the BagIt bags
+that HydroShare resources are downloaded as. Only the parts needed to verify
+a local bag, and to keep it valid after its payload changed, are
+implemented: payload and tag manifests, and the Payload-Oxum and
+Bagging-Date fields of bag-info.txt.
+"""
+
+import os
+import glob
+import time
+import datetime
+
+from . import checksum
+from . import inventory
+
+
+def manifest_path(bagdir, algorithm='md5', tag=False):
+    name = 'tagmanifest' if tag else 'manifest'
+    return os.path.join(bagdir, f'{name}-{algorithm}.txt')
+
+
+def manifest_algorithms(bagdir, tag=False):
+    """Gets the checksum algorithms of the manifests in a bag.
+
+    args:
+    -- bagdir: path to the bag (str)
+    -- tag: look for tag manifests instead of payload manifests (bool)
+
+    returns:
+    -- list of algorithm names, e.g. ['md5']
+    """
+
+    prefix = 'tagmanifest-' if tag else 'manifest-'
+    paths = glob.glob(os.path.join(glob.escape(bagdir), f'{prefix}*.txt'))
+    return sorted(os.path.basename(p)[len(prefix):-len('.txt')]
+                  for p in paths)
+
+
+def read_manifest(path):
+    """Reads a manifest file.
+
+    args:
+    -- path: path to the manifest (str)
+
+    returns:
+    -- {path relative to the bag: hex digest}
+    """
+
+    entries = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line.strip() == '':
+                continue
+            digest, rel = line.split(None, 1)
+            entries[rel.strip()] = digest.lower()
+    return entries
+
+
+def write_manifest(path, entries):
+    """Writes a manifest file, replacing it atomically.
+
+    args:
+    -- path: path to the manifest (str)
+    -- entries: {path relative to the bag: hex digest} (dict)
+    """
+
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for rel in sorted(entries):
+            f.write(f'{entries[rel]}  {rel}\n')
+    os.replace(tmp, path)
+
+
+def update_manifests(bagdir, changed=(), removed=(), jobs=None):
+    """Updates the payload manifests of a bag after files were changed,
+    added or removed. Only the changed files are hashed.
+
+    args:
+    -- bagdir: path to the bag (str)
+    -- changed: paths relative to the bag of new or changed files (list)
+    -- removed: paths relative to the bag of removed files (list)
+    -- jobs: number of hashing processes (int, default=>number of cpus)
+
+    returns:
+    -- entries of the first payload manifest
+    """
+
+    algorithms = manifest_algorithms(bagdir) or ['md5']
+    changed = list(changed)
+    result = None
+    for algorithm in algorithms:
+        path = manifest_path(bagdir, algorithm)
+        entries = read_manifest(path) if os.path.exists(path) else {}
+        for rel in removed:
+            entries.pop(rel, None)
+
+        paths = [os.path.join(bagdir, rel) for rel in changed]
+        for rel, (p, digest, err) in zip(changed, checksum.digest_files(
+                paths, algorithm, jobs)):
+            if err is not None:
+                raise err
+            entries[rel] = digest
+
+        write_manifest(path, entries)
+        if result is None:
+            result = entries
+    return result
+
+
+def update_bag_info(bagdir, entries):
+    """Updates the Payload-Oxum and Bagging-Date fields of bag-info.txt,
+    keeping all other fields.
+
+    args:
+    -- bagdir: path to the bag (str)
+    -- entries: payload manifest entries (dict)
+    """
+
+    nbytes = sum(os.path.getsize(os.path.join(bagdir, rel))
+                 for rel in entries)
+    fields = {'Payload-Oxum': f'{nbytes}.{len(entries)}',
+              'Bagging-Date': datetime.date.today().isoformat()}
+
+    path = os.path.join(bagdir, 'bag-info.txt')
+    lines = []
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+    out = []
+    for line in lines:
+        key = line.split(':', 1)[0].strip()
+        if key in fields and not line[:1].isspace():
+            out.append(f'{key}: {fields.pop(key)}')
+        else:
+            out.append(line)
+    for key, value in fields.items():
+        out.append(f'{key}: {value}')
+
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(out) + '\n')
+    os.replace(tmp, path)
+
+
+def update_tag_manifests(bagdir):
+    """Recomputes the tag manifests of a bag. This must be called after
+    the payload manifests and bag-info.txt were updated.
+
+    args:
+    -- bagdir: path to the bag (str)
+    """
+
+    for algorithm in manifest_algorithms(bagdir, tag=True):
+        path = manifest_path(bagdir, algorithm, tag=True)
+        entries = read_manifest(path)
+
+        # the payload manifests and bag-info.txt are always tag files
+        for name in ['bag-info.txt'] + \
+                [os.path.basename(manifest_path(bagdir, a))
+                 for a in manifest_algorithms(bagdir)]:
+            if os.path.exists(os.path.join(bagdir, name)):
+                entries.setdefault(name, None)
+
+        for rel in list(entries):
+            p = os.path.join(bagdir, rel)
+            if os.path.exists(p):
+                entries[rel] = checksum.file_digest(p, algorithm)
+            else:
+                entries.pop(rel)
+        write_manifest(path, entries)
+
+
+def verify_bag(bagdir, jobs=None, missing_ok=False):
+    """Verifies that the files of a bag match the checksums in its payload
+    and tag manifests. Files are hashed in parallel processes.
+
+    args:
+    -- bagdir: path to the bag (str)
+    -- jobs: number of hashing processes (int, default=>number of cpus)
+    -- missing_ok: do not report files that are missing, e.g. in a
+                   partially extracted bag (bool, default=>False)
+
+    returns:
+    -- report (dict) with the keys bag, valid, files, bytes, elapsed and
+       errors. Each error is a dict with the keys path, error and, for
+       checksum mismatches, algorithm, expected and actual.
+    """
+
+    st = time.time()
+    errors = []
+    checked = 0
+    nbytes = 0
+
+    manifests = [(a, False) for a in manifest_algorithms(bagdir)] + \
+                [(a, True) for a in manifest_algorithms(bagdir, tag=True)]
+    if len(manifests) == 0:
+        errors.append({'path': bagdir, 'error': 'no manifest found'})
+
+    listed = set()
+    for algorithm, tag in manifests:
+        mpath = manifest_path(bagdir, algorithm, tag)
+        try:
+            entries = read_manifest(mpath)
+        except Exception as e:
+            errors.append({'path': os.path.basename(mpath),
+                           'error': f'unreadable manifest: {e}'})
+            continue
+
+        rels = []
+        for rel in entries:
+            if not tag:
+                listed.add(rel)
+            if os.path.isfile(os.path.join(bagdir, rel)):
+                rels.append(rel)
+            elif not missing_ok:
+                errors.append({'path': rel, 'error': 'missing'})
+
+        paths = [os.path.join(bagdir, rel) for rel in rels]
+        for rel, (p, digest, err) in zip(rels, checksum.digest_files(
+                paths, algorithm, jobs)):
+            checked += 1
+            if err is not None:
+                errors.append({'path': rel, 'error': f'unreadable: {err}'})
+                continue
+            nbytes += os.path.getsize(p)
+            if digest != entries[rel]:
+                errors.append({'path': rel,
+                               'error': 'checksum mismatch',
+                               'algorithm': algorithm,
+                               'expected': entries[rel],
+                               'actual': digest})
+
+    # every payload file must be listed in the payload manifests
+    if any(not tag for _, tag in manifests):
+        for rel, f in inventory.iter_files(os.path.join(bagdir, 'data')):
+            rel = f'data/{rel}'
+            if rel not in listed:
+                errors.append({'path': rel,
+                               'error': 'not listed in manifest'})
+
+    return {'bag': os.path.abspath(bagdir),
+            'valid': len(errors) == 0,
+            'files': checked,
+            'bytes': nbytes,
+            'elapsed': round(time.time() - st, 3),
+            'errors': errors}
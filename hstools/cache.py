@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+"""
+Local cache directory for data that is reused across hs invocations. The
+location defaults to ~/.cache/hstools and can be changed using the
+HS_CACHE_DIR environment variable.
+"""
+
+import os
+import json
+
+
+def cache_dir():
+    """Gets the hstools cache directory, creating it if necessary.
+
+    returns:
+    -- path to the cache directory
+    """
+
+    default = os.path.join(os.environ.get('XDG_CACHE_HOME', '~/.cache'),
+                           'hstools')
+    path = os.path.expanduser(os.environ.get('HS_CACHE_DIR', default))
+    if not os.path.exists(path):
+        os.makedirs(path, mode=0o700)
+    return path
+
+
+def cache_path(name):
+    """Gets the path of a file in the cache directory.
+
+    args:
+    -- name: name of the cache file (str)
+
+    returns:
+    -- path to the cache file
+    """
+
+    return os.path.join(cache_dir(), name)
+
+
+def read_json(path):
+    """Reads a json cache file.
+
+    args:
+    -- path: path to the cache file (str)
+
+    returns:
+    -- the cached data, or None if it cannot be read
+    """
+
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def write_json(path, data):
+    """Writes a json cache file that is readable only by its owner. The
+    file is replaced atomically so concurrent readers never see partial
+    data.
+
+    args:
+    -- path: path to the cache file (str)
+    -- data: json serializable data
+    """
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def remove(path):
+    """Removes a cache file if it exists.
+
+    args:
+    -- path: path to the cache file (str)
+    """
+
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
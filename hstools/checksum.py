@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+"""
+File checksums computed in parallel worker processes of the shared
+scheduler, so hashing many or large files is not limited to a single core.
+"""
+
+import os
+import mmap
+import hashlib
+
+from . import scheduler
+
+# number of bytes hashed at a time
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# files at least this large are memory mapped instead of read into a
+# buffer, which avoids copying their data
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+
+def file_digest(path, algorithm='md5'):
+    """Computes the checksum of a file, reading it in chunks.
+
+    args:
+    -- path: path to the file (str)
+    -- algorithm: hashlib algorithm name (str, default=>md5)
+
+    returns:
+    -- hex digest (str)
+    """
+
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                view = memoryview(m)
+                try:
+                    for i in range(0, size, CHUNK_SIZE):
+                        h.update(view[i:i + CHUNK_SIZE])
+                finally:
+                    view.release()
+        else:
+            buf = bytearray(min(CHUNK_SIZE, max(size, 1)))
+            view = memoryview(buf)
+            for n in iter(lambda: f.readinto(buf), 0):
+                h.update(view[:n])
+    return h.hexdigest()
+
+
+def _digest(args):
+    path, algorithm = args
+    try:
+        return path, file_digest(path, algorithm), None
+    except Exception as e:
+        return path, None, e
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def digest_files(paths, algorithm='md5', jobs=None):
+    """Computes the checksums of many files using a pool of processes.
+    The largest files are started first so that one large file does not
+    finish long after all others.
+
+    args:
+    -- paths: paths to the files (list)
+    -- algorithm: hashlib algorithm name (str, default=>md5)
+    -- jobs: number of files hashed at once (int, default=>number of cpus)
+
+    returns:
+    -- generator of (path, hex digest, error) tuples in input order. error
+       is None if the file was hashed.
+    """
+
+    paths = list(paths)
+    jobs = jobs or os.cpu_count() or 1
+    work = [(p, algorithm) for p in paths]
+
+    # starting processes costs more than hashing a single file
+    if jobs <= 1 or len(paths) <= 1:
+        yield from map(_digest, work)
+        return
+
+    with scheduler.shared().group(scheduler.CPU, limit=jobs) as group:
+        futures = [None] * len(work)
+        for i in sorted(range(len(work)), key=lambda i: -_size(paths[i])):
+            futures[i] = group.submit(_digest, work[i])
+        for future in futures:
+            yield future.result()
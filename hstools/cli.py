@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+"""
+Command line interface for the hs script. Subcommands are registered by
+module name and a module is only imported when its subcommand is invoked
+(or when the top-level help is printed). The subcommand modules defer
+importing hs_restclient and other heavy dependencies to the functions that
+use them, which keeps the startup of every hs command short.
+"""
+
+import os
+import sys
+import argparse
+import importlib
+from collections import OrderedDict
+
+# hs subcommands and the modules that implement them
+COMMANDS = OrderedDict([('get', 'hstools.funcs.get'),
+                        ('add', 'hstools.funcs.add'),
+                        ('sync', 'hstools.funcs.sync'),
+                        ('create', 'hstools.funcs.create'),
+                        ('delete', 'hstools.funcs.delete'),
+                        ('list', 'hstools.funcs.ls'),
+                        ('describe', 'hstools.funcs.describe'),
+                        ('verify', 'hstools.funcs.verify'),
+                        ('init', 'hstools.funcs.init'),
+                        ('agent', 'hstools.funcs.agent')])
+
+# target import time of an hs command, in milliseconds
+STARTUP_BUDGET_MS = float(os.environ.get('HS_STARTUP_BUDGET_MS', 200))
+
+
+def print_usage(args):
+
+    if len(args) == 0:
+        pass
+    else:
+        return 'hs'
+
+
+def set_usage(parser):
+
+    options = []
+    for k, v in parser._subparsers._actions[-1].choices.items():
+        options.append(k)
+
+    parser.usage = '%(prog)s {' \
+                   f'{", ".join(options)}' \
+                   '} [-h, --help]'
+
+
+def build_parser(argv):
+
+    desc = """
+    HSTools is a humble collection of tools for interacting with data in the
+    HydroShare repository. It wraps the HydroShare REST API to provide
+    simple commands for working with resources.
+    """
+
+    parser = argparse.ArgumentParser(prog='hs', description=desc)
+    parser.usage = print_usage(argv)
+    parser.add_argument('--importtime', action='store_true',
+                        help='run the command with "python -X importtime" '
+                             'and report the slowest imports')
+
+    sub = parser.add_subparsers()
+
+    # load only the invoked subcommand, the others are registered so
+    # that they appear in usage messages
+    invoked = argv[0] if len(argv) > 0 and argv[0] in COMMANDS else None
+    for name, module_name in COMMANDS.items():
+        if invoked is not None and name != invoked:
+            sub.add_parser(name)
+            continue
+
+        module = importlib.import_module(module_name)
+        subparser = sub.add_parser(name, help=module.short_help())
+        module.add_arguments(subparser)
+        subparser.set_defaults(func=module.main)
+
+    set_usage(parser)
+
+    return parser
+
+
+def check_arguments(parser, argv, args):
+    """Rejects combinations of arguments that argparse cannot express.
+    Subcommand modules may define check_arguments(args), which returns
+    an error message or None. Errors are reported by the subcommand
+    parser, which exits.
+
+    args:
+    -- parser: parser created by build_parser
+    -- argv: command line arguments (list)
+    -- args: parsed arguments (argparse.Namespace)
+    """
+
+    if len(argv) == 0 or argv[0] not in COMMANDS:
+        return
+    module = importlib.import_module(COMMANDS[argv[0]])
+    if not hasattr(module, 'check_arguments'):
+        return
+    error = module.check_arguments(args)
+    if error is not None:
+        subparsers = parser._subparsers._actions[-1].choices
+        subparsers[argv[0]].error(error)
+
+
+def parse_importtime(lines):
+    """Parses the output of "python -X importtime".
+
+    args:
+    -- lines: lines written to stderr by the interpreter (list)
+
+    returns:
+    -- list of (module, self us, cumulative us, nesting level) tuples
+    """
+
+    imports = []
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # column header
+            continue
+        name = fields[2].rstrip()
+        level = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(fields[0]), int(fields[1]), level))
+    return imports
+
+
+def startup_report(argv, top=15):
+    """Runs an hs command with "python -X importtime" and prints the
+    slowest imports and the total import time compared to the budget
+    set by HS_STARTUP_BUDGET_MS.
+
+    args:
+    -- argv: hs command line arguments (list)
+    -- top: number of imports to show (int, default=>15)
+
+    returns:
+    -- 0 if the import time is within budget, else 1
+    """
+
+    import time
+    import subprocess
+
+    cmd = [sys.executable, '-X', 'importtime', '-c',
+           'import sys; from hstools import cli; cli.main(sys.argv[1:])']
+    env = dict(os.environ, HS_NO_AGENT='1')
+
+    st = time.perf_counter()
+    proc = subprocess.run(cmd + list(argv), env=env,
+                          stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE,
+                          universal_newlines=True)
+    elapsed = (time.perf_counter() - st) * 1000
+
+    imports = parse_importtime(proc.stderr.splitlines())
+    total = sum(i[2] for i in imports if i[3] == 0) / 1000
+
+    print(f'{"cumulative [ms]":>16} {"self [ms]":>10}  module')
+    for name, us, cumulative, level in sorted(imports, key=lambda i: -i[2])[:top]:
+        print(f'{cumulative / 1000:16.1f} {us / 1000:10.1f}  {name}')
+
+    status = 'OK' if total <= STARTUP_BUDGET_MS else 'OVER BUDGET'
+    print(f'\ntotal import time: {total:.1f} ms '
+          f'(budget {STARTUP_BUDGET_MS:.0f} ms) - {status}')
+    print(f'total run time: {elapsed:.1f} ms')
+
+    return 0 if total <= STARTUP_BUDGET_MS else 1
+
+
+def main(argv=None):
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if len(argv) > 0 and argv[0] == '--importtime':
+        sys.exit(startup_report(argv[1:]))
+
+    parser = build_parser(argv)
+    args = parser.parse_args(argv)
+    check_arguments(parser, argv, args)
+
+    # print help if sub-parser was not provided
+    if not getattr(args, 'func', 0):
+        parser.print_help()
+    else:
+        args.func(args)
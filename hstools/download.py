@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+
+"""
+Resumable downloads using HTTP range requests. Data is written to a
+<path>.part file alongside a small <path>.part.json sidecar that records
+the server validators (ETag/Last-Modified) and the number of bytes
+received, so an interrupted download can continue where it stopped.
+"""
+
+import os
+import json
+import time
+from urllib.parse import quote
+from concurrent.futures import CancelledError
+from hs_restclient import HydroShareNotAuthorized, HydroShareNotFound
+from hs_restclient import HydroShareHTTPException, HydroShareException
+
+from . import log
+from . import retry
+
+logger = log.logger
+
+CHUNK_SIZE = 1024 * 1024
+
+# how often (bytes) the sidecar is updated while downloading
+CHECKPOINT_SIZE = 16 * CHUNK_SIZE
+
+
+def _load_state(sidecar, url):
+    """
+    loads the sidecar of a previous download of url, if one exists
+    """
+
+    try:
+        with open(sidecar, 'r') as f:
+            state = json.load(f)
+        if state.get('url') == url:
+            return state
+    except Exception:
+        pass
+    return None
+
+
+def _save_state(sidecar, state):
+    tmp = f'{sidecar}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, sidecar)
+
+
+def _discard(part, sidecar):
+    for p in (part, sidecar):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def _validator(state):
+    """
+    selects the validator to send in the If-Range header. Weak ETags
+    cannot be used for range requests.
+    """
+
+    etag = state.get('etag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return state.get('last_modified')
+
+
+def _raise_for_status(r, url, resid=None):
+    if r.status_code == 403:
+        raise HydroShareNotAuthorized(('GET', url))
+    elif r.status_code == 404:
+        raise HydroShareNotFound((resid or url,))
+    raise HydroShareHTTPException(r)
+
+
+def _wait_for_bag(hs, r):
+    """
+    waits for HydroShare to finish creating a bag that is not ready yet
+    """
+
+    content = r.json()
+    if content.get('bag_status') != 'Not ready':
+        raise HydroShareException(f'Unexpected response: {content}')
+    while not hs._getTaskStatus(content['task_id']):
+        time.sleep(3)
+
+
+def _range_start(r):
+    """
+    parses the first byte position from a Content-Range header
+    """
+
+    try:
+        unit, rng = r.headers['Content-Range'].split(' ', 1)
+        return int(rng.split('-')[0])
+    except Exception:
+        return None
+
+
+def download(hs, url, path, resid=None, wait_for_bag=False, progress=None,
+             cancel=None):
+    """Downloads a url to a file, resuming a previous partial download.
+
+    A rerun continues from the last byte received using a Range request.
+    If the server reports that the content has changed, the partial data
+    is discarded and the download restarts from the beginning.
+
+    args:
+    -- hs: hs_restclient.HydroShare instance
+    -- url: url to download
+    -- path: destination file path (str)
+    -- resid: resource id used in error messages (str, default=>None)
+    -- wait_for_bag: wait if the url is a bag that is still being created
+                     (bool, default=>False)
+    -- progress: display of the bytes received
+                 (progress.TransferProgress, default=>None)
+    -- cancel: stops the download when set, keeping the partial data so
+               that it can be resumed (threading.Event, default=>None)
+
+    returns:
+    -- path
+    """
+
+    part = f'{path}.part'
+    sidecar = f'{part}.json'
+
+    policy = retry.policy_for(hs)
+    failures = 0
+    while True:
+        state = _load_state(sidecar, url)
+        offset = 0
+        headers = {}
+        if state is not None and os.path.exists(part):
+            offset = min(os.path.getsize(part), state.get('bytes', 0))
+            validator = _validator(state)
+            if offset > 0 and validator:
+                headers['Range'] = f'bytes={offset}-'
+                headers['If-Range'] = validator
+            else:
+                offset = 0
+
+        r = hs._request('GET', url, headers=headers, stream=True)
+
+        if r.status_code == 416:
+            # the requested range is not available, either because the
+            # download was already complete or because the content changed
+            r.close()
+            total = r.headers.get('Content-Range', '').split('/')[-1]
+            if total.isdigit() and int(total) == offset:
+                break
+            _discard(part, sidecar)
+            continue
+
+        if r.status_code not in (200, 206):
+            _raise_for_status(r, url, resid)
+
+        if wait_for_bag and \
+                r.headers.get('content-type') == 'application/json':
+            _wait_for_bag(hs, r)
+            continue
+
+        if r.status_code == 206 and _range_start(r) == offset:
+            logger.info(f'+ resuming download at {offset} bytes')
+            mode = 'ab'
+        else:
+            # the server sent the full content, e.g. because it changed
+            # since the partial download was started
+            if offset > 0:
+                logger.info('+ remote content changed, restarting download')
+            offset = 0
+            mode = 'wb'
+
+        state = {'url': url,
+                 'etag': r.headers.get('ETag'),
+                 'last_modified': r.headers.get('Last-Modified'),
+                 'bytes': offset}
+        _save_state(sidecar, state)
+
+        transfer = None
+        if progress is not None:
+            total = r.headers.get('Content-Length')
+            if total is not None and 'Content-Encoding' not in r.headers:
+                total = offset + int(total)
+            else:
+                total = None
+            transfer = progress.transfer(os.path.basename(path), total,
+                                         done=offset)
+
+        checkpoint = offset
+        error = None
+        interrupted = None
+        try:
+            with open(part, mode) as f:
+                f.truncate(offset)
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    if cancel is not None and cancel.is_set():
+                        raise CancelledError(f'Download of {url} was '
+                                             'cancelled')
+                    f.write(chunk)
+                    state['bytes'] += len(chunk)
+                    if transfer is not None:
+                        transfer.update(len(chunk))
+                    if state['bytes'] - checkpoint >= CHECKPOINT_SIZE:
+                        f.flush()
+                        _save_state(sidecar, state)
+                        checkpoint = state['bytes']
+        except retry.TRANSIENT_ERRORS as e:
+            # the connection failed while the body was read
+            if state['bytes'] > offset:
+                failures = 0
+            if failures >= policy.retries:
+                error = e
+                raise
+            interrupted = e
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            r.close()
+            _save_state(sidecar, state)
+            if transfer is not None:
+                transfer.finish(error)
+
+        if interrupted is not None:
+            # continue from the last byte received
+            delay = policy.delay(failures)
+            logger.info(f'- download interrupted ({interrupted}), resuming '
+                        f'in {delay:.1f}s')
+            policy.sleep(delay)
+            failures += 1
+            continue
+
+        # compare against the content length, unless the body was
+        # decoded by requests and the sizes are not comparable
+        expected = r.headers.get('Content-Length')
+        if expected is not None and 'Content-Encoding' not in r.headers \
+                and state['bytes'] - offset != int(expected):
+            raise HydroShareException(f'Incomplete download of {url}: '
+                                      f'received {state["bytes"]} bytes')
+        break
+
+    os.replace(part, path)
+    os.remove(sidecar)
+    return path
+
+
+def download_bag(hs, resid, destination, progress=None, cancel=None):
+    """Downloads the zipped bag of a resource to <destination>/<resid>.zip,
+    resuming a previous partial download of the same bag.
+
+    args:
+    -- hs: hs_restclient.HydroShare instance
+    -- resid: id of the hydroshare resource (str)
+    -- destination: directory to save the bag in (str)
+    -- progress: display of the bytes received
+                 (progress.TransferProgress, default=>None)
+    -- cancel: stops the download when set (threading.Event, default=>None)
+
+    returns:
+    -- path to the zipped bag
+    """
+
+    url = f'{hs.url_base}/resource/{resid}/'
+    path = os.path.join(destination, f'{resid}.zip')
+    return download(hs, url, path, resid=resid, wait_for_bag=True,
+                    progress=progress, cancel=cancel)
+
+
+def download_file(hs, resid, name, path, progress=None, cancel=None):
+    """Downloads a single file of a resource, resuming a previous partial
+    download of the same file.
+
+    args:
+    -- hs: hs_restclient.HydroShare instance
+    -- resid: id of the hydroshare resource (str)
+    -- name: path of the file relative to the resource contents (str)
+    -- path: destination file path (str)
+    -- progress: display of the bytes received
+                 (progress.TransferProgress, default=>None)
+    -- cancel: stops the download when set (threading.Event, default=>None)
+
+    returns:
+    -- path
+    """
+
+    url = f'{hs.url_base}/resource/{resid}/files/{quote(name, safe="/")}'
+    d = os.path.dirname(path)
+    if d and not os.path.exists(d):
+        os.makedirs(d, exist_ok=True)
+    return download(hs, url, path, resid=resid, progress=progress,
+                    cancel=cancel)
+
+
+def iter_file(hs, resid, name, chunk_size=CHUNK_SIZE):
+    """Streams a single file of a resource without saving it.
+
+    args:
+    -- hs: hs_restclient.HydroShare instance
+    -- resid: id of the hydroshare resource (str)
+    -- name: path of the file relative to the resource contents (str)
+    -- chunk_size: number of bytes per chunk (int, default=>CHUNK_SIZE)
+
+    returns:
+    -- generator of bytes. The connection is closed when the generator
+       is exhausted or closed.
+    """
+
+    url = f'{hs.url_base}/resource/{resid}/files/{quote(name, safe="/")}'
+    r = hs._request('GET', url, stream=True)
+    try:
+        if r.status_code != 200:
+            _raise_for_status(r, url, resid)
+        yield from r.iter_content(chunk_size)
+    finally:
+        r.close()
@@ -2,18 +2,121 @@
 
 import os
 import sys
+import time
 import shutil
 import argparse
-from hstools import hydroshare, log
+import posixpath
+from hstools import log, progress, scheduler, utilities
 
 logger = log.logger
 
 
+class UploadPlan(object):
+    def __init__(self, files, remote_files, overwrite=False,
+                 create_folders=True):
+
+        """
+        Decides which files are uploaded, replaced or skipped, and which
+        resource folders must be created first. files are (source, target)
+        pairs and remote_files are the paths of the files that are already
+        in the resource.
+        """
+
+        remote = set(remote_files)
+
+        # folders that exist because they contain files. Empty folders are
+        # not listed, creating them again is harmless
+        remote_dirs = set()
+        for path in remote:
+            d = posixpath.dirname(path)
+            while d != '' and d not in remote_dirs:
+                remote_dirs.add(d)
+                d = posixpath.dirname(d)
+
+        self.uploads = []
+        self.replace = []
+        self.skipped = []
+        for src, tar in files:
+            if tar in remote:
+                if not overwrite:
+                    self.skipped.append(tar)
+                    continue
+                self.replace.append(tar)
+            self.uploads.append((src, tar))
+
+        # each missing folder and its missing parents, once
+        folders = set()
+        if create_folders:
+            for _, tar in self.uploads:
+                d = posixpath.dirname(tar)
+                while d != '' and d not in remote_dirs and d not in folders:
+                    folders.add(d)
+                    d = posixpath.dirname(d)
+        self.folders = sorted(folders, key=lambda d: (d.count('/'), d))
+
+
+def remove_files(hs, resid, paths, jobs=4):
+
+    def remove(path):
+        logger.info(f'- removing: {path}')
+        hs.hs.deleteResourceFile(resid, path)
+
+    with scheduler.shared().group(scheduler.METADATA, limit=jobs) as group:
+        futures = {group.submit(remove, p): p for p in paths}
+        for future in group.as_completed():
+            yield futures[future], future.exception()
+
+
 def add_file(hs, resid, source, target):
 
     return hs.addContentToExistingResource(resid, source, target=target)
 
 
+def add_files(hs, resid, files, jobs=4):
+
+    return hs.addFilesToExistingResource(resid, files, max_workers=jobs)
+
+
+def add_bundle(hs, resid, files, overwrite=False):
+
+    if len(files) == 0:
+        return []
+    try:
+        hs.addBundleToExistingResource(resid, files, overwrite=overwrite)
+    except Exception as e:
+        logger.error(f'- failed to add bundle: {e}')
+        return [(src, tar, e) for src, tar in files]
+    return [(src, tar, None) for src, tar in files]
+
+
+def print_plan(plan):
+
+    nbytes = sum(os.path.getsize(src) for src, _ in plan.uploads)
+    print(f'+ {len(plan.folders)} director(ies) to create')
+    for d in plan.folders:
+        print(f'   {d}')
+    print(f'+ {len(plan.replace)} file(s) to replace')
+    for tar in plan.replace:
+        print(f'   {tar}')
+    print(f'+ {len(plan.uploads)} file(s) to upload, '
+          f'{utilities.sizeof_fmt(nbytes)}')
+    for src, tar in plan.uploads:
+        print(f'   {src} -> {tar}')
+
+
+def print_summary(succeeded, failed, nbytes, elapsed):
+
+    rate = nbytes / elapsed if elapsed > 0 else 0
+    logger.info(f'\nAdded {len(succeeded)} of '
+                f'{len(succeeded) + len(failed)} file(s), '
+                f'{utilities.sizeof_fmt(nbytes)} in {elapsed:.1f}s '
+                f'({utilities.sizeof_fmt(rate)}/s)')
+    for src, tar in succeeded:
+        logger.info(f'  + {src} -> {tar}')
+    for src, tar, err in failed:
+        logger.error(f'  - {src} -> {tar}: {err}')
+
+
 def set_usage(parser):
 
     optionals = []
@@ -49,6 +152,16 @@ def add_arguments(parser):
     parser.add_argument('--overwrite', action='store_true',
                         help='overwrite existing resource files with the'
                              'same name')
+    parser.add_argument('-j', '--jobs', default=4, type=int,
+                        help='number of files to upload concurrently')
+    parser.add_argument('--bundle', action='store_true',
+                        help='upload all files as a single zip archive that '
+                             'is unzipped by HydroShare. This is much faster '
+                             'when adding many small files')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='print the folders that would be created and '
+                             'the files that would be uploaded, without '
+                             'changing the resource')
     parser.add_argument('-v', default=True, action='store_true',
                         help='verbose output')
     parser.add_argument('-q', default=False, action='store_true',
@@ -58,6 +171,8 @@ def add_arguments(parser):
 
 def main(args):
 
+    from hstools import hydroshare
+
     if args.v:
         log.set_verbose()
     if args.q:
@@ -93,63 +208,69 @@ def main(args):
             raise Exception(f'Could not find file: {f}')
             sys.exit(1)
 
-    # get the resource files
+    # get the resource files, reading all pages of the file listing
     try:
-        response = hs.getResourceFiles(args.resource_id)
         res_files = []
-        if len(response) > 0:
-            for r in response:
-                # get the filepath from the content url field
-                file_path = r['url'].split('contents')[-1]
-                # remove slash at beginning
-                file_path = file_path[1:] if file_path[0] == '/' else file_path
-                res_files.append(file_path)
+        for r in hs.iterResourceFiles(args.resource_id,
+                                      max_workers=args.jobs):
+            # get the filepath from the content url field
+            file_path = r['url'].split('contents')[-1]
+            # remove slash at beginning
+            file_path = file_path[1:] if file_path[0] == '/' else file_path
+            res_files.append(file_path)
     except Exception:
         raise Exception('Error connecting to HydroShare resource')
 
-    # make sure files don't already exist in the resource
-    file_conflicts = []
-    if len(res_files) > 0:
-        for rf in res_files:
-            if rf in targets:
-                file_conflicts.append(rf)
-
-    if len(file_conflicts) > 0:
-        if not args.overwrite:
-            for fc in file_conflicts:
-                print(f' - {fc} already exists, use --overwrite to replace')
-                res_files.pop(res_files.index(fc))
-                tidx = targets.index(fc)
-                sources.pop(tidx)
-                targets.pop(tidx)
+    # plan the upload using the remote file listing
+    plan = UploadPlan(list(zip(sources, targets)), res_files,
+                      overwrite=args.overwrite, create_folders=not args.bundle)
+    for tar in plan.skipped:
+        print(f' - {tar} already exists, use --overwrite to replace')
+
+    if args.dry_run:
+        print_plan(plan)
+        return
+
+    if len(plan.replace) > 0:
+        for tar, err in remove_files(hs, args.resource_id, plan.replace,
+                                     args.jobs):
+            if err is not None:
+                logger.error(f'- failed to remove {tar}: {err}')
+
+    # create missing folders, parents before their children. Bundled
+    # files are unzipped into their target folders by HydroShare
+    if len(plan.folders) > 0:
+        print(f'+ creating {len(plan.folders)} resource director(ies)')
+        hs.createResourceFolders(args.resource_id, plan.folders,
+                                 max_workers=args.jobs)
+
+    # upload the files concurrently and report the results
+    st = time.time()
+    succeeded = []
+    failed = []
+    nbytes = 0
+    files = plan.uploads
+    if not args.q:
+        hs.progress = progress.TransferProgress(handler=log.handler)
+    try:
+        if args.bundle:
+            results = add_bundle(hs, args.resource_id, files,
+                                 args.overwrite)
         else:
-            for fc in file_conflicts:
-                logger.info(f'- removing: {fc}')
-                hs.hs.deleteResourceFile(args.resource_id, fc)
-
-    # create folders if necessary
-    res_dirs = [os.path.dirname(p) for p in res_files]
-    for i in range(0, len(targets)):
-        target_path = os.path.dirname(targets[i])
-        if target_path not in res_dirs:
-            print(f'+ creating resource directory: {target_path}')
-
-            # need a try/except loop here because hs.getResourceFiles will
-            # not return empty directories. There is a chance that the
-            # target directory already exists on HS but is empty
-            try:
-                hs.hs.createResourceFolder(args.resource_id,
-                                           pathname=target_path)
-            except Exception:
-                pass
-
-    # loop through the files and add each individually
-    for i in range(0, len(sources)):
-        try:
-            add_file(hs, args.resource_id,
-                     sources[i], targets[i])
-        except Exception:
-            print(f'- failed to add file {sources[i]:targets[i]}')
+            results = add_files(hs, args.resource_id, files, args.jobs)
+        for src, tar, err in results:
+            if err is None:
+                succeeded.append((src, tar))
+                nbytes += os.path.getsize(src)
+            else:
+                failed.append((src, tar, err))
+    finally:
+        if hs.progress is not None:
+            hs.progress.close()
+    print_summary(succeeded, failed, nbytes, time.time() - st)
+
+    if len(failed) > 0:
+        sys.exit(1)
 
 
 def short_help():
@@ -158,9 +279,12 @@ def short_help():
 
 def long_help():
     return """Add files to an existing HydroShare resource. Multiple files
-              can be added at once and folders are created as necessary.
+              can be added at once and are uploaded concurrently, use the
+              "-j" flag to set the number of simultaneous uploads. Folders
+              are created as necessary.
               By default existing files will not be replaced, use the
-              --overwrite option if this is desired.
+              --overwrite option if this is desired. Use --dry-run to print
+              the planned changes without making them.
             """
 
 
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+from hstools import agent
+
+
+def start_agent(idle_timeout=3600, wait=10):
+
+    if agent.request({'cmd': 'status'}) is not None:
+        print(f'hs agent is already running: {agent.socket_path()}')
+        return True
+
+    # run the agent in its own session so it outlives this process
+    subprocess.Popen([sys.executable, '-m', 'hstools.agent',
+                      '--socket', agent.socket_path(),
+                      '--idle-timeout', str(idle_timeout)],
+                     stdin=subprocess.DEVNULL,
+                     stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+
+    # wait for the agent to authenticate and start listening
+    st = time.time()
+    while time.time() - st < wait:
+        status = agent.request({'cmd': 'status'})
+        if status is not None:
+            print(f'+ hs agent started [pid {status["pid"]}]: '
+                  f'{status["socket"]}')
+            return True
+        time.sleep(.1)
+
+    print('- hs agent failed to start')
+    return False
+
+
+def stop_agent():
+
+    if agent.request({'cmd': 'stop'}) is None:
+        print('hs agent is not running')
+        return False
+    print('+ hs agent stopped')
+    return True
+
+
+def agent_status():
+
+    status = agent.request({'cmd': 'status'})
+    if status is None:
+        print('hs agent is not running')
+        return False
+    print(f'hs agent is running [pid {status["pid"]}]')
+    print(f'   socket: {status["socket"]}')
+    print(f'   uptime: {status["uptime"]:.0f}s')
+    print(f'   commands served: {status["commands"]}')
+    return True
+
+
+def set_usage(parser):
+
+    optionals = []
+    for option in parser._get_optional_actions():
+        if len(option.option_strings) > 0:
+            ostring = f'[{option.option_strings[0]}]'
+            if '--' in ostring:
+                # place '--' args at end of usage
+                optionals.append(ostring)
+            else:
+                optionals.insert(0, ostring)
+
+    positionals = []
+    for pos in parser._get_positional_actions():
+        positionals.append(pos.dest)
+    parser.usage = f'%(prog)s {" ".join(positionals)} {" ".join(optionals)}'
+
+
+def add_arguments(parser):
+
+    parser.description = long_help()
+    parser.add_argument('action', choices=['start', 'stop', 'status'],
+                        help='start, stop, or check the status of the agent')
+    parser.add_argument('--idle-timeout', default=3600, type=int,
+                        help='seconds without requests before the agent '
+                             'exits, 0 to run until stopped')
+    set_usage(parser)
+
+
+def main(args):
+
+    if args.action == 'start':
+        ok = start_agent(idle_timeout=args.idle_timeout)
+    elif args.action == 'stop':
+        ok = stop_agent()
+    else:
+        ok = agent_status()
+
+    if not ok:
+        sys.exit(1)
+
+
+def short_help():
+    return 'Manage a background agent that speeds up hs commands'
+
+
+def long_help():
+    return """Manage the hs agent, a background process that keeps an
+              authenticated connection to HydroShare open. While the agent
+              is running, hs commands are forwarded to it over a local
+              socket, which avoids the startup and authentication cost of
+              each command. Set HS_NO_AGENT=1 to run a command without the
+              agent.
+           """
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=long_help())
+    add_arguments(parser)
+
+    args = parser.parse_args()
+    main(args)
@@ -3,19 +3,21 @@
 import os
 import sys
 import argparse
-from hstools import hydroshare, log
+from hstools import log
 
 logger = log.logger
 
 
 def create_resource(hs, abstract, title,
                     keywords=[],
-                    content_files=[]):
+                    content_files=[],
+                    bundle=False):
 
     return hs.createResource(abstract,
                              title,
                              keywords=keywords,
-                             content_files=content_files)
+                             content_files=content_files,
+                             bundle=bundle)
 
 
 def set_usage(parser):
@@ -49,6 +51,9 @@ def add_arguments(parser):
                         help='space separated list of keywords')
     parser.add_argument('-f', '--files', type=str, nargs='+', default=[],
                         help='space separated list of files')
+    parser.add_argument('--bundle', action='store_true',
+                        help='upload all files as a single zip archive that '
+                             'is unzipped by HydroShare')
     parser.add_argument('-v', default=True, action='store_true',
                         help='verbose output')
     parser.add_argument('-q', default=False, action='store_true',
@@ -58,6 +63,8 @@ def add_arguments(parser):
 
 def main(args):
 
+    from hstools import hydroshare
+
     if args.v:
         log.set_verbose()
     if args.q:
@@ -83,7 +90,8 @@ def main(args):
                                   abstract,
                                   title,
                                   keywords=args.keywords,
-                                  content_files=args.files)
+                                  content_files=args.files,
+                                  bundle=args.bundle)
 
     # return the path to the data
     logger.info(f'\nhttps://hydroshare.org/resource/{resource_id}')
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
 import sys
+import json
+import time
 import argparse
-from hstools import hydroshare, log
+from hstools import log, scheduler, utilities
 
 logger = log.logger
 
@@ -12,14 +14,81 @@ def delete_resource(hs, resid):
     return hs.deleteResource(resid)
 
 
+def resolve_titles(hs, resids, jobs=1):
+
+    def title(resid):
+        return hs.hs.getSystemMetadata(resid)['resource_title']
+
+    with scheduler.shared().group(scheduler.METADATA, limit=jobs) as group:
+        futures = {group.submit(title, r): r for r in resids}
+        for future in group.as_completed():
+            resid = futures[future]
+            if future.exception() is not None:
+                yield resid, None, future.exception()
+            else:
+                yield resid, future.result(), None
+
+
+def delete_resources(hs, resids, jobs=1):
+
+    with scheduler.shared().group(scheduler.METADATA, limit=jobs) as group:
+        futures = {group.submit(delete_resource, hs, r): r for r in resids}
+        for future in group.as_completed():
+            yield futures[future], future.exception()
+
+
+def summarize(results, elapsed, dry_run=False):
+
+    from hs_restclient import HydroShareNotFound
+
+    # results are (resource id, title, error) tuples, the title is None
+    # unless titles were resolved
+    summary = {'dry_run': dry_run,
+               'deleted': [],
+               'missing': [],
+               'failed': [],
+               'elapsed': round(elapsed, 3),
+               'rate': 0}
+    if dry_run:
+        summary['resources'] = {}
+    for resid, title, err in results:
+        if isinstance(err, HydroShareNotFound):
+            summary['missing'].append(resid)
+        elif err is not None:
+            summary['failed'].append({'resource_id': resid,
+                                      'error': str(err)})
+        elif dry_run:
+            summary['resources'][resid] = title
+        else:
+            summary['deleted'].append(resid)
+
+    count = len(results)
+    if elapsed > 0:
+        summary['rate'] = round(count / elapsed, 2)
+    return summary
+
+
 def add_arguments(parser):
 
     parser.description = long_help()
     parser.add_argument('resource_id',
-                        nargs='+',
+                        nargs='*',
                         type=str,
                         help='unique HydroShare resource identifier to be ' +
                              'deleted')
+    parser.add_argument('-i', '--id-file', type=str,
+                        help='file containing resource identifiers to be '
+                             'deleted, one per line. Use "-" to read them '
+                             'from stdin')
+    parser.add_argument('-j', '--jobs', default=1, type=int,
+                        help='number of resources deleted at once')
+    parser.add_argument('--dry-run', default=False, action='store_true',
+                        help='list the titles of the resources that would '
+                             'be deleted without deleting them')
+    parser.add_argument('--json', default=False, action='store_true',
+                        help='print the summary as json')
+    parser.add_argument('-o', '--output', type=str,
+                        help='save the summary as json')
     parser.add_argument('-v', default=True, action='store_true',
                         help='verbose output')
     parser.add_argument('-q', default=False, action='store_true',
@@ -47,32 +116,80 @@ def set_usage(parser):
 
 def main(args):
 
+    from hs_restclient import HydroShareNotFound
+    from hstools import hydroshare
+
     if args.v:
         log.set_verbose()
     if args.q:
         log.set_quiet()
 
+    # ids from the command line, followed by the ids in the id file.
+    # Duplicates are removed
+    resids = list(args.resource_id)
+    if args.id_file:
+        resids.extend(utilities.read_resource_ids(args.id_file))
+    resids = list(dict.fromkeys(resids))
+    if len(resids) == 0:
+        raise Exception('No resource identifiers were provided')
+
     # connect to hydroshare
     hs = hydroshare.hydroshare()
     if hs is None:
         raise Exception(f'Connection to HydroShare failed')
+    jobs = max(1, args.jobs)
+    hs.setConnectionPoolSize(jobs)
+
+    st = time.time()
+    results = []
+    if args.dry_run:
+        for resid, title, err in resolve_titles(hs, resids, jobs):
+            if not args.json:
+                if err is None:
+                    print(f'  {resid}  {title}')
+                elif isinstance(err, HydroShareNotFound):
+                    print(f'- {resid}: not found')
+                else:
+                    print(f'- {resid}: {str(err)}')
+            results.append((resid, title, err))
+    else:
+        for resid, err in delete_resources(hs, resids, jobs):
+            if err is not None and not isinstance(err, HydroShareNotFound) \
+                    and not args.json:
+                print(f'  {str(err)}')
+            results.append((resid, None, err))
+    summary = summarize(results, time.time() - st, args.dry_run)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        action = 'found' if args.dry_run else 'deleted'
+        count = len(summary['resources'] if args.dry_run
+                    else summary['deleted'])
+        print(f'{action}: {count}, missing: {len(summary["missing"])}, '
+              f'failed: {len(summary["failed"])} in {summary["elapsed"]}s '
+              f'({summary["rate"]} resources/s)')
+
+    if len(summary['failed']) > 0:
         sys.exit(1)
 
-    for resid in args.resource_id:
-        try:
-            delete_resource(hs, resid)
-        except Exception as e:
-            print(f'  {str(e)}')
-
 
 def short_help():
     return """Delete a HydroShare resource"""
 
 
 def long_help():
-    return """Delete HydroShare resource using a globally unique identifier.
-              The identifier is provided as part of the HydroShare resource
-              URL. WARNING: This action is permanent and cannot be undone.
+    return """Delete HydroShare resources using their globally unique
+              identifiers. The identifier is provided as part of the
+              HydroShare resource URL. Identifiers can also be read from a
+              file, or from stdin using "-i -", and many resources can be
+              deleted at once using the "-j" flag. Use "--dry-run" to list
+              the titles of the resources before deleting them. WARNING:
+              This action is permanent and cannot be undone.
            """
 
 
@@ -2,31 +2,189 @@
 
 import sys
 import json
-import yaml
 import argparse
-from itertools import groupby
-from hstools import hydroshare, log
+import collections
+from hstools import log, scheduler, utilities
 
 logger = log.logger
 
 
-def get_tree(group, items, path):
-    sep = lambda i: i.split('/', 1)
-    head = [i for i in items if len(sep(i)) == 2]
-    tail = [i for i in items if len(sep(i)) == 1]
-    gv = groupby(sorted(head), lambda i: sep(i)[0])
-    return group, dict([(i, path+i) for i in tail] + [get_tree(g, [sep(i)[1] for i in v], path+g+'/') for g, v in gv])
+class TreeNode(object):
+    """
+    directory in a file tree. count and size include all files below the
+    directory.
+    """
+
+    __slots__ = ('files', 'dirs', 'count', 'size')
+
+    def __init__(self):
+        self.files = {}
+        self.dirs = {}
+        self.count = 0
+        self.size = 0
+
+
+def build_tree(files):
+    """Builds a file tree in a single pass over the file paths. Path
+    segments are interned, so directory names that repeat across many
+    files are stored once.
+
+    args:
+    -- files: (path, size) tuples, paths are separated by "/" (iterable)
+
+    returns:
+    -- root TreeNode
+    """
+
+    root = TreeNode()
+    for path, size in files:
+        parts = path.split('/')
+        node = root
+        node.count += 1
+        node.size += size
+        for part in parts[:-1]:
+            part = sys.intern(part)
+            child = node.dirs.get(part)
+            if child is None:
+                child = node.dirs[part] = TreeNode()
+            node = child
+            node.count += 1
+            node.size += size
+        node.files[sys.intern(parts[-1])] = size
+    return root
+
+
+class TreeWriter(object):
+    """
+    buffers rendered lines and writes them in blocks
+    """
+
+    def __init__(self, out=None, buffer_lines=1000):
+        self.out = out or sys.stdout
+        self.buffer_lines = buffer_lines
+        self.lines = []
+
+    def line(self, level, name, summary=None):
+        prefix = '└──' if level > 0 else ''
+        line = ' ' * level + f'{prefix} {name}'
+        if summary is not None:
+            line += f' [{summary.count} files, '
+            line += f'{utilities.sizeof_fmt(summary.size)}]'
+        self.lines.append(line)
+        if len(self.lines) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        if len(self.lines) > 0:
+            self.out.write('\n'.join(self.lines) + '\n')
+            self.lines = []
+        self.out.flush()
+
+
+def render_tree(root, out=None, depth=None, collapse=None):
+    """Prints a file tree, listing the files of each directory before its
+    subdirectories, both sorted by name.
+
+    args:
+    -- root: tree built with build_tree (TreeNode)
+    -- out: file-like object to write to (default=>sys.stdout)
+    -- depth: number of levels to print, deeper directories are
+              summarized (int, default=>all)
+    -- collapse: summarize directories with more than this number of
+                 entries instead of listing them (int, default=>None)
+    """
+
+    writer = TreeWriter(out)
+
+    # iterative depth-first walk, so deep trees do not hit the
+    # recursion limit
+    stack = []
+
+    def push_children(node, level):
+        entries = [(name, None) for name in sorted(node.files)]
+        entries += [(name, node.dirs[name]) for name in sorted(node.dirs)]
+        for name, child in reversed(entries):
+            stack.append((name, child, level))
+
+    push_children(root, 0)
+    while len(stack) > 0:
+        name, node, level = stack.pop()
+        if node is None:
+            writer.line(level, name)
+        elif (depth is not None and level + 1 >= depth) or \
+                (collapse is not None and
+                 len(node.files) + len(node.dirs) > collapse):
+            writer.line(level, name, summary=node)
+        else:
+            writer.line(level, name)
+            push_children(node, level + 1)
+
+    writer.flush()
+
+
+def stream_tree(paths, out=None, depth=None):
+    """Prints file paths as a tree while they are read, without building
+    the tree in memory. Directories are printed when they are first
+    entered, so paths should be grouped by directory.
+
+    args:
+    -- paths: file paths separated by "/" (iterable)
+    -- out: file-like object to write to (default=>sys.stdout)
+    -- depth: number of levels to print (int, default=>all)
+    """
+
+    writer = TreeWriter(out)
+    previous = []
+    for path in paths:
+        parts = path.split('/')
+        dirs = parts[:-1]
+
+        common = 0
+        while common < min(len(previous), len(dirs)) and \
+                previous[common] == dirs[common]:
+            common += 1
+
+        for level in range(common, len(dirs)):
+            if depth is None or level < depth:
+                writer.line(level, dirs[level])
+        if depth is None or len(dirs) < depth:
+            writer.line(len(dirs), parts[-1])
+        previous = dirs
+
+    writer.flush()
+
+
+def get_metadata(hs, resid, cached=False, offline=False):
+
+    if not offline:
+        return hs.getResourceMetadata(resid, cached=cached)
+
+    from hstools import metacache, resource
+
+    mc = metacache.shared()
+    system_meta = mc.get(resid, metacache.SYSMETA) if mc else None
+    science_meta = mc.get(resid, metacache.SCIMETA) if mc else None
+    if system_meta is None or science_meta is None:
+        raise Exception(f'- metadata for {resid} is not in the local cache')
+    return resource.ResourceMetadata(system_meta, science_meta)
+
+
+def get_files(hs, resid, cached=False, offline=False, stream=False,
+              jobs=1):
+
+    if stream and not cached and not offline:
+        # the pages of the file listing are read while the tree is printed
+        return hs.iterResourceFiles(resid)
+    if not offline:
+        return hs.getResourceFiles(resid, cached=cached, max_workers=jobs)
 
+    from hstools import metacache
 
-def tree_print(d, indent=0, prefix=''):
-#    file_middle = '├──'
-#    folder_last = '│   '
-    folder = '└──'
-    for key, value in d.items():
-        print(' ' * indent + f'{prefix} {str(key)}')
-        if isinstance(value, dict):
-            next_prefix = folder
-            tree_print(value, indent+1, next_prefix)
+    mc = metacache.shared()
+    files = mc.get(resid, metacache.FILES) if mc else None
+    if files is None:
+        raise Exception(f'- files of {resid} are not in the local cache')
+    return files
 
 
 def set_usage(parser):
@@ -64,101 +222,148 @@ def add_arguments(parser):
                         'authors, abstract, date_created, etc.', )
     parser.add_argument('-v', default=False, action='store_true',
                         help='verbose output')
+    parser.add_argument('--depth', default=None, type=int,
+                        help='number of levels of the file tree to show')
+    parser.add_argument('--collapse', default=None, type=int,
+                        help='summarize directories that contain more than '
+                             'this number of entries')
+    parser.add_argument('--stream', default=False, action='store_true',
+                        help='print the file tree while it is read, for '
+                             'resources with very many files')
+    parser.add_argument('--jobs', default=4, type=int,
+                        help='number of resources to describe concurrently')
+    parser.add_argument('--cached', default=False, action='store_true',
+                        help='use metadata from the local cache for '
+                             'resources that have not been modified')
+    parser.add_argument('--offline', default=False, action='store_true',
+                        help='describe resources using only the local '
+                             'metadata cache')
 
     set_usage(parser)
 
 
+def print_description(meta, files, args):
+
+    import yaml
+
+    meta_dict = {k: v for k, v in vars(meta).items()
+                 if not k.startswith('_')}
+
+    if args.terms:
+        # filter based on specified data types
+        meta_filtered = {}
+        for term in args.terms:
+            if term in meta_dict.keys():
+                meta_filtered[term] = meta_dict[term]
+            else:
+                logger.error(f'  - Unknown metadata term {term}')
+        meta_dict = meta_filtered
+
+    # if not verbose, remove some of the metadata
+    elif not args.long:
+        short_keys = ['abstract',
+                      'authors',
+                      'creators',
+                      'date_created',
+                      'title']
+        meta_dict = {k: meta_dict[k] for k in short_keys}
+
+        # clean strings
+        for k, v in meta_dict.items():
+            if type(v) == type(str):
+                meta_dict[k] = v.replace('\n', '')
+
+        # shorten author and creator data
+        meta_dict['authors'] = ';'.join(meta_dict['authors'])
+
+        creator_values = []
+        for creator in meta_dict['creators']:
+            creator_values.append(creator['name'])
+        meta_dict['creators'] = ';'.join(creator_values)
+
+    if args.yaml:
+        class literal(str):
+            pass
+
+        def literal_presenter(dumper, data):
+            return dumper.represent_scalar('tag:yaml.org,2002:str',
+                                           data, style='|')
+        yaml.add_representer(literal, literal_presenter)
+        v = meta_dict['abstract']
+        meta_dict['abstract'] = literal(v)
+        print(yaml.dump(meta_dict))
+
+    if args.json:
+        # query scientific metadata
+        print(json.dumps(meta_dict,
+                         indent=4,
+                         sort_keys=True))
+
+    # organize files for tree printing
+    paths = ((f['url'].split('contents/')[-1], int(f.get('size', 0)))
+             for f in files)
+    if args.stream:
+        stream_tree((p for p, _ in paths), depth=args.depth)
+    else:
+        render_tree(build_tree(paths), depth=args.depth,
+                    collapse=args.collapse)
+
+
 def main(args):
 
+    from hstools import hydroshare
+
     if args.v:
         log.set_verbose()
 
     # connect to hydroshare
-    hs = hydroshare.hydroshare()
-    if hs is None:
-        raise Exception(f'Connection to HydroShare failed')
-        sys.exit(1)
+    hs = None
+    if not args.offline:
+        hs = hydroshare.hydroshare()
+        if hs is None:
+            raise Exception(f'Connection to HydroShare failed')
+        hs.setConnectionPoolSize(2 * args.jobs)
 
     if args.resource_id:
         print('-' * 50)
 
-    # loop through input resources
-    for r in args.resource_id:
+    def print_next(pending):
+        meta, files = pending.popleft()
         try:
-            meta = hs.getResourceMetadata(r)
-            meta_dict = {k: v for k, v in vars(meta).items()
-                         if not k.startswith('_')}
-
-            if args.terms:
-                # filter based on specified data types
-                meta_filtered = {}
-                for term in args.terms:
-                    if term in meta_dict.keys():
-                        meta_filtered[term] = meta_dict[term]
-                    else:
-                        logger.error(f'  - Unknown metadata term {term}')
-                meta_dict = meta_filtered
-
-            # if not verbose, remove some of the metadata
-            elif not args.long:
-                short_keys = ['abstract',
-                              'authors',
-                              'creators',
-                              'date_created',
-                              'title']
-                meta_dict = {k: meta_dict[k] for k in short_keys}
-
-                # clean strings
-                for k, v in meta_dict.items():
-                    if type(v) == type(str):
-                        meta_dict[k] = v.replace('\n', '')
-
-                # shorten author and creator data
-                meta_dict['authors'] = ';'.join(meta_dict['authors'])
-
-                creator_values = []
-                for creator in meta_dict['creators']:
-                    creator_values.append(creator['name'])
-                meta_dict['creators'] = ';'.join(creator_values)
-
-            if args.yaml:
-                class literal(str):
-                    pass
-
-                def literal_presenter(dumper, data):
-                    return dumper.represent_scalar('tag:yaml.org,2002:str',
-                                                   data, style='|')
-                yaml.add_representer(literal, literal_presenter)
-                v = meta_dict['abstract']
-                meta_dict['abstract'] = literal(v)
-                print(yaml.dump(meta_dict))
-
-            if args.json:
-                # query scientific metadata
-                print(json.dumps(meta_dict,
-                                 indent=4,
-                                 sort_keys=True))
-
-            # organize files for tree printing
-            urls = []
-            for file_info in hs.getResourceFiles(r):
-                rpth = file_info['url'].split('contents/')[-1]
-                urls.append(rpth)
-            ftree = dict([get_tree('tree', urls, '')])['tree']
-            tree_print(ftree)
-
+            print_description(meta.result(), files.result(), args)
             print('-' * 50)
-
         except Exception as e:
             print(e)
 
+    # the metadata and files of each resource are independent requests,
+    # so they are fetched concurrently for all resources. Descriptions
+    # are printed in input order and at most args.jobs resources, i.e.
+    # two requests each, are in flight. The tasks wait for the metadata
+    # requests they make, so they are scheduled as general tasks
+    pending = collections.deque()
+    with scheduler.shared().group(scheduler.GENERAL,
+                                  limit=2 * args.jobs) as group:
+        for r in args.resource_id:
+            pending.append((group.submit(get_metadata, hs, r,
+                                         args.cached, args.offline),
+                            group.submit(get_files, hs, r, args.cached,
+                                         args.offline, args.stream,
+                                         args.jobs)))
+            while len(pending) >= args.jobs or \
+                    (len(pending) > 0 and pending[0][0].done() and
+                     pending[0][1].done()):
+                print_next(pending)
+
+        while len(pending) > 0:
+            print_next(pending)
+
 
 def short_help():
     return 'Describe metadata and files'
 
 
 def long_help():
-    return """Describe the metadata and files of a HydroShare resource. By default a short summary is provided by the "-v" flag can be used for verbose output."""
+    return """Describe the metadata and files of a HydroShare resource. By default a short summary is provided by the "-v" flag can be used for verbose output. Metadata is saved in a local cache that can be used with the "--cached" and "--offline" flags."""
 
 
 if __name__ == '__main__':
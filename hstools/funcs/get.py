@@ -4,20 +4,64 @@ import os
 import sys
 import shutil
 import argparse
-from hstools import hydroshare, log
+from hstools import log, progress, utilities
 
 logger = log.logger
 
 
-def get_resource(hs, resid, force=False):
+def remove_local_copy(hs, resid):
+
+    opath = os.path.join(hs.download_dir, resid)
+    if os.path.exists(opath):
+        shutil.rmtree(opath)
+
+
+def get_resource(hs, resid, force=False, stream=False, members=None):
 
     # remove old data it force
     if force:
-        opath = os.path.join(hs.save_dir, resid)
-        if os.path.exists(opath):
-            shutil.rmtree(opath)
+        remove_local_copy(hs, resid)
+
+    return hs.getResource(resid, stream=stream, members=members)
+
+
+def get_resources(hs, resids, force=False, jobs=4, stream=False,
+                  members=None, verify=False):
+
+    # remove old data it force
+    if force:
+        for resid in resids:
+            remove_local_copy(hs, resid)
+
+    return hs.getResources(resids, max_workers=jobs,
+                           stream=stream, members=members, verify=verify)
+
 
-    return hs.getResource(resid)
+def update_resources(hs, resids, jobs=4, verify=False):
+
+    # resources are updated one at a time, each downloading its changed
+    # files concurrently
+    for resid in dict.fromkeys(resids):
+        try:
+            yield resid, hs.updateResource(resid, max_workers=jobs,
+                                           verify=verify), None
+        except Exception as e:
+            yield resid, None, e
+
+
+def check_arguments(args):
+
+    # updates download individual files instead of the zipped bag, so the
+    # options that apply to the bag cannot be used with them. Returns an
+    # error message, which is reported by the parser
+    if args.update:
+        for flag, value in [('-f', args.f),
+                            ('--stream', args.stream),
+                            ('--include', args.include)]:
+            if value:
+                return ('argument -u/--update: not allowed with '
+                        f'argument {flag}')
+    return None
 
 
 def set_usage(parser):
@@ -41,20 +85,38 @@ def set_usage(parser):
 def add_arguments(parser):
 
     parser.description = long_help()
-    parser.add_argument('resource_id',
-                        help='unique identifier of the HydroShare resource '
-                             'to download')
+    parser.add_argument('resource_id', nargs='*',
+                        help='unique identifier(s) of the HydroShare '
+                             'resource(s) to download')
+    parser.add_argument('-i', '--id-file', type=str,
+                        help='file containing resource identifiers to '
+                             'download, one per line. Use "-" to read '
+                             'from stdin')
+    parser.add_argument('-j', '--jobs', default=4, type=int,
+                        help='number of resources to download concurrently')
     parser.add_argument('-d', '--save-dir', default='.',
                         help='location to save resources downloaded from '
                              'HydroShare.org')
     parser.add_argument('-f', default=False, action='store_true',
                         help='force replace HydroShare resource if it '
                              'already exists')
+    parser.add_argument('-u', '--update', default=False,
+                        action='store_true',
+                        help='update previously downloaded resources by '
+                             'downloading only new and changed files')
+    parser.add_argument('--verify', default=False, action='store_true',
+                        help='check the downloaded files against the '
+                             'checksums in the bag manifests')
+    parser.add_argument('--stream', default=False, action='store_true',
+                        help='extract the resource while it downloads, '
+                             'without saving the zipped bag to disk')
+    parser.add_argument('--include', nargs='+', type=str,
+                        help='only extract bag members matching these glob '
+                             'patterns, e.g. "*.csv" "*/data/contents/*"')
     parser.add_argument('-v', default=True, action='store_true',
                         help='verbose output')
     parser.add_argument('-q', default=False, action='store_true',
                         help='supress output')
-
     set_usage(parser)
 
 
@@ -65,7 +127,12 @@ def short_help():
 def long_help():
     return """Retrieve resource content from the HydroShare using a globally
             unique identifier. This identifier is provided as part of the
-            HydroShare resource URL. These downloaded content is structured
+            HydroShare resource URL. Multiple resources can be retrieved at
+            once, either by listing several identifiers or by providing a
+            file of identifiers with the "-i" flag, and are downloaded
+            concurrently. Use the "-u" flag to update resources that were
+            downloaded before, which only downloads the files that
+            changed. These downloaded content is structured
             in bagit format, more information can be found at:
             https://www.archivematica.org/en/docs/archivematica-1.4/user-manual/transfer/bags/
             """
@@ -73,6 +140,8 @@ def long_help():
 
 def main(args):
 
+    from hstools import hydroshare
+
     if args.v:
         log.set_verbose()
     if args.q:
@@ -84,6 +153,16 @@ def main(args):
             os.makedirs(args.save_dir)
     except Exception as e:
         raise Exception(f'Could not create output directory: {e}')
+
+    # collect resource ids from the command line and id file
+    resids = list(args.resource_id)
+    if args.id_file:
+        try:
+            resids.extend(utilities.read_resource_ids(args.id_file))
+        except Exception as e:
+            raise Exception(f'Could not read resource ids: {e}')
+    if len(resids) == 0:
+        print('- no resource identifiers were provided')
         sys.exit(1)
 
     # connect to hydroshare
@@ -91,8 +170,39 @@ def main(args):
     if hs is None:
         sys.exit(1)
 
+    # show the bytes received by each download
+    if not args.q:
+        hs.progress = progress.TransferProgress(handler=log.handler)
+
     # get the hydroshare data
-    get_resource(hs, args.resource_id, args.f)
+    succeeded = {}
+    failed = {}
+    if args.update:
+        results = update_resources(hs, resids, args.jobs, args.verify)
+    else:
+        results = get_resources(hs, resids, args.f, args.jobs,
+                                args.stream, args.include, args.verify)
+    try:
+        for resid, path, err in results:
+            if err is None:
+                succeeded[resid] = path
+            else:
+                failed[resid] = err
+    finally:
+        if hs.progress is not None:
+            hs.progress.close()
+
+    # report the status of each resource
+    if len(resids) > 1 or len(failed) > 0:
+        logger.info(f'\nDownloaded {len(succeeded)} of '
+                    f'{len(succeeded) + len(failed)} resource(s)')
+        for resid, path in succeeded.items():
+            logger.info(f'  + {resid} -> {path}')
+        for resid, err in failed.items():
+            logger.error(f'  - {resid}: {err}')
+
+    if len(failed) > 0:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -101,5 +211,8 @@ if __name__ == '__main__':
     add_arguments(parser)
 
     args = parser.parse_args()
+    error = check_arguments(args)
+    if error is not None:
+        parser.error(error)
     main(args)
 
@@ -6,11 +6,12 @@ import json
 import base64
 import argparse
 from getpass import getpass
-from hstools import hydroshare
 
 
 def init(loc='.'):
 
+    from hstools import hydroshare, auth
+
     fp = os.path.abspath(os.path.join(loc, '.hs_auth'))
     if os.path.exists(fp):
         print(f'Auth already exists: {fp}')
@@ -18,6 +19,7 @@ def init(loc='.'):
         if remove.lower() == 'n':
             sys.exit(0)
         os.remove(fp)
+        auth.clear_cached_authorization(fp)
 
     usr = input('Enter HydroShare Username: ')
     pwd = getpass('Enter HydroShare Password: ')
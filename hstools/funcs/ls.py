@@ -1,10 +1,10 @@
 #!/usr/bin/env python3
 
 import sys
-import json
 import argparse
+import collections
 from enum import Enum
-from hstools import hydroshare
+from hstools import metacache, scheduler
 
 
 class Filters(Enum):
@@ -40,50 +40,96 @@ def parse_filter(filter_str):
         return None
 
 
-def print_resource_list(hs, username, filter_dict={},
-                        count=1000000, long_format=False,
-                        size=False):
+def get_resource_size(hs, resid):
 
-    # number of resource to query at a time
-    qcount = 25
+    try:
+        files = hs.getResourceFiles(resid, cached=True)
+        return sum(int(f['size']) for f in files)
+    except Exception:
+        return -999
+
+
+def print_resource(r, res_size_bytes=0, long_format=False):
+
+    res_line = f'{r["resource_id"]} '
+    if res_size_bytes > 0:
+        res_line += f'[{humansize(res_size_bytes)}]'
+    elif res_size_bytes < 0:
+        res_line += f'[ERROR]'
+    else:
+        res_line += f'[?]'
+
+    if not long_format:
+        elip = '...' if len(r['resource_title']) > 25 else '   '
+        print(f'+ {r["resource_title"][:25]:<25}{elip} - '
+              f'{res_line} ', flush=True)
+    else:
+        print(f'\n+ {res_line} ')
+        print(f'   title: {r["resource_title"]}')
+        print(f'   date created: {r["date_created"]}')
+        print(f'   owner: {r["creator"]}')
+        print(f'   authors: {", ".join(r["authors"])}')
+
+
+def print_resources_with_size(hs, resources, long_format=False, jobs=8):
+
+    # look up sizes concurrently, but print them in listing order. The
+    # number of pending lookups is bounded to keep memory constant. File
+    # lists of resources that have not changed since they were last
+    # listed come from the metadata cache.
+    hs.setConnectionPoolSize(jobs)
+    pending = collections.deque()
+    with scheduler.shared().group(scheduler.METADATA, limit=jobs) as group:
+        for r in resources:
+            pending.append((r, group.submit(get_resource_size, hs,
+                                            r['resource_id'])))
+            while len(pending) > jobs * 4 or \
+                    (len(pending) > 0 and pending[0][1].done()):
+                r, size = pending.popleft()
+                print_resource(r, size.result(), long_format)
+
+        while len(pending) > 0:
+            r, size = pending.popleft()
+            print_resource(r, size.result(), long_format)
+
+
+def print_cached_resource_list(resources, long_format=False, size=False):
+
+    mc = metacache.shared()
+    for r in resources:
+        res_size = 0
+        if size:
+            files = mc.get(r['resource_id'], metacache.FILES)
+            if files is not None:
+                res_size = sum(int(f['size']) for f in files)
+        print_resource(r, res_size, long_format)
 
-    kwargs = {'owner': username,
-              'count': qcount}
-    kwargs.update(filter_dict)
-    cnt = 0
-    for r in hs.hs.resources(**kwargs):
 
-        cnt += 1
-        if cnt > count:
+def print_resource_list(hs, username, filter_dict={},
+                        count=1000000, long_format=False,
+                        size=False, jobs=8, cached=False):
+
+    filters = {'owner': username}
+    filters.update(filter_dict)
+
+    if cached:
+        mc = metacache.shared()
+        resources = None
+        if mc is not None:
+            resources = mc.get_listing(filters, count,
+                                       max_age=metacache.METADATA_CACHE_TTL)
+        if resources is not None:
+            print_cached_resource_list(resources, long_format, size)
             return
 
-        res_line = f'{r["resource_id"]} '
-        res_size_bytes = 0
-        if size:
-            try:
-                files = json.loads(hs.hs.resource(r['resource_id']).files.all().content.decode())
-                for f in files['results']:
-                    res_size_bytes += int(f['size'])
-            except Exception:
-                res_size_bytes = -999
-
-        if res_size_bytes > 0:
-            res_line += f'[{humansize(res_size_bytes)}]'
-        elif res_size_bytes < 0:
-            res_line += f'[ERROR]'
-        else:
-            res_line += f'[?]'
-
-        if not long_format:
-            elip = '...' if len(r['resource_title']) > 25 else '   '
-            print(f'+ {r["resource_title"][:25]:<25}{elip} - '
-                  f'{res_line} ', flush=True)
-        else:
-            print(f'\n+ {res_line} ')
-            print(f'   title: {r["resource_title"]}')
-            print(f'   date created: {r["date_created"]}')
-            print(f'   owner: {r["creator"]}')
-            print(f'   authors: {", ".join(r["authors"])}')
+    resources = hs.iterResources(filters, count=count)
+
+    if size:
+        print_resources_with_size(hs, resources, long_format, jobs)
+        return
+
+    for r in resources:
+        print_resource(r, long_format=long_format)
 
 
 def set_usage(parser):
@@ -113,6 +159,15 @@ def add_arguments(parser):
                         help='number of resources to show')
     parser.add_argument('-s', default=False, action='store_true',
                         help='show resource size')
+    parser.add_argument('-j', default=8, type=int,
+                        help='number of resource sizes to look up '
+                             'concurrently')
+    parser.add_argument('--cached', default=False, action='store_true',
+                        help='use a recent listing from the local metadata '
+                             'cache if one is available')
+    parser.add_argument('--offline', default=False, action='store_true',
+                        help='list resources from the local metadata cache '
+                             'without connecting to HydroShare')
     parser.add_argument('-filter', nargs='*',
                         help='filter resource by metadata attribute, e.g '
                         'owner=<USERNAME> author=<USERNAME> '
@@ -135,12 +190,30 @@ def main(args):
             else:
                 sys.exit(1)
 
+    mc = metacache.shared()
+    if args.offline:
+        username = mc.get_setting('username') if mc is not None else None
+        filters = dict({'owner': username}, **filters)
+        resources = mc.get_listing(filters, args.n) if username else None
+        if resources is None:
+            print('- no matching resource listing found in the local cache, '
+                  'run this command without --offline first')
+            sys.exit(1)
+        print_cached_resource_list(resources, long_format=args.l,
+                                   size=args.s)
+        return
+
+    from hstools import hydroshare
+
     # connect to hydroshare
     hs = hydroshare.hydroshare()
     userinfo = hs.userInfo()
+    if mc is not None:
+        mc.put_setting('username', userinfo['username'])
 
     print_resource_list(hs, userinfo['username'], filter_dict=filters,
-                        count=args.n, long_format=args.l, size=args.s)
+                        count=args.n, long_format=args.l, size=args.s,
+                        jobs=args.j, cached=args.cached)
 
 
 def short_help():
@@ -152,7 +225,9 @@ def long_help():
               to limit which resources will be returned. For additional
               resource details, use the "-l" flag to print extra metadata. By
               default, all resources owned by the authenticated user will be
-              returned, this can be limited using the "-n" flag.
+              returned, this can be limited using the "-n" flag. Listings
+              are saved in a local metadata cache that can be used with the
+              "--cached" and "--offline" flags.
            """
 
 
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import argparse
+from hstools import log, checksum, inventory, progress
+from hstools.funcs import add
+
+logger = log.logger
+
+
+def local_files(directory, jobs=1):
+
+    files = {}
+    for rel, f in inventory.iter_files(directory, jobs=jobs, sizes=True):
+        files[rel] = (f.path, f.size)
+    return files
+
+
+def remote_files(hs, resid, jobs=4):
+
+    files = {}
+    for f in hs.iterResourceFiles(resid, max_workers=jobs):
+        path = f['url'].split('/data/contents/', 1)[-1]
+        files[path] = (int(f.get('size', -1)), f.get('checksum'))
+    return files
+
+
+class SyncPlan(object):
+    def __init__(self, local, remote, hash_jobs=None):
+
+        """
+        Compares local files, {path: (local path, size)}, with the files of
+        a resource, {path: (size, md5 checksum or None)}. Files with equal
+        sizes are hashed to find changes, files with different sizes are
+        known to have changed without hashing them.
+        """
+
+        self.new = []
+        self.changed = []
+        self.unchanged = []
+
+        compare = []
+        for rel, (path, size) in local.items():
+            if rel not in remote:
+                self.new.append(rel)
+            elif remote[rel][0] != size:
+                self.changed.append(rel)
+            elif remote[rel][1]:
+                compare.append(rel)
+            else:
+                # without a remote checksum the size is all we can compare
+                self.unchanged.append(rel)
+
+        paths = [local[rel][0] for rel in compare]
+        digests = checksum.digest_files(paths, 'md5', hash_jobs)
+        for rel, (path, digest, err) in zip(compare, digests):
+            if err is None and digest == remote[rel][1].lower():
+                self.unchanged.append(rel)
+            else:
+                self.changed.append(rel)
+
+        self.orphans = sorted(set(remote) - set(local))
+
+    def uploads(self, local):
+        return [(local[rel][0], rel) for rel in sorted(self.new + self.changed)]
+
+
+def set_usage(parser):
+
+    optionals = []
+    for option in parser._get_optional_actions():
+        if len(option.option_strings) > 0:
+            ostring = f'[{option.option_strings[0]}]'
+            if '--' in ostring:
+                # place '--' args at end of usage
+                optionals.append(ostring)
+            else:
+                optionals.insert(0, ostring)
+
+    positionals = []
+    for pos in parser._get_positional_actions():
+        positionals.append(pos.dest)
+    parser.usage = f'%(prog)s {" ".join(positionals)} {" ".join(optionals)}'
+
+
+def add_arguments(parser):
+
+    parser.description = long_help()
+    parser.add_argument('directory', type=str,
+                        help='local directory to synchronize')
+    parser.add_argument('resource_id', type=str,
+                        help='unique HydroShare resource identifier')
+    parser.add_argument('--delete', action='store_true',
+                        help='remove resource files that do not exist in '
+                             'the local directory')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='print the changes that would be made, '
+                             'without changing the resource')
+    parser.add_argument('-j', '--jobs', default=4, type=int,
+                        help='number of files to upload concurrently')
+    parser.add_argument('--hash-jobs', default=None, type=int,
+                        help='number of processes used to compute local '
+                             'checksums, defaults to the number of cpus')
+    parser.add_argument('-v', default=True, action='store_true',
+                        help='verbose output')
+    parser.add_argument('-q', default=False, action='store_true',
+                        help='silent output')
+    set_usage(parser)
+
+
+def main(args):
+
+    from hstools import hydroshare
+
+    if args.v:
+        log.set_verbose()
+    if args.q:
+        log.set_quiet()
+
+    if not os.path.isdir(args.directory):
+        raise Exception(f'Could not find directory: {args.directory}')
+        sys.exit(1)
+
+    # connect to hydroshare
+    hs = hydroshare.hydroshare()
+    if hs is None:
+        raise Exception(f'Connection to HydroShare failed')
+        sys.exit(1)
+
+    local = local_files(args.directory, args.jobs)
+    try:
+        remote = remote_files(hs, args.resource_id, args.jobs)
+    except Exception:
+        raise Exception('Error connecting to HydroShare resource')
+
+    plan = SyncPlan(local, remote, hash_jobs=args.hash_jobs)
+    orphans = plan.orphans if args.delete else []
+    logger.info(f'+ {len(plan.new)} new, {len(plan.changed)} changed, '
+                f'{len(plan.unchanged)} unchanged file(s), '
+                f'{len(plan.orphans)} file(s) only in the resource')
+
+    # changed files are replaced, missing folders are created
+    upload_plan = add.UploadPlan(plan.uploads(local), remote.keys(),
+                                 overwrite=True)
+
+    if args.dry_run:
+        add.print_plan(upload_plan)
+        print(f'+ {len(orphans)} file(s) to remove')
+        for path in orphans:
+            print(f'   {path}')
+        return
+
+    failed = []
+    removals = upload_plan.replace + orphans
+    for path, err in add.remove_files(hs, args.resource_id, removals,
+                                      args.jobs):
+        if err is not None:
+            logger.error(f'- failed to remove {path}: {err}')
+            if path in orphans:
+                failed.append((path, None, err))
+
+    if len(upload_plan.folders) > 0:
+        hs.createResourceFolders(args.resource_id, upload_plan.folders,
+                                 max_workers=args.jobs)
+
+    st = time.time()
+    succeeded = []
+    nbytes = 0
+    if not args.q:
+        hs.progress = progress.TransferProgress(handler=log.handler)
+    try:
+        for src, tar, err in add.add_files(hs, args.resource_id,
+                                           upload_plan.uploads, args.jobs):
+            if err is None:
+                succeeded.append((src, tar))
+                nbytes += os.path.getsize(src)
+            else:
+                failed.append((src, tar, err))
+    finally:
+        if hs.progress is not None:
+            hs.progress.close()
+    add.print_summary(succeeded, failed, nbytes, time.time() - st)
+
+    if len(failed) > 0:
+        sys.exit(1)
+
+
+def short_help():
+    return 'Synchronize a local directory with a HydroShare resource'
+
+
+def long_help():
+    return """Synchronize a local directory with an existing HydroShare
+              resource. Local files are compared with the resource files
+              using their size and MD5 checksum, and only new or changed
+              files are uploaded. Checksums are computed in parallel, use
+              the "--hash-jobs" flag to set the number of processes. Files
+              that exist only in the resource are kept unless the
+              --delete option is used.
+           """
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=long_help())
+    add_arguments(parser)
+
+    args = parser.parse_args()
+    main(args)
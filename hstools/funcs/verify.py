@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import argparse
+from hstools import log, utilities
+
+logger = log.logger
+
+
+def find_bag(path, save_dir='.'):
+
+    # accept a bag directory or the id of a downloaded resource
+    if os.path.isdir(path):
+        return path
+    candidate = os.path.join(save_dir, path)
+    if os.path.isdir(candidate):
+        return candidate
+    return None
+
+
+def verify_bags(paths, save_dir='.', jobs=None):
+
+    from hstools import bagit
+
+    reports = []
+    for path in paths:
+        bagdir = find_bag(path, save_dir)
+        if bagdir is None:
+            reports.append({'bag': path,
+                            'valid': False,
+                            'files': 0,
+                            'bytes': 0,
+                            'elapsed': 0,
+                            'errors': [{'path': path,
+                                        'error': 'bag not found'}]})
+            continue
+        reports.append(bagit.verify_bag(bagdir, jobs=jobs))
+    return reports
+
+
+def print_report(report):
+
+    elapsed = report['elapsed']
+    rate = report['bytes'] / elapsed if elapsed > 0 else 0
+    if report['valid']:
+        print(f'+ {report["bag"]} is valid: {report["files"]} file(s), '
+              f'{utilities.sizeof_fmt(report["bytes"])} in {elapsed:.1f}s '
+              f'({utilities.sizeof_fmt(rate)}/s)')
+        return
+    print(f'- {report["bag"]} is invalid: '
+          f'{len(report["errors"])} error(s)')
+    for err in report['errors']:
+        print(f'   {err["path"]}: {err["error"]}')
+
+
+def set_usage(parser):
+
+    optionals = []
+    for option in parser._get_optional_actions():
+        if len(option.option_strings) > 0:
+            ostring = f'[{option.option_strings[0]}]'
+            if '--' in ostring:
+                # place '--' args at end of usage
+                optionals.append(ostring)
+            else:
+                optionals.insert(0, ostring)
+
+    positionals = []
+    for pos in parser._get_positional_actions():
+        positionals.append(pos.dest)
+    parser.usage = f'%(prog)s {" ".join(positionals)} {" ".join(optionals)}'
+
+
+def add_arguments(parser):
+
+    parser.description = long_help()
+    parser.add_argument('bag', nargs='+', type=str,
+                        help='downloaded resource directories, or the ids '
+                             'of resources in the save directory')
+    parser.add_argument('-d', '--save-dir', default='.',
+                        help='location of downloaded resources')
+    parser.add_argument('-j', '--jobs', default=None, type=int,
+                        help='number of processes used to compute '
+                             'checksums, defaults to the number of cpus')
+    parser.add_argument('--json', default=False, action='store_true',
+                        help='print the verification report as json')
+    parser.add_argument('-o', '--output', type=str,
+                        help='save the verification report as json')
+    set_usage(parser)
+
+
+def main(args):
+
+    reports = verify_bags(args.bag, args.save_dir, args.jobs)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print_report(report)
+
+    if not all(r['valid'] for r in reports):
+        sys.exit(1)
+
+
+def short_help():
+    return 'Verify the integrity of downloaded resources'
+
+
+def long_help():
+    return """Verify that the files of downloaded HydroShare resources match
+              the checksums in their bag manifests. Files are hashed in
+              parallel, use the "-j" flag to set the number of processes.
+              The report can be printed or saved as json for use by other
+              tools.
+           """
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=long_help())
+    add_arguments(parser)
+
+    args = parser.parse_args()
+    main(args)
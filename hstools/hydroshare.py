@@ -3,17 +3,29 @@
 from __future__ import print_function
 import os
 import getpass
-import glob
 from hs_restclient import HydroShare, HydroShareAuthBasic, HydroShareAuthOAuth2
-from hs_restclient import HydroShareHTTPException
+from hs_restclient import HydroShareHTTPException, HydroShareNotFound
 from datetime import datetime as dt
 import pickle
 import shutil
-
+import time
+import uuid
+import tempfile
+import requests
 import zipfile
+import collections
+from concurrent.futures import CancelledError
 
-from . import threads
+from . import paging
+from . import bagit
+from . import metacache
 from . import resource
+from . import retry
+from . import scheduler
+from . import streamzip
+from . import download
+from . import inventory
+from . import localindex
 from . import utilities
 from . import auth
 from . import log
@@ -21,16 +33,37 @@ from .compat import *
 
 logger = log.logger
 
+# authenticated clients that are shared by all hydroshare instances in a
+# long-lived process (e.g. the hs agent), keyed by auth file. None unless
+# enabled with share_clients().
+_shared_clients = None
+
+
+def share_clients():
+    """Reuses authenticated clients, and their open connections, across
+    hydroshare instances created in this process.
+    """
+
+    global _shared_clients
+    if _shared_clients is None:
+        _shared_clients = {}
+
 
 class hydroshare():
-    def __init__(self, save_dir=None, authfile='~/.hs_auth'):
+    def __init__(self, save_dir=None, authfile='~/.hs_auth', cache=True):
 
         """
         save_dir is the location that data will hs resources will be saved.
+        cache reuses a recently validated session instead of authorizing
+        with HydroShare again.
         """
 
         self.hs = None
         self.content = {}
+
+        # display of the bytes that are uploaded and downloaded, see
+        # progress.TransferProgress
+        self.progress = None
         self.authfile = os.path.expanduser(authfile)
 
         # get the download directory from ENV_VAR or input
@@ -44,26 +77,44 @@ class hydroshare():
                             "Set this using the 'save_dir' input argument or "
                             "the JUPYTER_DOWNLOADS environment variable")
 
-        # try to login via oauth
-        if self.hs is None:
-            try:
-                self.hs = auth.oauth2_authorization(self.authfile)
-            except Exception:
-                pass
-
-        # try to login via basic auth
-        if self.hs is None:
-            try:
-                self.hs = auth.basic_authorization(self.authfile)
-            except Exception:
-                pass
-
-        if self.hs is None:
-            raise Exception(f'Authentication failed using: {self.authfile}')
+        # reuse a client that is already connected in this process
+        key = None
+        if _shared_clients is not None and os.path.exists(self.authfile):
+            key = (self.authfile, os.stat(self.authfile).st_mtime)
+            if key in _shared_clients:
+                self.hs, self.user_info = _shared_clients[key]
+                return
 
-        # get user info
-        self.user_info = self.hs.getUserInfo()
+        self._login(cache)
 
+        # transient failures of the requests made by this client are
+        # retried, see retry.RetryPolicy
+        retry.install(self.hs)
+
+        if key is not None:
+            _shared_clients[key] = (self.hs, self.user_info)
+
+    def _login(self, cache=True):
+        """Authorizes with HydroShare using the auth file.
+        """
+
+        # reuse a session that was recently validated by another call
+        if cache:
+            cached = auth.load_cached_authorization(self.authfile)
+            if cached is not None:
+                self.hs, self.user_info = cached
+                return
+
+        # try to login via oauth, then basic auth. This also returns the
+        # user info used to validate the credentials
+        try:
+            mode, self.hs, self.user_info = auth.authorize(self.authfile)
+        except Exception:
+            raise Exception(f'Authentication failed using: {self.authfile}')
+
+        if cache:
+            auth.save_cached_authorization(self.authfile, mode,
+                                           self.hs, self.user_info)
 
     def close(self):
         """
@@ -81,35 +132,178 @@ class hydroshare():
         -- resid: hydroshare resource id
 
         returns:
-        -- True if successful, else False
+        -- True if successful, else False. Raises HydroShareNotFound if the
+           resource does not exist.
         """
 
         try:
             self.hs.deleteResource(resid)
+            self._forgetResource(resid)
             logger.info(f'+ successfully removed resource: {resid}')
+        except HydroShareNotFound:
+            logger.error(f'- resource not found: {resid}')
+            raise
         except Exception as e:
             logger.error(f'- failed to remove resource: {resid}')
             raise Exception(e)
 
         return True
 
-    def getResourceMetadata(self, resid):
+    def _resourceModified(self, resid):
+        """Gets the modified date of a resource, trusting the date in the
+        metadata cache if it was checked recently.
+
+        returns:
+        -- (modified date, system metadata or None if not fetched)
+        """
+
+        mc = metacache.shared()
+        if mc is not None:
+            modified = mc.modified(resid, max_age=metacache.METADATA_CACHE_TTL)
+            if modified is not None:
+                return modified, None
+
+        system_meta = self.hs.getSystemMetadata(resid)
+        modified = system_meta['date_last_updated']
+        if mc is not None:
+            mc.set_modified(resid, modified)
+            mc.put(resid, metacache.SYSMETA, modified, system_meta)
+        return modified, system_meta
+
+    def _forgetResource(self, resid):
+        """Removes a resource from the metadata cache after it was changed.
+        """
+
+        mc = metacache.shared()
+        if mc is not None:
+            mc.remove(resid)
+
+    def getResourceMetadata(self, resid, cached=False):
         """Gets metadata for a specified resource.
 
         args:
         -- resid: hydroshare resource id
+        -- cached: use metadata from the local cache if the resource has not
+                   been modified since it was cached (bool, default=>False)
 
         returns:
         -- resource metadata object
         """
 
-        science_meta = self.hs.getScienceMetadata(resid)
-        system_meta = self.hs.getSystemMetadata(resid)
+        mc = metacache.shared()
+        system_meta = None
+        if cached and mc is not None:
+            modified, system_meta = self._resourceModified(resid)
+            if system_meta is None:
+                system_meta = mc.get(resid, metacache.SYSMETA, modified)
+            science_meta = mc.get(resid, metacache.SCIMETA, modified)
+            if system_meta is not None and science_meta is not None:
+                return resource.ResourceMetadata(system_meta, science_meta)
+
+        # the two metadata documents are independent requests
+        if system_meta is None:
+            future = scheduler.shared().submit(self.hs.getSystemMetadata,
+                                               (resid,),
+                                               kind=scheduler.METADATA)
+            science_meta = self.hs.getScienceMetadata(resid)
+            system_meta = future.result()
+        else:
+            science_meta = self.hs.getScienceMetadata(resid)
+
+        if mc is not None:
+            modified = system_meta['date_last_updated']
+            mc.set_modified(resid, modified)
+            mc.put(resid, metacache.SYSMETA, modified, system_meta)
+            mc.put(resid, metacache.SCIMETA, modified, science_meta)
+
         return resource.ResourceMetadata(system_meta, science_meta)
 
+    def iterResources(self, filters={}, count=None, prefetch=2,
+                      page_size=None):
+        """Iterates over the resources matching a set of filters. Pages
+        of results are fetched ahead of time in a background thread and
+        the page size adapts to the server latency.
+
+        args:
+        -- filters: resource list filters, e.g. {'owner': 'user'} (dict)
+        -- count: maximum number of resources to return (int, default=>all)
+        -- prefetch: number of pages to fetch ahead (int, default=>2)
+        -- page_size: fixed page size, disables the adaptive page size
+                      (int, default=>None)
+
+        returns:
+        -- generator of resource dicts
+        """
+
+        if page_size is not None:
+            sizer = paging.AdaptivePageSize(page_size, page_size, page_size)
+        elif count is not None and count < 25:
+            # don't fetch more resources than will be shown
+            sizer = paging.AdaptivePageSize(max(count, 1), maximum=100)
+        else:
+            sizer = paging.AdaptivePageSize(25, maximum=100)
+
+        url = f'{self.hs.url_base}/resource/'
+        mc = metacache.shared()
+
+        def pages():
+            # the resource ids of the listing are cached page by page, so
+            # memory does not grow with the number of resources
+            if mc is not None:
+                mc.start_listing(filters)
+
+            offset = 0
+            while count is None or offset < count:
+                page, size = sizer.page(offset)
+                params = dict(filters, count=size, page=page)
+
+                st = time.time()
+                r = self.hs._request('GET', url, params=params)
+                if r.status_code != 200:
+                    raise HydroShareHTTPException(r)
+                dat = r.json()
+                results = dat['results']
+
+                if 0 < len(results) < size and dat.get('next'):
+                    # the server caps the page size, retry this offset
+                    # with a size it accepts
+                    sizer.limit(offset, len(results))
+                    continue
+
+                if count is not None:
+                    results = results[:count - offset]
+
+                # listings carry the modified date of each resource, which
+                # keeps the metadata cache current
+                if mc is not None:
+                    for resource in results:
+                        mc.set_modified(resource['resource_id'],
+                                        resource['date_last_updated'],
+                                        listing=resource)
+                    mc.add_to_listing(filters, offset,
+                                      [resource['resource_id']
+                                       for resource in results])
+                offset += len(results)
+                yield results
+
+                if not dat.get('next') or len(results) == 0:
+                    if mc is not None:
+                        mc.finish_listing(filters, complete=True)
+                    return
+                sizer.observe(offset, time.time() - st)
+
+            # the listing was truncated at count resources
+            if mc is not None:
+                mc.finish_listing(filters, complete=False)
+
+        for results in paging.prefetch(pages(), prefetch,
+                                       kind=scheduler.METADATA):
+            yield from results
+
     def createResource(self, abstract, title,
                        keywords=[],
-                       content_files=[]):
+                       content_files=[],
+                       bundle=False):
         """Creates a hydroshare resource.
 
         args:
@@ -117,6 +311,8 @@ class hydroshare():
         -- title: title of resource (str, required)
         -- keywords: list of subject keywords (list, default=>[])
         -- content_files: data to save as resource content (list, default=>[])
+        -- bundle: upload the content files as a single zip archive that is
+                   unzipped by HydroShare (bool, default=>False)
 
         returns:
         -- resource_id
@@ -129,17 +325,18 @@ class hydroshare():
 
         resid = None
 
-        f = None if len(content_files) == 0 else content_files[0]
-
         logger.info(f'+ creating resource')
         resid = self.hs.createResource('CompositeResource',
                                        title=title,
                                        abstract=abstract,
                                        keywords=keywords)
 
-        # add the remaining content files to the hs resource
+        # add the content files to the hs resource
         try:
-            if len(content_files) > 1:
+            if len(content_files) > 0 and bundle:
+                files = [(cf, os.path.basename(cf)) for cf in content_files]
+                self.addBundleToExistingResource(resid, files)
+            elif len(content_files) > 0:
                 # loop over each file and add it to the new HS resource
                 for cf in content_files:
                     self.addContentToExistingResource(resid,
@@ -149,59 +346,406 @@ class hydroshare():
 
         return resid
 
-    def getResource(self, resourceid):
+    def getResource(self, resourceid, stream=False, members=None,
+                    verify=False, cancel=None):
         """Downloads content of a hydroshare resource.
 
         args:
         -- resourceid: id of the hydroshare resource (str)
+        -- stream: extract the bag while it downloads instead of saving the
+                   zip archive first. Streamed downloads cannot be resumed
+                   (bool, default=>False)
+        -- members: glob patterns of bag members to extract, e.g. ['*.csv']
+                    (list, default=>all)
+        -- verify: check the extracted files against the bag manifests
+                   (bool, default=>False)
+        -- cancel: stops the download when set (threading.Event,
+                   default=>None)
 
         returns:
-        -- None
+        -- path to the downloaded resource, or None if the download failed
         """
 
-        dst = self.download_dir
-
         try:
-            logger.info(f'+ downloading resource: {resourceid}')
-            self.hs.getResource(resourceid,
-                                destination=dst,
-                                unzip=False)
-
-            logger.info('Successfully downloaded resource %s' % resourceid)
-
+            return self._downloadResource(resourceid, stream, members,
+                                          verify, cancel)
         except Exception as e:
             logger.error('Failed to retrieve '
                          'resource content from HydroShare: %s' % e)
             return None
 
-        archive = f'{os.path.join(dst, resourceid)}.zip'
-        with zipfile.ZipFile(archive, 'r') as zip_ref:
-            zip_ref.extractall(f'{os.path.join(dst)}')
+    def getResources(self, resourceids, max_workers=4, stream=False,
+                     members=None, verify=False):
+        """Downloads the content of many hydroshare resources concurrently.
+
+        Downloads and extractions run on the workers of the shared
+        scheduler, using this instance's authenticated session.
+
+        args:
+        -- resourceids: ids of the hydroshare resources (list)
+        -- max_workers: maximum number of concurrent downloads (int, default=>4)
+        -- stream: extract bags while they download (bool, default=>False)
+        -- members: glob patterns of bag members to extract (list, default=>all)
+        -- verify: check the extracted files against the bag manifests
+                   (bool, default=>False)
+
+        returns:
+        -- generator of (resourceid, path, error) tuples, yielded as each
+           download finishes. path is None and error is set on failure,
+           failures are not logged.
+        """
+
+        # remove duplicate ids while preserving order
+        resourceids = list(dict.fromkeys(resourceids))
+        max_workers = max(1, min(max_workers, len(resourceids)))
+        self.setConnectionPoolSize(max_workers)
+
+        # queued downloads are cancelled if the caller stops iterating
+        # early. The index of the download directory is saved once, after
+        # the batch
+        try:
+            with scheduler.shared().group(scheduler.TRANSFER,
+                                          limit=max_workers) as group:
+                futures = {group.submit(self._downloadResource, resid,
+                                        stream, members, verify,
+                                        save_index=False): resid
+                           for resid in resourceids}
+                for future in group.as_completed():
+                    resid = futures[future]
+                    # errors are reported by the caller
+                    try:
+                        yield resid, future.result(), None
+                    except Exception as e:
+                        yield resid, None, e
+        finally:
+            self._saveIndex()
+
+    def _downloadResource(self, resourceid, stream=False, members=None,
+                          verify=False, cancel=None, save_index=True):
+        """Downloads and extracts the bag of a hydroshare resource.
+
+        Raises an exception if the download or verification fails, or a
+        concurrent.futures.CancelledError if cancel was set. save_index
+        saves the index of the download directory, batches of downloads
+        save it once they are done.
+        """
+
+        dst = self.download_dir
+
+        logger.info(f'+ downloading resource: {resourceid}')
+        if stream:
+            # members are written to dst as they arrive, the zip archive
+            # itself is never stored on disk
+            chunks = self.hs.getResource(resourceid, destination=None)
+            if self.progress is None:
+                streamzip.extract(self._countChunks(chunks, None, cancel),
+                                  dst, members=members)
+            else:
+                with self.progress.transfer(f'{resourceid}.zip') as t:
+                    streamzip.extract(self._countChunks(chunks, t, cancel),
+                                      dst, members=members)
+            logger.info('Successfully downloaded resource %s' % resourceid)
+        else:
+            # the bag is saved to <resid>.zip.part until it is complete, so
+            # an interrupted download resumes on the next call
+            archive = download.download_bag(self.hs, resourceid, dst,
+                                            progress=self.progress,
+                                            cancel=cancel)
+
+            logger.info('Successfully downloaded resource %s' % resourceid)
+
+            with zipfile.ZipFile(archive, 'r') as zip_ref:
+                names = None
+                if members is not None:
+                    names = streamzip.match_members(zip_ref.namelist(),
+                                                    members)
+                zip_ref.extractall(f'{os.path.join(dst)}', members=names)
             os.remove(archive)
 
-        return os.path.join(dst, resourceid)
+        path = os.path.join(dst, resourceid)
+        self._indexResource(resourceid, path, save_index)
+        if verify:
+            self._verifyBag(path, missing_ok=members is not None)
+        return path
+
+    def _indexResource(self, resid, path, save=True):
+        """Adds a downloaded resource to the index of the download
+        directory. The index is only a cache, so failing to update it
+        does not fail the download.
+        """
+
+        try:
+            localindex.index_for(self.download_dir).add(resid, path,
+                                                        save=save)
+        except Exception as e:
+            logger.warning(f'- could not index resource {resid}: {e}')
+
+    def _saveIndex(self):
+        try:
+            localindex.index_for(self.download_dir).flush()
+        except Exception as e:
+            logger.warning(f'- could not save the resource index: {e}')
+
+    def _countChunks(self, chunks, transfer, cancel=None):
+        for chunk in chunks:
+            if cancel is not None and cancel.is_set():
+                raise CancelledError('Download was cancelled')
+            if transfer is not None:
+                transfer.update(len(chunk))
+            yield chunk
+
+    def _verifyBag(self, path, missing_ok=False):
+        """Verifies a downloaded bag, raising an exception if any file does
+        not match the bag manifests.
+        """
+
+        logger.info(f'+ verifying: {path}')
+        report = bagit.verify_bag(path, missing_ok=missing_ok)
+        if not report['valid']:
+            for err in report['errors']:
+                logger.error(f'- {err["path"]}: {err["error"]}')
+            raise Exception(f'Bag verification failed for {path}: '
+                            f'{len(report["errors"])} error(s)')
+        return report
+
+    def updateResource(self, resourceid, max_workers=4, verify=False):
+        """Brings a previously downloaded resource up to date by
+        downloading only the files that are new or have changed, using
+        the checksums in the local bag manifest. Local files that are no
+        longer part of the resource are removed and the bag manifests and
+        bag-info.txt are rewritten, so the directory remains a valid bag.
+        Resources that have not been downloaded yet are downloaded in full.
+
+        args:
+        -- resourceid: id of the hydroshare resource (str)
+        -- max_workers: maximum number of concurrent downloads (int, default=>4)
+        -- verify: check the updated bag against its manifests
+                   (bool, default=>False)
+
+        returns:
+        -- path to the updated resource
+        """
+
+        bagdir = os.path.join(self.download_dir, resourceid)
+        manifest = bagit.manifest_path(bagdir)
+        if not os.path.exists(manifest):
+            return self._downloadResource(resourceid, verify=verify)
+
+        logger.info(f'+ updating resource: {resourceid}')
+        local = bagit.read_manifest(manifest)
+        prefix = 'data/contents/'
+
+        # files that are missing locally or whose checksum (or size, if
+        # the server does not report a checksum) differs
+        remote = set()
+        fetch = []
+        for f in self.iterResourceFiles(resourceid, max_workers):
+            name = f['url'].split('/data/contents/', 1)[-1]
+            rel = prefix + name
+            remote.add(rel)
+            path = os.path.join(bagdir, rel)
+            if not os.path.exists(path) or rel not in local:
+                fetch.append(name)
+            elif f.get('checksum'):
+                if f['checksum'].lower() != local[rel]:
+                    fetch.append(name)
+            elif int(f.get('size', -1)) != os.path.getsize(path):
+                fetch.append(name)
+
+        # local files that were removed from the resource
+        stale = set(rel for rel in local if rel.startswith(prefix))
+        contents = os.path.join(bagdir, 'data', 'contents')
+        for rel, f in inventory.iter_files(contents):
+            if f.name.endswith('.part') or f.name.endswith('.part.json'):
+                # partial downloads are resumed
+                continue
+            stale.add(prefix + rel)
+        stale -= remote
+
+        logger.info(f'+ {len(fetch)} file(s) to download, '
+                    f'{len(stale)} to remove')
+
+        self.setConnectionPoolSize(max_workers)
+        with scheduler.shared().group(scheduler.TRANSFER,
+                                      limit=max_workers) as group:
+            for name in fetch:
+                group.submit(download.download_file, self.hs, resourceid,
+                             name, os.path.join(bagdir, prefix + name),
+                             self.progress)
+            for future in group.as_completed():
+                future.result()
+
+        for rel in stale:
+            path = os.path.join(bagdir, rel)
+            if os.path.exists(path):
+                logger.info(f'- removing: {rel}')
+                os.remove(path)
+        for root, dirs, names in os.walk(contents, topdown=False):
+            if root != contents and len(os.listdir(root)) == 0:
+                os.rmdir(root)
+
+        # the resource metadata documents are part of the payload. They
+        # are written as received, hs_restclient returns the repr of the
+        # response bytes instead of the xml
+        changed = [prefix + name for name in fetch]
+        base = self.hs.url_base
+        for rel, url in [('data/resourcemetadata.xml',
+                          f'{base}/scimeta/{resourceid}/'),
+                         ('data/resourcemap.xml',
+                          f'{base}/resource/{resourceid}/map/')]:
+            if rel in local:
+                content = self._getDocument(url)
+                with open(os.path.join(bagdir, rel), 'wb') as f:
+                    f.write(content)
+                changed.append(rel)
+
+        entries = bagit.update_manifests(bagdir, changed, stale)
+        bagit.update_bag_info(bagdir, entries)
+        bagit.update_tag_manifests(bagdir)
+
+        self._indexResource(resourceid, bagdir)
+        logger.info('Successfully updated resource %s' % resourceid)
+        if verify:
+            self._verifyBag(bagdir)
+        return bagdir
+
+    def _getDocument(self, url):
+        """Gets the raw content of a hydroshare document, e.g. the
+        science metadata or resource map of a resource.
+
+        args:
+        -- url: url of the document (str)
+
+        returns:
+        -- bytes
+        """
+
+        if self.hs.use_https:
+            url = url.replace('http://', 'https://', 1)
+        r = self.hs._request('GET', url)
+        if r.status_code != 200:
+            raise HydroShareHTTPException(r)
+        return r.content
+
+    def setConnectionPoolSize(self, size):
+        """Sizes the session connection pool so that concurrent requests
+        reuse connections instead of opening new ones. Methods that take
+        max_workers size the pool themselves, callers that make their own
+        concurrent requests use this. hs_restclient replaces the session
+        after a connection error, the new session is sized again.
 
-    def getResourceFiles(self, resid):
+        args:
+        -- size: number of connections kept per host (int)
         """
-        returns a list of files in a hydroshare resource
+
+        client = self.hs
+
+        def mount():
+            adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=client.pool_size,
+                    pool_maxsize=client.pool_size)
+            client.session.mount('https://', adapter)
+            client.session.mount('http://', adapter)
+
+        initialize = getattr(client, '_initializeSession', None)
+        if initialize is not None and \
+                getattr(client, 'pool_size', None) is None:
+
+            def _initializeSession():
+                initialize()
+                mount()
+            client._initializeSession = _initializeSession
+
+        client.pool_size = size
+        mount()
+
+    def iterResourceFiles(self, resid, max_workers=1):
+        """Iterates over the files of a hydroshare resource, following every
+        page of the paginated file listing. Only the pages that are being
+        fetched are held in memory.
+
+        args:
+        -- resid: hydroshare resource id (str)
+        -- max_workers: number of pages to fetch concurrently once the
+                        number of pages is known (int, default=>1)
+
+        returns:
+        -- generator of file dicts
+        """
+
+        url = f'{self.hs.url_base}/resource/{resid}/files/'
+
+        def fetch(url, params=None):
+            if self.hs.use_https:
+                url = url.replace('http://', 'https://', 1)
+            r = self.hs._request('GET', url, params=params)
+            if r.status_code != 200:
+                raise HydroShareHTTPException(r)
+            return r.json()
+
+        dat = fetch(url)
+        results = dat.get('results', [])
+        yield from results
+
+        if max_workers <= 1 or len(results) == 0 or \
+                dat.get('count') is None:
+            # follow the next links one page at a time
+            while dat.get('next'):
+                dat = fetch(dat['next'])
+                yield from dat.get('results', [])
+            return
+
+        # the first page determines the page size and number of pages
+        npages = -(-dat['count'] // len(results))
+        pending = collections.deque()
+
+        # queued requests are cancelled if the caller stops iterating early
+        with scheduler.shared().group(scheduler.METADATA,
+                                      limit=max_workers) as group:
+            for page in range(2, npages + 1):
+                pending.append(group.submit(fetch, url, {'page': page}))
+                if len(pending) >= max_workers:
+                    yield from pending.popleft().result().get('results', [])
+            while len(pending) > 0:
+                yield from pending.popleft().result().get('results', [])
+
+    def getResourceFiles(self, resid, cached=False, max_workers=1):
         """
+        returns a list of files in a hydroshare resource. If cached is True
+        the file list is taken from the metadata cache when the resource
+        has not been modified since it was cached. max_workers is the number
+        of pages of the file listing to fetch concurrently.
+        """
+
+        mc = metacache.shared()
+        modified = None
         try:
-            response = self.hs.resource(resid).files.all()
+            if cached and mc is not None:
+                modified, _ = self._resourceModified(resid)
+                files = mc.get(resid, metacache.FILES, modified)
+                if files is not None:
+                    return files
+            elif mc is not None:
+                # store the files under the last known modified date, a
+                # newer date invalidates them
+                modified = mc.modified(resid)
+            files = list(self.iterResourceFiles(resid, max_workers))
         except Exception:
             raise Exception(f'Failed to get list of files for resouce {resid}')
 
-        dat = response.json()
-        if 'results' in dat.keys():
-            return dat['results']
-        return []
+        if modified is not None:
+            mc.put(resid, metacache.FILES, modified, files)
+        return files
 
-    def addContentToExistingResource(self, resid, source, target=None):
+    def addContentToExistingResource(self, resid, source, target=None,
+                                     cancel=None):
         """Adds content files to an existing hydroshare resource.
 
         args:
         -- resid: id of an existing hydroshare resource (str)
         -- source: file path to be added to resource
         -- target: target path relative to the root directory of the resource
+        -- cancel: stops the upload when set (threading.Event, default=>None)
 
         returns:
         -- None
@@ -209,14 +753,168 @@ class hydroshare():
 
         # make sure input files exist
         if not os.path.exists(source):
-            raise Exception(f'Could not find file: {f}')
+            raise Exception(f'Could not find file: {source}')
         
         if target is None:
             logger.info(f'+ adding: {source}')
         else:
             logger.info(f'+ adding: {source} -> {target}')
 
-        self.hs.addResourceFile(resid, source, target)
+        self._uploadFile(resid, source, target, cancel)
+        self._forgetResource(resid)
+
+        return resid
+
+    def _uploadFile(self, resid, source, target=None, cancel=None):
+        """Uploads a file to a resource, reporting the bytes sent to
+        self.progress. The upload is aborted with a
+        concurrent.futures.CancelledError once cancel is set.
+        """
+
+        def check():
+            if cancel is not None and cancel.is_set():
+                raise CancelledError(f'Upload of {source} was cancelled')
+
+        if self.progress is None:
+            if cancel is None:
+                return self.hs.addResourceFile(resid, source, target)
+            # the monitor calls back as the request body is read
+            return self.hs.addResourceFile(resid, source, target,
+                                           progress_callback=lambda m: check())
+
+        def report(monitor, transfer):
+            check()
+            transfer.set(monitor.bytes_read, monitor.len)
+
+        with self.progress.transfer(target or os.path.basename(source),
+                                    os.path.getsize(source)) as t:
+            # the monitor counts the bytes of the multipart request body
+            return self.hs.addResourceFile(
+                    resid, source, target,
+                    progress_callback=lambda m: report(m, t))
+
+    def createResourceFolders(self, resid, folders, max_workers=4):
+        """Creates folders in a hydroshare resource. Folders are created
+        one depth level at a time, so parents exist before their children,
+        and the folders of each level are created concurrently.
+
+        args:
+        -- resid: id of an existing hydroshare resource (str)
+        -- folders: folder paths relative to the root directory of the
+                    resource (list)
+        -- max_workers: maximum number of concurrent requests (int, default=>4)
+
+        returns:
+        -- list of folders that could not be created
+        """
+
+        levels = {}
+        for folder in set(f.strip('/') for f in folders):
+            if folder != '':
+                levels.setdefault(folder.count('/'), []).append(folder)
+
+        def create(folder):
+            logger.info(f'+ creating resource directory: {folder}')
+            self.hs.createResourceFolder(resid, pathname=folder)
+
+        failed = []
+        for level in sorted(levels):
+            with scheduler.shared().group(scheduler.METADATA,
+                                          limit=max_workers) as group:
+                futures = {group.submit(create, f): f
+                           for f in levels[level]}
+                for future in group.as_completed():
+                    # the file listing does not include empty folders, so
+                    # a folder may already exist
+                    if future.exception() is not None:
+                        failed.append(futures[future])
+        return failed
+
+    def addFilesToExistingResource(self, resid, files, max_workers=4):
+        """Adds many content files to an existing hydroshare resource
+        concurrently. Uploads that fail while connecting to HydroShare are
+        retried by the retry policy of the client, see retry.RetryPolicy.
+        Uploads that may have reached HydroShare are not repeated.
+
+        args:
+        -- resid: id of an existing hydroshare resource (str)
+        -- files: (source, target) path pairs, where target is relative to
+                  the root directory of the resource or None (list)
+        -- max_workers: maximum number of concurrent uploads (int, default=>4)
+
+        returns:
+        -- generator of (source, target, error) tuples, yielded as each
+           upload finishes. error is None if the upload succeeded.
+        """
+
+        if len(files) == 0:
+            return
+        max_workers = max(1, min(max_workers, len(files)))
+        self.setConnectionPoolSize(max_workers)
+
+        # queued uploads are cancelled if the caller stops iterating early
+        with scheduler.shared().group(scheduler.TRANSFER,
+                                      limit=max_workers) as group:
+            futures = {group.submit(self.addContentToExistingResource,
+                                    resid, src, tar): (src, tar)
+                       for src, tar in files}
+            for future in group.as_completed():
+                src, tar = futures[future]
+                try:
+                    future.result()
+                    yield src, tar, None
+                except Exception as e:
+                    logger.error(f'- failed to add {src}: {e}')
+                    yield src, tar, e
+
+    def addBundleToExistingResource(self, resid, files, overwrite=False):
+        """Adds many content files to an existing hydroshare resource using
+        a single upload. The files are packed into a zip archive that is
+        unzipped in place by HydroShare, preserving their target paths.
+
+        args:
+        -- resid: id of an existing hydroshare resource (str)
+        -- files: (source, target) path pairs, where target is relative to
+                  the root directory of the resource (list)
+        -- overwrite: replace existing resource files (bool, default=>False)
+
+        returns:
+        -- resid
+        """
+
+        for src, tar in files:
+            if not os.path.exists(src):
+                raise Exception(f'Could not find file: {src}')
+
+        name = f'hstools-bundle-{uuid.uuid4().hex}.zip'
+        fd, archive = tempfile.mkstemp(suffix='.zip')
+        os.close(fd)
+        try:
+            # zipfile copies each source in chunks, so the archive is
+            # never held in memory
+            logger.info(f'+ bundling {len(files)} file(s)')
+            with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as z:
+                for src, tar in files:
+                    z.write(src, arcname=tar.strip('/'))
+
+            logger.info(f'+ adding: {name}')
+            self._uploadFile(resid, archive, name)
+
+            logger.info(f'+ unzipping: {name}')
+            r = self.hs.resource(resid).functions.unzip(
+                    {'zip_with_rel_path': name,
+                     'remove_original_zip': 'true',
+                     'overwrite': 'true' if overwrite else 'false'})
+            if r.status_code != 200:
+                # do not leave the archive behind in the resource
+                try:
+                    self.hs.deleteResourceFile(resid, name)
+                except Exception:
+                    pass
+                raise HydroShareHTTPException(r)
+        finally:
+            os.remove(archive)
+            self._forgetResource(resid)
 
         return resid
 
@@ -232,28 +930,20 @@ class hydroshare():
 
         resdir = utilities.find_resource_directory(resourceid)
         if resdir is None:
-            logger.error(f'Could not find any resource matching the id {resource}')
+            logger.error(f'Could not find any resource matching the id '
+                         f'{resourceid}')
             return
 
-        # create search paths.
-        # Need to check 2 paths due to hs_restclient bug #63.
-        search_paths = [os.path.join(resdir, f'{resourceid}/data/contents/*'),
-                        os.path.join(resdir, 'data/contents/*')]
-
-        content = {}
-        found_content = False
-        for p in search_paths:
-            content_files = glob.glob(p)
-            if len(content_files) > 0:
-                found_content = True
-                logger.info(f'Downloaded content is located at: {resdir}')
-                logger.info(f'Found {len(content_files)} content file(s)')
-            for f in content_files:
-                fname = os.path.basename(f)
-                content[fname] = f
-        if len(content.keys()) == 0:
+        # content files are listed in the local resource index, which
+        # includes <resdir>/<resid>/data/contents due to hs_restclient
+        # bug #63
+        content = utilities.get_hs_content(resourceid)
+        if len(content.keys()) > 0:
+            logger.info(f'Downloaded content is located at: {resdir}')
+            logger.info(f'Found {len(content)} content file(s)')
+        else:
             logger.error('Did not find any content files for resource id: '
-                  '{resourceid}')
+                         f'{resourceid}')
 
         self.content = content
 
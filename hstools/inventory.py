@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+"""
+Inventory of local directory trees built on os.scandir. Each directory is
+listed once and the type, and optionally the size, of its entries are
+taken from the cached DirEntry information instead of separate stat
+calls. Walks can be limited to a depth, in which case deeper directories
+are never listed, and subdirectories can be listed ahead of time by the
+workers of the shared scheduler, which helps on network file systems.
+"""
+
+import os
+import collections
+
+from . import scheduler
+
+# a directory entry. target is the link target for symbolic links and
+# size is None unless sizes were requested
+Entry = collections.namedtuple('Entry', ['path', 'name', 'is_dir',
+                                         'is_link', 'size', 'target'])
+
+# the entries of a directory. rel is the path relative to the walked root,
+# using "/" as separator, and level is 0 for the root
+Listing = collections.namedtuple('Listing', ['path', 'rel', 'level',
+                                             'dirs', 'files'])
+
+
+def list_dir(path, sizes=False):
+    """Lists a directory.
+
+    args:
+    -- path: directory to list (str)
+    -- sizes: include the size of files (bool, default=>False)
+
+    returns:
+    -- ([directory Entry], [file Entry]) sorted by name. Symbolic links to
+       directories are listed as directories, like os.walk. Directories
+       that cannot be read are empty.
+    """
+
+    dirs, files = [], []
+    try:
+        with os.scandir(path) as it:
+            for e in it:
+                try:
+                    is_link = e.is_symlink()
+                    is_dir = e.is_dir()
+                    size = None
+                    if sizes and not is_dir:
+                        # the size of the file a link points to, which is
+                        # the file that is hashed and uploaded. Broken
+                        # links are skipped
+                        size = e.stat().st_size
+                    target = os.readlink(e.path) if is_link else None
+                except OSError:
+                    continue
+                entry = Entry(e.path, e.name, is_dir, is_link, size, target)
+                (dirs if is_dir else files).append(entry)
+    except OSError:
+        pass
+    dirs.sort(key=lambda e: e.name)
+    files.sort(key=lambda e: e.name)
+    return dirs, files
+
+
+def walk(root, depth=None, jobs=1, sizes=False):
+    """Walks a directory tree top-down, depth-first, in the same order as
+    os.walk. Symbolic links to directories are listed but not followed.
+
+    args:
+    -- root: directory to walk (str)
+    -- depth: deepest level to list, the root is level 0. Deeper
+              directories are not listed (int, default=>all)
+    -- jobs: number of directories listed at once (int, default=>1)
+    -- sizes: include the size of files (bool, default=>False)
+
+    returns:
+    -- generator of Listing
+    """
+
+    group = None
+    if jobs > 1:
+        group = scheduler.shared().group(scheduler.IO, limit=jobs)
+
+    def submit(path):
+        if group is None:
+            return None
+        return group.submit(list_dir, path, sizes)
+
+    stack = [(root, '', 0, submit(root))]
+    try:
+        while len(stack) > 0:
+            path, rel, level, future = stack.pop()
+            if future is None:
+                dirs, files = list_dir(path, sizes)
+            else:
+                dirs, files = future.result()
+            yield Listing(path, rel, level, dirs, files)
+
+            if depth is not None and level >= depth:
+                continue
+
+            # subdirectories are submitted in order, so they are listed
+            # roughly in the order they are visited
+            children = []
+            for d in dirs:
+                if not d.is_link:
+                    crel = f'{rel}/{d.name}' if rel else d.name
+                    children.append((d.path, crel, level + 1,
+                                     submit(d.path)))
+            stack.extend(reversed(children))
+    finally:
+        if group is not None:
+            # stop queued listings if the caller stops iterating early
+            group.cancel()
+            group.wait()
+
+
+def iter_files(root, jobs=1, sizes=False):
+    """Iterates over all files below a directory.
+
+    args:
+    -- root: directory to walk (str)
+    -- jobs: number of directories listed at once (int, default=>1)
+    -- sizes: include the size of files (bool, default=>False)
+
+    returns:
+    -- generator of (path relative to root using "/", Entry)
+    """
+
+    for listing in walk(root, jobs=jobs, sizes=sizes):
+        for f in listing.files:
+            rel = f'{listing.rel}/{f.name}' if listing.rel else f.name
+            yield rel, f
+
+
+def total_size(root, jobs=1):
+    """Computes the number and total size of the files below a directory.
+
+    args:
+    -- root: directory to walk (str)
+    -- jobs: number of directories listed at once (int, default=>1)
+
+    returns:
+    -- (number of files, bytes)
+    """
+
+    count = 0
+    nbytes = 0
+    for rel, f in iter_files(root, jobs=jobs, sizes=True):
+        count += 1
+        nbytes += f.size
+    return count, nbytes
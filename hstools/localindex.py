@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+"""
+Persistent index of the resources that were downloaded to a directory. For
+each resource the index stores its directory and content files, so finding
+a downloaded resource does not require walking the whole download
+directory. The index is stored in the hstools cache directory and is
+refreshed incrementally: directories whose modification time has not
+changed are not listed again, and resource directories are never
+descended into.
+"""
+
+import os
+import re
+import hashlib
+import threading
+
+from . import cache
+from . import inventory
+
+# hydroshare resource ids are 32 character hex strings
+RESID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+INDEX_VERSION = 1
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def is_resource_id(name):
+    return RESID_PATTERN.match(name) is not None
+
+
+def index_for(root):
+    """Gets the index of a download directory, shared by this process.
+
+    args:
+    -- root: download directory (str)
+
+    returns:
+    -- ResourceIndex
+    """
+
+    key = os.path.abspath(root)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = ResourceIndex(root)
+        return _indexes[key]
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ResourceIndex(object):
+    def __init__(self, root, path=None):
+
+        """
+        root is the download directory that is indexed. path is the index
+        file, by default a file in the hstools cache directory named after
+        the absolute path of root.
+        """
+
+        self.root = root
+        if path is None:
+            key = hashlib.sha1(os.path.abspath(root).encode()).hexdigest()
+            path = cache.cache_path(f'resource-index-{key}.json')
+        self.path = path
+        self.lock = threading.Lock()
+
+        data = cache.read_json(self.path)
+        if not isinstance(data, dict) or \
+                data.get('version') != INDEX_VERSION:
+            data = {}
+
+        # {relative dir: [mtime, [subdirectories], [resource ids]]}
+        self.dirs = data.get('dirs', {})
+
+        # {resource id: {'path': relative dir,
+        #                'stamps': {relative dir: mtime},
+        #                'files': {content file name: relative path}}}
+        self.resources = data.get('resources', {})
+
+    def save(self):
+        data = {'version': INDEX_VERSION,
+                'dirs': self.dirs,
+                'resources': self.resources}
+        try:
+            cache.write_json(self.path, data)
+        except Exception:
+            # the index is only a cache, lookups still work without it
+            pass
+
+    def _abs(self, rel):
+        return os.path.join(self.root, rel) if rel else self.root
+
+    def _scan_resource(self, rel):
+        """Lists the content files of a resource directory. Content is
+        found in <resdir>/data/contents and <resdir>/*/data/contents, the
+        latter due to hs_restclient bug #63.
+        """
+
+        resdir = self._abs(rel)
+        stamps = {rel: _mtime(resdir)}
+        candidates = [os.path.join(rel, 'data', 'contents')]
+        for d in inventory.list_dir(resdir)[0]:
+            candidates.append(os.path.join(rel, d.name, 'data', 'contents'))
+
+        files = {}
+        for crel in sorted(candidates):
+            mtime = _mtime(self._abs(crel))
+            if mtime is None:
+                continue
+            stamps[crel] = mtime
+            dirs, names = inventory.list_dir(self._abs(crel))
+            for entry in dirs + names:
+                files[entry.name] = os.path.join(crel, entry.name)
+        return {'path': rel, 'stamps': stamps, 'files': files}
+
+    def _current(self, entry):
+        return all(_mtime(self._abs(rel)) == mtime
+                   for rel, mtime in entry['stamps'].items())
+
+    def refresh(self):
+        """Updates the index with the resources in the download directory.
+        Only directories that changed since the last refresh are listed.
+        """
+
+        with self.lock:
+            dirs = {}
+            found = {}
+            stack = ['']
+            while len(stack) > 0:
+                rel = stack.pop()
+                mtime = _mtime(self._abs(rel))
+                if mtime is None:
+                    continue
+
+                record = self.dirs.get(rel)
+                if record is None or record[0] != mtime:
+                    subdirs, resids = [], []
+                    for d in inventory.list_dir(self._abs(rel))[0]:
+                        if is_resource_id(d.name):
+                            resids.append(d.name)
+                        else:
+                            subdirs.append(d.name)
+                    record = [mtime, subdirs, resids]
+                dirs[rel] = record
+
+                for resid in record[2]:
+                    found.setdefault(resid, os.path.join(rel, resid))
+                stack.extend(os.path.join(rel, d)
+                             for d in reversed(record[1]))
+
+            resources = {}
+            for resid, rel in found.items():
+                entry = self.resources.get(resid)
+                if entry is None or entry['path'] != rel or \
+                        not self._current(entry):
+                    entry = self._scan_resource(rel)
+                resources[resid] = entry
+
+            self.dirs = dirs
+            self.resources = resources
+            self.save()
+
+    def add(self, resid, path, save=True):
+        """Adds a resource directory to the index, e.g. after the resource
+        was downloaded.
+
+        args:
+        -- resid: hydroshare resource id (str)
+        -- path: directory of the resource (str)
+        -- save: save the index file, batches of additions save it once
+                 using flush (bool, default=>True)
+        """
+
+        rel = os.path.relpath(path, self.root)
+        if rel.startswith(os.pardir):
+            # only resources inside the download directory are indexed
+            return
+        with self.lock:
+            self.resources[resid] = self._scan_resource(rel)
+            if save:
+                self.save()
+
+    def flush(self):
+        """Saves the index, e.g. after resources were added with
+        save=False.
+        """
+
+        with self.lock:
+            self.save()
+
+    def _entry(self, resid):
+        """Gets the current index entry of a resource, refreshing the index
+        if the resource is not indexed or its directory changed.
+        """
+
+        with self.lock:
+            entry = self.resources.get(resid)
+            if entry is not None and \
+                    os.path.isdir(self._abs(entry['path'])):
+                if not self._current(entry):
+                    entry = self._scan_resource(entry['path'])
+                    self.resources[resid] = entry
+                    self.save()
+                return entry
+
+        self.refresh()
+        return self.resources.get(resid)
+
+    def find(self, resid):
+        """Finds the directory of a downloaded resource.
+
+        args:
+        -- resid: hydroshare resource id (str)
+
+        returns:
+        -- path to the resource directory, or None if it was not found
+        """
+
+        if not is_resource_id(resid):
+            # only resource ids are indexed
+            for dirpath, dirnames, filenames in os.walk(self.root):
+                if resid in dirnames:
+                    return os.path.join(dirpath, resid)
+            return None
+
+        entry = self._entry(resid)
+        if entry is None:
+            return None
+        return self._abs(entry['path'])
+
+    def content(self, resid):
+        """Gets the content files of a downloaded resource.
+
+        args:
+        -- resid: hydroshare resource id (str)
+
+        returns:
+        -- {content file name: path}
+        """
+
+        if is_resource_id(resid):
+            entry = self._entry(resid)
+        else:
+            path = self.find(resid)
+            entry = None
+            if path is not None:
+                entry = self._scan_resource(os.path.relpath(path, self.root))
+        if entry is None:
+            return {}
+        return {name: self._abs(rel) for name, rel in entry['files'].items()}
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+
+"""
+Local SQLite cache of resource listings, system and science metadata, and
+file manifests. Cached documents are stored with the modified date of the
+resource they were fetched for, and are only returned while that date is
+still current. The modified dates themselves are refreshed by every
+resource listing, or by a single system metadata request once they are
+older than HS_METADATA_CACHE_TTL seconds (default 300).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from . import cache
+
+# seconds that a resource modified date is trusted without checking it
+# against HydroShare
+METADATA_CACHE_TTL = float(os.environ.get('HS_METADATA_CACHE_TTL', 300))
+
+# kinds of documents stored for each resource
+SYSMETA = 'sysmeta'
+SCIMETA = 'scimeta'
+FILES = 'files'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    resid TEXT PRIMARY KEY,
+    modified TEXT,
+    checked REAL,
+    listing TEXT
+);
+CREATE TABLE IF NOT EXISTS documents (
+    resid TEXT,
+    kind TEXT,
+    modified TEXT,
+    data TEXT,
+    PRIMARY KEY (resid, kind)
+);
+DROP TABLE IF EXISTS listings;
+CREATE TABLE IF NOT EXISTS listing_state (
+    query TEXT PRIMARY KEY,
+    complete INTEGER,
+    fetched REAL
+);
+CREATE TABLE IF NOT EXISTS listing_items (
+    query TEXT,
+    position INTEGER,
+    resid TEXT,
+    PRIMARY KEY (query, position)
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+_shared = None
+
+
+def shared():
+    """Gets the metadata cache that is shared by this process.
+
+    returns:
+    -- MetadataCache, or None if the cache cannot be opened
+    """
+
+    global _shared
+    if _shared is None:
+        try:
+            _shared = MetadataCache()
+        except Exception:
+            return None
+    return _shared
+
+
+def listing_key(filters):
+    """Gets the cache key of a resource listing.
+
+    args:
+    -- filters: resource list filters (dict)
+
+    returns:
+    -- key (str)
+    """
+
+    return json.dumps(filters, sort_keys=True)
+
+
+class MetadataCache(object):
+    def __init__(self, path=None):
+
+        """
+        path is the sqlite database file, by default metadata.sqlite in
+        the hstools cache directory.
+        """
+
+        self.path = path or cache.cache_path('metadata.sqlite')
+        new = not os.path.exists(self.path)
+
+        # the connection is shared by the threads of a command, e.g. the
+        # listing prefetch thread, and serialized using the lock
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, timeout=10,
+                                  check_same_thread=False)
+        if new:
+            os.chmod(self.path, 0o600)
+        with self.lock, self.db:
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _execute(self, sql, params=()):
+        with self.lock, self.db:
+            return self.db.execute(sql, params).fetchall()
+
+    def set_modified(self, resid, modified, listing=None):
+        """Records the current modified date of a resource. Documents
+        fetched for an older modified date are removed.
+
+        args:
+        -- resid: hydroshare resource id (str)
+        -- modified: date the resource was last updated (str)
+        -- listing: the resource as returned by a resource listing (dict)
+        """
+
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM documents '
+                            'WHERE resid = ? AND modified != ?',
+                            (resid, modified))
+            if listing is None:
+                self.db.execute('INSERT INTO resources '
+                                '(resid, modified, checked) '
+                                'VALUES (?, ?, ?) '
+                                'ON CONFLICT(resid) DO UPDATE SET '
+                                'modified = excluded.modified, '
+                                'checked = excluded.checked',
+                                (resid, modified, time.time()))
+            else:
+                self.db.execute('INSERT OR REPLACE INTO resources '
+                                'VALUES (?, ?, ?, ?)',
+                                (resid, modified, time.time(),
+                                 json.dumps(listing)))
+
+    def modified(self, resid, max_age=None):
+        """Gets the recorded modified date of a resource.
+
+        args:
+        -- resid: hydroshare resource id (str)
+        -- max_age: ignore dates checked more than max_age seconds ago
+                    (float, default=>no limit)
+
+        returns:
+        -- modified date (str), or None if unknown or too old
+        """
+
+        rows = self._execute('SELECT modified, checked FROM resources '
+                             'WHERE resid = ?', (resid,))
+        if len(rows) == 0:
+            return None
+        modified, checked = rows[0]
+        if max_age is not None and time.time() - checked > max_age:
+            return None
+        return modified
+
+    def get(self, resid, kind, modified=None):
+        """Gets a cached document.
+
+        args:
+        -- resid: hydroshare resource id (str)
+        -- kind: SYSMETA, SCIMETA or FILES (str)
+        -- modified: only return the document if it was fetched for this
+                     modified date (str, default=>any date)
+
+        returns:
+        -- the cached document, or None
+        """
+
+        rows = self._execute('SELECT modified, data FROM documents '
+                             'WHERE resid = ? AND kind = ?', (resid, kind))
+        if len(rows) == 0:
+            return None
+        if modified is not None and rows[0][0] != modified:
+            return None
+        return json.loads(rows[0][1])
+
+    def put(self, resid, kind, modified, data):
+        """Stores a document.
+
+        args:
+        -- resid: hydroshare resource id (str)
+        -- kind: SYSMETA, SCIMETA or FILES (str)
+        -- modified: modified date of the resource (str)
+        -- data: json serializable document
+        """
+
+        self._execute('INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)',
+                      (resid, kind, modified, json.dumps(data)))
+
+    def remove(self, resid):
+        """Removes everything cached for a resource.
+
+        args:
+        -- resid: hydroshare resource id (str)
+        """
+
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM documents WHERE resid = ?', (resid,))
+            self.db.execute('DELETE FROM resources WHERE resid = ?', (resid,))
+
+    def start_listing(self, filters):
+        """Removes a cached resource listing before it is fetched again.
+        The ids of the new listing are added page by page using
+        add_to_listing, and the listing is used once finish_listing was
+        called.
+
+        args:
+        -- filters: resource list filters (dict)
+        """
+
+        key = listing_key(filters)
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM listing_state WHERE query = ?',
+                            (key,))
+            self.db.execute('DELETE FROM listing_items WHERE query = ?',
+                            (key,))
+
+    def add_to_listing(self, filters, offset, resids):
+        """Adds a page of resource ids to a listing.
+
+        args:
+        -- filters: resource list filters (dict)
+        -- offset: position of the first id of the page (int)
+        -- resids: resource ids in listing order (list)
+        """
+
+        key = listing_key(filters)
+        with self.lock, self.db:
+            self.db.executemany('INSERT OR REPLACE INTO listing_items '
+                                'VALUES (?, ?, ?)',
+                                ((key, offset + i, resid)
+                                 for i, resid in enumerate(resids)))
+
+    def finish_listing(self, filters, complete=True):
+        """Marks a listing as fetched.
+
+        args:
+        -- filters: resource list filters (dict)
+        -- complete: True if the listing was not truncated (bool)
+        """
+
+        self._execute('INSERT OR REPLACE INTO listing_state '
+                      'VALUES (?, ?, ?)',
+                      (listing_key(filters), int(complete), time.time()))
+
+    def put_listing(self, filters, resources, complete=True):
+        """Stores the result of a resource listing.
+
+        args:
+        -- filters: resource list filters (dict)
+        -- resources: resource ids in listing order (list)
+        -- complete: True if the listing was not truncated (bool)
+        """
+
+        self.start_listing(filters)
+        self.add_to_listing(filters, 0, resources)
+        self.finish_listing(filters, complete)
+
+    def get_listing(self, filters, count=None, max_age=None):
+        """Gets a cached resource listing.
+
+        args:
+        -- filters: resource list filters (dict)
+        -- count: number of resources that are needed (int, default=>all)
+        -- max_age: ignore listings older than max_age seconds
+                    (float, default=>no limit)
+
+        returns:
+        -- list of resource dicts, or None if no usable listing is cached
+        """
+
+        key = listing_key(filters)
+        rows = self._execute('SELECT complete, fetched FROM listing_state '
+                             'WHERE query = ?', (key,))
+        if len(rows) == 0:
+            return None
+        complete, fetched = rows[0]
+        if max_age is not None and time.time() - fetched > max_age:
+            return None
+
+        resids = [row[0] for row in self._execute(
+                'SELECT resid FROM listing_items WHERE query = ? '
+                'ORDER BY position LIMIT ?',
+                (key, -1 if count is None else count))]
+        if not complete and (count is None or len(resids) < count):
+            return None
+
+        resources = []
+        for resid in resids:
+            rows = self._execute('SELECT listing FROM resources '
+                                 'WHERE resid = ? AND listing IS NOT NULL',
+                                 (resid,))
+            if len(rows) == 0:
+                return None
+            resources.append(json.loads(rows[0][0]))
+        return resources
+
+    def get_setting(self, key):
+        rows = self._execute('SELECT value FROM settings WHERE key = ?',
+                             (key,))
+        return json.loads(rows[0][0]) if len(rows) > 0 else None
+
+    def put_setting(self, key, value):
+        self._execute('INSERT OR REPLACE INTO settings VALUES (?, ?)',
+                      (key, json.dumps(value)))
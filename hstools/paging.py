@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+"""
+Helpers for walking paginated HydroShare API listings: a page size that
+adapts to the observed latency, and prefetching of pages.
+"""
+
+import math
+import threading
+import collections
+
+from . import scheduler
+from .compat import *
+
+
+class AdaptivePageSize(object):
+    def __init__(self, initial=25, minimum=10, maximum=100, target=1.0):
+
+        """
+        Page size for page-number pagination that grows while pages are
+        fast and shrinks when they are slow. Pages are requested by number,
+        so a new size is only used when the current offset is a multiple
+        of it.
+
+        initial, minimum and maximum are numbers of items per page, target
+        is the desired time to fetch one page in seconds.
+        """
+
+        self.minimum = max(1, min(minimum, initial))
+        self.maximum = max(initial, maximum)
+        self.target = target
+        self.size = initial
+
+    def page(self, offset):
+        """Gets the page number and size to request for an offset.
+
+        args:
+        -- offset: number of items already received (int)
+
+        returns:
+        -- (page number, page size)
+        """
+
+        return offset // self.size + 1, self.size
+
+    def observe(self, offset, elapsed):
+        """Adjusts the page size after a page was fetched.
+
+        args:
+        -- offset: number of items received so far (int)
+        -- elapsed: time it took to fetch the last page in seconds (float)
+        """
+
+        if elapsed < self.target / 2:
+            larger = self.size * 2
+            if larger <= self.maximum and offset % larger == 0:
+                self.size = larger
+        elif elapsed > self.target * 2 and self.size % 2 == 0:
+            smaller = self.size // 2
+            if smaller >= self.minimum:
+                self.size = smaller
+
+    def limit(self, offset, size):
+        """Limits the page size after the server returned fewer items per
+        page than requested.
+
+        args:
+        -- offset: number of items received so far (int)
+        -- size: number of items the server returned (int)
+        """
+
+        self.maximum = size
+        self.size = math.gcd(offset, size) if offset > 0 else size
+
+
+def prefetch(pages, depth=2, kind=scheduler.GENERAL):
+    """Iterates over pages that are fetched ahead of time by the shared
+    scheduler. Pages are fetched one at a time, in order, and at most depth
+    pages are buffered, so memory stays bounded.
+
+    args:
+    -- pages: iterable of pages, e.g. a generator making http requests
+    -- depth: number of pages to fetch ahead of the caller (int, default=>2)
+    -- kind: scheduler task kind used to fetch the pages
+             (str, default=>scheduler.GENERAL)
+
+    returns:
+    -- generator of pages
+    """
+
+    if depth <= 0:
+        yield from pages
+        return
+
+    it = iter(pages)
+    buf = collections.deque()
+    cond = threading.Condition()
+    done = object()
+    fetching = False
+    finished = False
+    stopped = False
+
+    def fetch():
+        nonlocal fetching, finished
+        try:
+            item = (next(it), None)
+        except StopIteration:
+            item = (done, None)
+        except Exception as e:
+            item = (done, e)
+        with cond:
+            buf.append(item)
+            fetching = False
+            finished = item[0] is done
+            cond.notify()
+            schedule()
+
+    def schedule():
+        # called with cond held. The next page is fetched once the
+        # previous one arrived, while the buffer is not full
+        nonlocal fetching
+        if not fetching and not finished and not stopped and \
+                len(buf) < depth:
+            fetching = True
+            scheduler.shared().submit(fetch, kind=kind)
+
+    with cond:
+        schedule()
+    try:
+        while True:
+            with cond:
+                while len(buf) == 0:
+                    cond.wait()
+                page, err = buf.popleft()
+                schedule()
+            if err is not None:
+                raise err
+            if page is done:
+                return
+            yield page
+    finally:
+        # stop fetching if the caller stops iterating early
+        with cond:
+            stopped = True
@@ -1,5 +1,7 @@
 import sys
+import time
 import itertools
+import threading
 
 class progressBar(object):
 
@@ -74,3 +76,313 @@ class progressBar(object):
         args += tuple([next(self.barArray)])
         sys.stdout.write(msg % args)
         sys.stdout.flush()
+
+
+def _fmt_size(num):
+    for unit in ['', 'Ki', 'Mi', 'Gi', 'Ti']:
+        if abs(num) < 1024.0:
+            return '%3.1f%sB' % (num, unit)
+        num /= 1024.0
+    return '%.1fPiB' % num
+
+
+def _fmt_time(seconds):
+    if seconds is None:
+        return '--'
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return '%dh%02dm' % (seconds // 3600, seconds % 3600 // 60)
+    if seconds >= 60:
+        return '%dm%02ds' % (seconds // 60, seconds % 60)
+    return '%ds' % seconds
+
+
+class _Rate(object):
+    """
+    exponentially weighted transfer rate, updated from byte counts
+    """
+
+    def __init__(self, done=0, weight=0.3):
+        self.weight = weight
+        self.time = time.monotonic()
+        self.done = done
+        self.rate = None
+
+    def sample(self, done, now):
+        elapsed = now - self.time
+        if elapsed <= 0:
+            return self.rate or 0
+        rate = (done - self.done) / elapsed
+        if self.rate is None:
+            self.rate = rate
+        else:
+            self.rate = self.weight * rate + (1 - self.weight) * self.rate
+        self.time = now
+        self.done = done
+        return self.rate
+
+
+class Transfer(object):
+    """
+    the progress of a single upload or download. Created using
+    TransferProgress.transfer.
+    """
+
+    def __init__(self, progress, name, total=None, done=0):
+        self.progress = progress
+        self.name = name
+        self.total = total
+        self.done = done
+        self.initial = done
+        self.started = time.monotonic()
+        self.error = None
+        self._rate = _Rate(done)
+
+    def update(self, nbytes):
+        """Records bytes that were transferred."""
+
+        with self.progress.lock:
+            self.done += nbytes
+        self.progress._draw()
+
+    def set(self, done, total=None):
+        """Records the number of bytes transferred so far."""
+
+        with self.progress.lock:
+            self.done = done
+            if total is not None:
+                self.total = total
+        self.progress._draw()
+
+    def finish(self, error=None):
+        """Marks the transfer as finished."""
+
+        self.progress._finish(self, error)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc)
+
+
+class TransferProgress(object):
+    def __init__(self, out=None, interval=None, tty=None, max_lines=10,
+                 handler=None):
+
+        """
+        Displays the progress of concurrent uploads and downloads, using
+        the bytes that were actually transferred. On a terminal each active
+        transfer gets its own line, followed by a line with the aggregate
+        throughput and ETA. Otherwise, e.g. in batch logs, a single line of
+        aggregate stats is written every interval seconds. Redraws are
+        skipped, rather than waited for, when one is already in progress or
+        the last one was less than interval seconds ago, so the display
+        never slows the transfers down. If handler is a logging handler
+        that writes to a terminal, its messages are written above the
+        progress lines until the progress is closed.
+        """
+
+        self.out = out or sys.stderr
+        if tty is None:
+            tty = hasattr(self.out, 'isatty') and self.out.isatty()
+        self.tty = tty
+        if interval is None:
+            interval = 0.1 if tty else 10
+        self.interval = interval
+        self.max_lines = max_lines
+
+        self.lock = threading.Lock()
+        self._draw_lock = threading.Lock()
+        self._next_draw = 0
+        self._lines = 0
+        self._messages = []
+
+        self.active = []
+        self.finished = 0
+        self.failed = 0
+        self.done = 0
+        self.total = 0
+        self.started = time.monotonic()
+        self._rate = _Rate()
+        self._closed = False
+
+        self.handler = None
+        self._stream = None
+        stream = getattr(handler, 'stream', None)
+        if tty and stream is not None and stream.isatty():
+            self.handler = handler
+            self._stream = handler.setStream(self)
+
+    def transfer(self, name, total=None, done=0):
+        """Starts tracking a transfer.
+
+        args:
+        -- name: name that is displayed (str)
+        -- total: expected number of bytes (int, default=>unknown)
+        -- done: bytes that were transferred before, e.g. when a download
+                 is resumed (int, default=>0)
+
+        returns:
+        -- Transfer
+        """
+
+        t = Transfer(self, name, total, done)
+        with self.lock:
+            self.active.append(t)
+        self._draw()
+        return t
+
+    def write(self, text):
+        """Writes text above the progress lines. This makes the progress
+        usable as the stream of a logging handler.
+        """
+
+        with self.lock:
+            self._messages.append(text)
+        if self.tty:
+            self._draw(force=True)
+        else:
+            with self._draw_lock:
+                self._flush_messages()
+                self.out.flush()
+
+    def flush(self):
+        self.out.flush()
+
+    def _finish(self, t, error):
+        with self.lock:
+            if t not in self.active:
+                return
+            self.active.remove(t)
+            t.error = error
+            self.finished += 1
+            if error is not None:
+                self.failed += 1
+            self.done += t.done - t.initial
+            if t.total is not None:
+                self.total += t.total - t.initial
+            if self.tty:
+                elapsed = time.monotonic() - t.started
+                rate = (t.done - t.initial) / elapsed if elapsed > 0 else 0
+                status = '-' if error is not None else '+'
+                self._messages.append(f'{status} {t.name}: '
+                                      f'{_fmt_size(t.done)} in '
+                                      f'{_fmt_time(elapsed)} '
+                                      f'({_fmt_size(rate)}/s)\n')
+        self._draw(force=self.tty)
+
+    def _totals(self):
+        # bytes of finished transfers plus those of active transfers
+        done = self.done + sum(t.done - t.initial for t in self.active)
+        total = self.total
+        known = True
+        for t in self.active:
+            if t.total is None:
+                known = False
+            else:
+                total += t.total - t.initial
+        return done, total if known else None
+
+    def _eta(self, done, total, rate):
+        if total is None or not rate or rate <= 0:
+            return None
+        return max(total - done, 0) / rate
+
+    def _line(self, t, now):
+        rate = t._rate.sample(t.done, now)
+        name = t.name if len(t.name) <= 30 else '...' + t.name[-27:]
+        if t.total:
+            frac = min(t.done / t.total, 1.0)
+            bar = '#' * int(frac * 20)
+            return (f'{name:30} [{bar:20}] {frac * 100:5.1f}% '
+                    f'{_fmt_size(t.done)}/{_fmt_size(t.total)} '
+                    f'{_fmt_size(rate)}/s ETA '
+                    f'{_fmt_time(self._eta(t.done, t.total, rate))}')
+        return f'{name:30} {_fmt_size(t.done)} {_fmt_size(rate)}/s'
+
+    def _summary(self, now):
+        done, total = self._totals()
+        rate = self._rate.sample(done, now)
+        count = len(self.active) + self.finished
+        line = f'{self.finished}/{count} transfer(s), {_fmt_size(done)}'
+        if total:
+            line += f'/{_fmt_size(total)} ({min(done / total, 1) * 100:.0f}%)'
+        line += f', {_fmt_size(rate)}/s'
+        if total:
+            line += f', ETA {_fmt_time(self._eta(done, total, rate))}'
+        if self.failed:
+            line += f', {self.failed} failed'
+        return line
+
+    def _flush_messages(self):
+        with self.lock:
+            messages, self._messages = self._messages, []
+        for m in messages:
+            self.out.write(m)
+
+    def _draw(self, force=False):
+        now = time.monotonic()
+        if self._closed or (not force and now < self._next_draw):
+            return
+        if not self._draw_lock.acquire(blocking=force):
+            return
+        try:
+            self._next_draw = now + self.interval
+            if self.tty:
+                self._draw_tty(now)
+            else:
+                self._flush_messages()
+                if now - self.started >= self.interval:
+                    with self.lock:
+                        line = self._summary(now)
+                    self.out.write(f'progress: {line}\n')
+            self.out.flush()
+        finally:
+            self._draw_lock.release()
+
+    def _draw_tty(self, now):
+        with self.lock:
+            active = list(self.active)
+            lines = [self._line(t, now) for t in active[:self.max_lines]]
+            if len(active) > self.max_lines:
+                lines.append(f'... {len(active) - self.max_lines} more')
+            lines.append(self._summary(now))
+
+        # move to the first progress line and clear the old progress
+        if self._lines > 0:
+            self.out.write(f'\x1b[{self._lines}F')
+        self.out.write('\x1b[J')
+        self._flush_messages()
+        self.out.write('\n'.join(lines) + '\n')
+        self._lines = len(lines)
+
+    def close(self):
+        """Writes the final stats and stops drawing."""
+
+        with self._draw_lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self.handler is not None:
+                self.handler.setStream(self._stream)
+            now = time.monotonic()
+            if self.tty and self._lines > 0:
+                self.out.write(f'\x1b[{self._lines}F\x1b[J')
+                self._lines = 0
+            self._flush_messages()
+            if self.finished > 0:
+                elapsed = now - self.started
+                done, _ = self._totals()
+                rate = done / elapsed if elapsed > 0 else 0
+                self.out.write(f'{"" if self.tty else "progress: "}'
+                               f'{self.finished} transfer(s), '
+                               f'{_fmt_size(done)} in {_fmt_time(elapsed)} '
+                               f'({_fmt_size(rate)}/s)\n')
+            self.out.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
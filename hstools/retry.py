@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+
+"""
+Retry policy for the requests made to HydroShare. Transient failures,
+i.e. connection errors, timeouts and 429, 500, 502, 503 and 504 responses,
+are retried with exponential backoff and jitter, honoring the Retry-After
+header of the server. Only requests that are safe to repeat are retried:
+idempotent methods, requests that failed before they were sent, e.g.
+because the connection was refused, and other requests that were rejected
+with 429 before they were processed and whose body can be sent again.
+
+A circuit breaker per host stops bulk jobs from hammering a degraded
+server: after a number of consecutive transient failures, requests to the
+host wait for a cooldown, after which a single request probes the server.
+The cooldown doubles while probes keep failing. A 429 response with a
+Retry-After header pauses all requests to the host.
+
+The policy can be changed using the HS_RETRY environment variable, e.g.
+HS_RETRY="retries=8,backoff=1,threshold=20". retries=0 disables retries.
+"""
+
+import os
+import time
+import random
+import threading
+import email.utils
+from urllib.parse import urlparse
+
+import urllib3
+import requests
+
+from . import log
+
+logger = log.logger
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+# errors that may be raised while a response body is read
+TRANSIENT_ERRORS = (requests.ConnectionError,
+                    requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError)
+
+
+def _not_sent(error):
+    """
+    True if a request failed while connecting, before any of it was sent
+    """
+
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError) or \
+            len(error.args) == 0:
+        return False
+    reason = getattr(error.args[0], 'reason', error.args[0])
+    return isinstance(reason, (urllib3.exceptions.NewConnectionError,
+                               urllib3.exceptions.ConnectTimeoutError))
+
+
+def _env_settings():
+    settings = {}
+    for item in os.environ.get('HS_RETRY', '').split(','):
+        if '=' in item:
+            key, value = item.split('=', 1)
+            settings[key.strip()] = float(value)
+    return settings
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_policy():
+    """Gets the retry policy that is shared by this process.
+
+    returns:
+    -- RetryPolicy
+    """
+
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = RetryPolicy(**_env_settings())
+        return _default
+
+
+def install(client, policy=None):
+    """Routes the requests of a hs_restclient.HydroShare instance through
+    a retry policy. Installing a policy more than once has no effect.
+
+    args:
+    -- client: hs_restclient.HydroShare instance
+    -- policy: retry policy (RetryPolicy, default=>default_policy())
+
+    returns:
+    -- client
+    """
+
+    if getattr(client, 'retry_policy', None) is not None:
+        return client
+
+    policy = policy or default_policy()
+    request = client._request
+
+    def _request(method, url, *args, **kwargs):
+        return policy.call(request, method, url, *args, **kwargs)
+
+    client._request = _request
+    client.retry_policy = policy
+    return client
+
+
+def policy_for(client):
+    """Gets the retry policy of a hs_restclient.HydroShare instance.
+
+    returns:
+    -- RetryPolicy
+    """
+
+    return getattr(client, 'retry_policy', None) or default_policy()
+
+
+def retry_after(response, now=None):
+    """Parses the Retry-After header of a response.
+
+    args:
+    -- response: requests.Response
+    -- now: current time in seconds since the epoch (float, default=>now)
+
+    returns:
+    -- seconds to wait, or None if the header is missing or invalid
+    """
+
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0., date.timestamp() - now)
+
+
+class CircuitBreaker(object):
+    def __init__(self, threshold=8, cooldown=5, max_cooldown=120,
+                 clock=time.monotonic):
+
+        """
+        the breaker opens after threshold consecutive failures, or never
+        if threshold is 0. While it is open requests wait for cooldown
+        seconds, then one request probes the server.
+        """
+
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+
+        self._cond = threading.Condition()
+        self._failures = 0
+        self._delay = cooldown
+        self._until = 0
+        self._probing = False
+
+    def _open(self):
+        return self.threshold > 0 and self._failures >= self.threshold
+
+    @property
+    def is_open(self):
+        with self._cond:
+            return self._open()
+
+    def acquire(self):
+        """Waits until a request may be made.
+
+        returns:
+        -- True if the request probes an open breaker
+        """
+
+        with self._cond:
+            while True:
+                wait = self._until - self.clock()
+                if wait <= 0:
+                    if not self._open():
+                        return False
+                    if not self._probing:
+                        self._probing = True
+                        return True
+                    # wait for the result of the probe
+                    wait = None
+                self._cond.wait(wait)
+
+    def success(self, probe=False):
+        with self._cond:
+            if self._open() and not probe:
+                # a request that started before the breaker opened
+                return
+            self._failures = 0
+            self._delay = self.cooldown
+            if probe:
+                self._probing = False
+                logger.info('+ server recovered, resuming requests')
+            self._cond.notify_all()
+
+    def failure(self, probe=False):
+        with self._cond:
+            self._failures += 1
+            if self._failures == self.threshold or probe:
+                logger.info(f'- server is failing, pausing requests for '
+                            f'{self._delay:.0f}s')
+                self._until = max(self._until, self.clock() + self._delay)
+                if probe:
+                    self._delay = min(self._delay * 2, self.max_cooldown)
+            if probe:
+                self._probing = False
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Delays all requests for seconds, e.g. when rate limited.
+        """
+
+        with self._cond:
+            self._until = max(self._until, self.clock() + seconds)
+
+
+class RetryPolicy(object):
+    def __init__(self, retries=4, backoff=.5, max_backoff=30,
+                 max_retry_after=120, threshold=8, cooldown=5,
+                 max_cooldown=120, sleep=time.sleep, clock=time.monotonic):
+
+        """
+        retries is the number of times a request is repeated. The n-th
+        retry waits between half and all of backoff * 2**n seconds, at
+        most max_backoff, unless the server asks for a longer delay (up
+        to max_retry_after). threshold, cooldown and max_cooldown
+        configure the circuit breaker of each host.
+        """
+
+        self.retries = int(retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.threshold = int(threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.sleep = sleep
+        self.clock = clock
+
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, url):
+        """Gets the circuit breaker of the host of a url.
+
+        returns:
+        -- CircuitBreaker
+        """
+
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(
+                        self.threshold, self.cooldown, self.max_cooldown,
+                        self.clock)
+            return self._breakers[host]
+
+    def delay(self, attempt, response=None):
+        """Computes how long to wait before a retry.
+
+        args:
+        -- attempt: number of the failed attempt, starting at 0 (int)
+        -- response: the failed response (requests.Response, default=>None)
+
+        returns:
+        -- seconds
+        """
+
+        d = min(self.max_backoff, self.backoff * 2 ** attempt)
+        d = d / 2 + random.uniform(0, d / 2)
+        if response is not None:
+            after = retry_after(response)
+            if after is not None:
+                d = max(d, min(after, self.max_retry_after))
+        return d
+
+    def retryable(self, method, body=None, response=None, error=None):
+        """Decides whether a failed request may be repeated.
+
+        args:
+        -- method: http method (str)
+        -- body: request body, bodies that are read from a stream cannot
+                 be sent again (default=>None)
+        -- response: the response (requests.Response, default=>None)
+        -- error: the exception raised by the request (default=>None)
+
+        returns:
+        -- bool
+        """
+
+        if error is not None:
+            if not isinstance(error, TRANSIENT_ERRORS):
+                return False
+            # a request that did not connect was never received
+            return method.upper() in IDEMPOTENT_METHODS or _not_sent(error)
+
+        if response is None or response.status_code not in RETRY_STATUS:
+            return False
+        if method.upper() in IDEMPOTENT_METHODS:
+            return True
+        # a rate limited request was not processed, it can be sent again
+        # unless its body was consumed
+        return response.status_code == 429 and not hasattr(body, 'read')
+
+    def call(self, request, method, url, *args, **kwargs):
+        """Makes a request, retrying transient failures.
+
+        args:
+        -- request: function making the request, called as
+                    request(method, url, *args, **kwargs), e.g.
+                    hs_restclient.HydroShare._request
+        -- method: http method (str)
+        -- url: url of the request (str)
+
+        returns:
+        -- the last response. Its status is not checked, callers handle
+           error responses as before.
+        """
+
+        body = kwargs.get('data', args[1] if len(args) > 1 else None)
+        breaker = self.breaker(url)
+        attempt = 0
+        while True:
+            probe = breaker.acquire()
+            response = None
+            try:
+                response = request(method, url, *args, **kwargs)
+            except BaseException as e:
+                if not isinstance(e, TRANSIENT_ERRORS):
+                    if probe:
+                        breaker.success(probe)
+                    raise
+                breaker.failure(probe)
+                if attempt >= self.retries or \
+                        not self.retryable(method, body, error=e):
+                    raise
+                reason = type(e).__name__
+            else:
+                if response.status_code not in RETRY_STATUS:
+                    breaker.success(probe)
+                    return response
+
+                if response.status_code == 429:
+                    # rate limited, which is not a server failure
+                    breaker.success(probe)
+                    after = retry_after(response)
+                    if after is not None:
+                        breaker.pause(min(after, self.max_retry_after))
+                else:
+                    breaker.failure(probe)
+                if attempt >= self.retries or \
+                        not self.retryable(method, body, response=response):
+                    return response
+                reason = f'status {response.status_code}'
+                response.close()
+
+            d = self.delay(attempt, response)
+            logger.info(f'- {method} {url} failed ({reason}), retrying in '
+                        f'{d:.1f}s')
+            self.sleep(d)
+            attempt += 1
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+
+"""
+Shared scheduler for the concurrent work done by hstools. Tasks are run by
+one bounded set of worker threads, or by a process pool for CPU bound
+tasks, and return concurrent.futures.Future objects that propagate
+exceptions. Each task has a kind, and the number of tasks of a kind that
+run at once is capped, e.g. metadata requests are not held up by a batch
+of large transfers. Queued tasks start in priority order and fail with a
+TimeoutError if they do not start before their deadline.
+
+A task may wait for tasks of another kind, but never for tasks of its own
+kind: GENERAL tasks may wait for METADATA, TRANSFER, IO and CPU tasks,
+TRANSFER tasks for CPU tasks, and STREAM tasks, which feed iterators that
+are consumed by another thread or an event loop, for METADATA tasks. The
+number of worker threads is the sum of the caps of the thread kinds, so
+any kind that is below its cap always has a thread to run on.
+
+The caps can be changed using the HS_SCHEDULER_LIMITS environment variable,
+e.g. HS_SCHEDULER_LIMITS="transfer=4,metadata=32".
+"""
+
+import os
+import time
+import heapq
+import itertools
+import threading
+import collections
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures import InvalidStateError, as_completed, wait
+
+# kinds of tasks
+GENERAL = 'general'
+METADATA = 'metadata'
+TRANSFER = 'transfer'
+IO = 'io'
+CPU = 'cpu'
+STREAM = 'stream'
+
+DEFAULT_LIMITS = {GENERAL: 8,
+                  METADATA: 16,
+                  TRANSFER: 8,
+                  IO: 8,
+                  CPU: os.cpu_count() or 1,
+                  STREAM: 16}
+
+
+def _env_limits():
+    limits = {}
+    for item in os.environ.get('HS_SCHEDULER_LIMITS', '').split(','):
+        if '=' in item:
+            kind, value = item.split('=', 1)
+            limits[kind.strip()] = int(value)
+    return limits
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared():
+    """Gets the scheduler that is shared by this process.
+
+    returns:
+    -- Scheduler
+    """
+
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Scheduler(_env_limits())
+        return _shared
+
+
+class _Task(object):
+
+    __slots__ = ('fn', 'args', 'kwargs', 'kind', 'deadline', 'future')
+
+    def __init__(self, fn, args, kwargs, kind, deadline):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.kind = kind
+        self.deadline = deadline
+        self.future = Future()
+
+
+class Scheduler(object):
+    def __init__(self, limits=None):
+
+        """
+        limits maps task kinds to the number of tasks of that kind that
+        may run at once, and is merged with DEFAULT_LIMITS.
+        """
+
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+
+        # caps raised by reserve, which are restored by release
+        self._base_limits = dict(self.limits)
+        self._reserved = collections.defaultdict(collections.Counter)
+
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._running = collections.Counter()
+        self._seq = itertools.count()
+        self._threads = 0
+        self._idle = 0
+        self._processes = None
+        self._shutdown = False
+
+    def _max_threads(self):
+        # one thread more than the thread kinds can use, which dispatches
+        # CPU tasks to the process pool
+        return sum(n for k, n in self.limits.items() if k != CPU) + 1
+
+    def reserve(self, kind, n):
+        """Raises the cap of a kind of task to at least n, e.g. when a
+        command asks for more concurrent transfers than the default.
+
+        args:
+        -- kind: kind of task (str)
+        -- n: number of tasks that must be able to run at once (int)
+        """
+
+        with self._cond:
+            self._reserved[kind][n] += 1
+            self._update_limit(kind)
+
+    def release(self, kind, n):
+        """Undoes a reservation made with reserve. The cap of the kind is
+        lowered to the largest remaining reservation, or its default.
+
+        args:
+        -- kind: kind of task (str)
+        -- n: number of tasks that was reserved (int)
+        """
+
+        with self._cond:
+            reserved = self._reserved[kind]
+            if reserved[n] > 0:
+                reserved[n] -= 1
+                if reserved[n] == 0:
+                    del reserved[n]
+            self._update_limit(kind)
+
+    def _update_limit(self, kind):
+        # called with the lock held. Tasks that are running above a
+        # lowered cap finish, no new ones start until they did
+        n = max([self._base_limits.get(kind, 0)] +
+                list(self._reserved[kind]))
+        if n > self.limits.get(kind, 0):
+            self._idle = 0
+            self._cond.notify_all()
+        self.limits[kind] = n
+
+    def submit(self, fn, args=(), kwargs=None, kind=GENERAL, priority=0,
+               timeout=None):
+        """Schedules fn(*args, **kwargs). The arguments of fn are passed
+        apart from the options of the task, so fn may take arguments that
+        are named like them.
+
+        args:
+        -- fn: function to run, a module level function for CPU tasks
+        -- args: positional arguments of fn (tuple, default=>())
+        -- kwargs: keyword arguments of fn (dict, default=>None)
+        -- kind: kind of task (str, default=>GENERAL)
+        -- priority: tasks with a higher priority start first
+                     (int, default=>0)
+        -- timeout: seconds within which the task must start, otherwise
+                    it fails with a TimeoutError (float, default=>None)
+
+        returns:
+        -- concurrent.futures.Future
+        """
+
+        if kind not in self.limits:
+            raise ValueError(f'unknown task kind: {kind}')
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+
+        task = _Task(fn, tuple(args), dict(kwargs or {}), kind, deadline)
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError('cannot schedule new tasks after '
+                                   'shutdown')
+            heapq.heappush(self._queues.setdefault(kind, []),
+                           (-priority, next(self._seq), task))
+            self._wake()
+        return task.future
+
+    def group(self, kind=GENERAL, limit=None, priority=0, timeout=None):
+        """Creates a group of tasks of which at most limit run at once.
+
+        args:
+        -- kind: kind of the tasks (str, default=>GENERAL)
+        -- limit: number of tasks of the group that may run at once
+                  (int, default=>the cap of the kind)
+        -- priority: priority of the tasks (int, default=>0)
+        -- timeout: seconds within which each task must start after it
+                    was handed to the scheduler (float, default=>None)
+
+        returns:
+        -- TaskGroup
+        """
+
+        if limit is not None:
+            limit = max(1, limit)
+            self.reserve(kind, limit)
+        return TaskGroup(self, kind, limit, priority, timeout)
+
+    def _wake(self):
+        # called with the lock held, after a task became runnable
+        if self._idle > 0:
+            self._idle -= 1
+            self._cond.notify()
+        elif self._threads < self._max_threads():
+            self._threads += 1
+            threading.Thread(target=self._worker, daemon=True,
+                             name='hstools-worker').start()
+
+    def _next_task(self):
+        # the highest priority task of a kind that is below its cap
+        best = None
+        for kind, queue in self._queues.items():
+            if len(queue) > 0 and self._running[kind] < self.limits[kind]:
+                if best is None or queue[0] < self._queues[best][0]:
+                    best = kind
+        if best is None:
+            return None
+        return heapq.heappop(self._queues[best])[2]
+
+    def _worker(self):
+        self._cond.acquire()
+        try:
+            while True:
+                task = self._next_task()
+                if task is None:
+                    if self._shutdown:
+                        self._threads -= 1
+                        return
+                    self._idle += 1
+                    self._cond.wait()
+                    continue
+
+                if not task.future.set_running_or_notify_cancel():
+                    continue
+                if task.deadline is not None and \
+                        time.monotonic() > task.deadline:
+                    task.future.set_exception(TimeoutError(
+                        f'{task.kind} task did not start before its '
+                        'deadline'))
+                    continue
+
+                self._running[task.kind] += 1
+                if task.kind == CPU:
+                    self._start_process(task)
+                    continue
+
+                self._cond.release()
+                try:
+                    self._run(task)
+                finally:
+                    self._cond.acquire()
+                    self._running[task.kind] -= 1
+        finally:
+            self._cond.release()
+
+    def _run(self, task):
+        try:
+            result = task.fn(*task.args, **task.kwargs)
+        except BaseException as e:
+            task.future.set_exception(e)
+        else:
+            task.future.set_result(result)
+
+    def _start_process(self, task):
+        # called with the lock held
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(
+                    max_workers=self.limits[CPU])
+        try:
+            pf = self._processes.submit(task.fn, *task.args, **task.kwargs)
+        except Exception as e:
+            self._running[CPU] -= 1
+            task.future.set_exception(e)
+            return
+
+        def done(pf):
+            if pf.exception() is not None:
+                task.future.set_exception(pf.exception())
+            else:
+                task.future.set_result(pf.result())
+            with self._cond:
+                self._running[CPU] -= 1
+                if len(self._queues.get(CPU, [])) > 0:
+                    self._wake()
+
+        pf.add_done_callback(done)
+
+    def shutdown(self, wait=True, cancel=False):
+        """Stops the worker threads once the queued tasks are done.
+
+        args:
+        -- wait: wait for the running tasks (bool, default=>True)
+        -- cancel: cancel the tasks that have not started
+                   (bool, default=>False)
+        """
+
+        with self._cond:
+            self._shutdown = True
+            if cancel:
+                for queue in self._queues.values():
+                    for _, _, task in queue:
+                        task.future.cancel()
+                    queue.clear()
+            self._idle = 0
+            self._cond.notify_all()
+            processes = self._processes
+        if processes is not None:
+            processes.shutdown(wait=wait)
+        if wait:
+            with self._cond:
+                while self._threads > 0:
+                    self._cond.wait(.1)
+
+
+class TaskGroup(object):
+    """
+    tasks that are submitted together, e.g. the downloads of one command.
+    Used as a context manager, leaving the block waits for the tasks of
+    the group, and cancels those that have not started if the block raised
+    an exception or a generator using the group was closed early.
+    """
+
+    def __init__(self, scheduler, kind=GENERAL, limit=None, priority=0,
+                 timeout=None):
+        self.scheduler = scheduler
+        self.kind = kind
+        self.limit = limit
+        self.priority = priority
+        self.timeout = timeout
+        self.futures = []
+
+        # the futures returned by the scheduler, which are waited for
+        # even if the future of the group was cancelled while running
+        self._inner = {}
+
+        self._lock = threading.Lock()
+        self._waiting = collections.deque()
+        self._active = 0
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedules fn(*args, **kwargs) as part of the group.
+
+        returns:
+        -- concurrent.futures.Future
+        """
+
+        future = Future()
+        future.add_done_callback(self._cancelled)
+        self.futures.append(future)
+        with self._lock:
+            if self.limit is not None and self._active >= self.limit:
+                self._waiting.append((future, fn, args, kwargs))
+                return future
+            self._active += 1
+        self._start(future, fn, args, kwargs)
+        return future
+
+    def _cancelled(self, future):
+        if not future.cancelled():
+            return
+        # wake up callers waiting for the future, and stop the task if it
+        # was handed to the scheduler but has not started
+        future.set_running_or_notify_cancel()
+        with self._lock:
+            inner = self._inner.get(future)
+        if inner is not None:
+            inner.cancel()
+
+    def _start(self, future, fn, args, kwargs):
+        if future.cancelled():
+            self._release()
+            return
+        try:
+            inner = self.scheduler.submit(fn, args, kwargs, kind=self.kind,
+                                          priority=self.priority,
+                                          timeout=self.timeout)
+        except Exception as e:
+            self._forward(future, None, e)
+            self._release()
+            return
+        with self._lock:
+            self._inner[future] = inner
+        if future.cancelled():
+            inner.cancel()
+
+        def done(inner):
+            if inner.cancelled():
+                future.cancel()
+            else:
+                self._forward(future, inner.result, inner.exception())
+            self._release()
+
+        inner.add_done_callback(done)
+
+    def _forward(self, future, result, error):
+        # the future of the group is never set running, so a result can
+        # be set unless it was cancelled in the meantime
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result())
+        except InvalidStateError:
+            pass
+
+    def _release(self):
+        # a task finished, start the next waiting task
+        with self._lock:
+            while len(self._waiting) > 0:
+                future, fn, args, kwargs = self._waiting.popleft()
+                if not future.cancelled():
+                    break
+            else:
+                self._active -= 1
+                return
+        self._start(future, fn, args, kwargs)
+
+    def as_completed(self, timeout=None):
+        return as_completed(self.futures, timeout=timeout)
+
+    def cancel(self):
+        """Cancels the tasks of the group that have not started."""
+
+        for future in self.futures:
+            future.cancel()
+
+    def wait(self):
+        """Waits until all tasks of the group are done or cancelled."""
+
+        wait(self.futures)
+        with self._lock:
+            scheduled = list(self._inner.values())
+        wait(scheduled)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.cancel()
+        self.wait()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+"""
+Extracts zip archives (e.g. resource bags) while they are being downloaded.
+Members are decoded from their local file headers as the bytes arrive, so
+the archive is never written to disk in full and every byte is read once.
+"""
+
+import os
+import zlib
+import struct
+import fnmatch
+import zipfile
+
+_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+_LOCAL_SIG = b'PK\x03\x04'
+_DESCRIPTOR_SIG = b'PK\x07\x08'
+_ZIP64_EXTRA_ID = 0x0001
+
+_FLAG_ENCRYPTED = 0x01
+_FLAG_DESCRIPTOR = 0x08
+
+
+class _ChunkReader(object):
+    """
+    file-like reader over an iterable of byte chunks
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = b''
+
+    def _fill(self):
+        for chunk in self._chunks:
+            if chunk:
+                self._buf += chunk
+                return True
+        return False
+
+    def read(self, n):
+        while len(self._buf) < n and self._fill():
+            pass
+        data, self._buf = self._buf[:n], self._buf[n:]
+        return data
+
+    def read_exactly(self, n):
+        data = self.read(n)
+        if len(data) != n:
+            raise zipfile.BadZipFile('Unexpected end of zip stream')
+        return data
+
+    def next_block(self):
+        if not self._buf and not self._fill():
+            raise zipfile.BadZipFile('Unexpected end of zip stream')
+        data, self._buf = self._buf, b''
+        return data
+
+    def blocks(self, n):
+        while n > 0:
+            if not self._buf and not self._fill():
+                raise zipfile.BadZipFile('Unexpected end of zip stream')
+            block, self._buf = self._buf[:n], self._buf[n:]
+            n -= len(block)
+            yield block
+
+    def unread(self, data):
+        self._buf = data + self._buf
+
+    def drain(self):
+        self._buf = b''
+        for chunk in self._chunks:
+            pass
+
+
+def match_members(names, patterns):
+    """Selects the archive members that match any of the glob patterns.
+
+    args:
+    -- names: archive member names (list)
+    -- patterns: glob patterns, e.g. ['*.csv'] (list)
+
+    returns:
+    -- list of matching member names
+    """
+
+    return [n for n in names
+            if any(fnmatch.fnmatchcase(n, p) for p in patterns)]
+
+
+def _target_path(destination, name):
+    """
+    builds a safe extraction path for a member name, dropping absolute
+    and parent directory components the same way zipfile does
+    """
+
+    name = name.replace('\\', '/')
+    parts = [p for p in name.split('/') if p not in ('', '.', '..')]
+    if len(parts) == 0:
+        return None
+    return os.path.join(destination, *parts)
+
+
+def _zip64_sizes(extra, csize, usize):
+    """
+    reads the compressed and uncompressed sizes from a zip64 extra field
+    """
+
+    i = 0
+    while i + 4 <= len(extra):
+        tag, length = struct.unpack('<2H', extra[i:i+4])
+        if tag == _ZIP64_EXTRA_ID:
+            data = extra[i+4:i+4+length]
+            values = [struct.unpack('<Q', data[j:j+8])[0]
+                      for j in range(0, len(data) - 7, 8)]
+            if usize == 0xFFFFFFFF and values:
+                usize = values.pop(0)
+            if csize == 0xFFFFFFFF and values:
+                csize = values.pop(0)
+            return csize, usize, True
+        i += 4 + length
+    return csize, usize, False
+
+
+def _decompressor(method, name):
+    if method == zipfile.ZIP_STORED:
+        return None
+    if method == zipfile.ZIP_DEFLATED:
+        return zlib.decompressobj(-15)
+    raise zipfile.BadZipFile(f'Unsupported compression method {method} '
+                             f'for member {name}')
+
+
+def _read_member(reader, method, flags, csize, name):
+    """
+    yields the uncompressed data of the current member
+    """
+
+    d = _decompressor(method, name)
+
+    if not flags & _FLAG_DESCRIPTOR:
+        for block in reader.blocks(csize):
+            yield block if d is None else d.decompress(block)
+        if d is not None:
+            yield d.flush()
+        return
+
+    # sizes are recorded after the data, so the end of the member can
+    # only be found by decompressing until the deflate stream ends
+    if d is None:
+        raise zipfile.BadZipFile(f'Cannot stream stored member {name} '
+                                 'without a known size')
+    while not d.eof:
+        yield d.decompress(reader.next_block())
+    reader.unread(d.unused_data)
+
+
+def _read_descriptor(reader, zip64):
+    sig = reader.read_exactly(4)
+    if sig != _DESCRIPTOR_SIG:
+        reader.unread(sig)
+    crc = struct.unpack('<L', reader.read_exactly(4))[0]
+    fmt = '<2Q' if zip64 else '<2L'
+    csize, usize = struct.unpack(fmt, reader.read_exactly(struct.calcsize(fmt)))
+    return crc, usize
+
+
+def extract(chunks, destination, members=None):
+    """Extracts a zip archive from a stream of bytes.
+
+    Members are written into their final location as they arrive and their
+    CRC-32 checksums are verified on the fly. A member that fails the check
+    is removed and zipfile.BadZipFile is raised.
+
+    args:
+    -- chunks: iterable of bytes, e.g. a streamed http response body
+    -- destination: directory to extract the archive into (str)
+    -- members: glob patterns of member names to extract (list, default=>all)
+
+    returns:
+    -- list of extracted file paths
+    """
+
+    reader = _ChunkReader(chunks)
+    extracted = []
+
+    while True:
+        header = reader.read(_LOCAL_HEADER.size)
+        if len(header) < _LOCAL_HEADER.size or header[:4] != _LOCAL_SIG:
+            # reached the central directory, all members have been read
+            break
+
+        (_, _, flags, method, _, _, crc, csize, usize,
+         name_len, extra_len) = _LOCAL_HEADER.unpack(header)
+        raw_name = reader.read_exactly(name_len)
+        extra = reader.read_exactly(extra_len)
+        name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+        csize, usize, zip64 = _zip64_sizes(extra, csize, usize)
+
+        if flags & _FLAG_ENCRYPTED:
+            raise zipfile.BadZipFile(f'Encrypted member {name} '
+                                     'is not supported')
+
+        wanted = members is None or len(match_members([name], members)) > 0
+        path = _target_path(destination, name) if wanted else None
+
+        if path is None or name.endswith('/'):
+            # skip the member data without writing it
+            if flags & _FLAG_DESCRIPTOR:
+                for _ in _read_member(reader, method, flags, csize, name):
+                    pass
+                _read_descriptor(reader, zip64)
+            else:
+                for _ in reader.blocks(csize):
+                    pass
+            if path is not None:
+                os.makedirs(path, exist_ok=True)
+            continue
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.part'
+        actual_crc = 0
+        actual_size = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                for block in _read_member(reader, method, flags,
+                                          csize, name):
+                    actual_crc = zlib.crc32(block, actual_crc)
+                    actual_size += len(block)
+                    f.write(block)
+
+            if flags & _FLAG_DESCRIPTOR:
+                crc, usize = _read_descriptor(reader, zip64)
+
+            if actual_crc != crc or actual_size != usize:
+                raise zipfile.BadZipFile(f'Bad CRC-32 for file {name}')
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        extracted.append(path)
+
+    # consume the central directory so the connection can be reused
+    reader.drain()
+
+    return extracted
@@ -1,61 +1,58 @@
 from __future__ import print_function
-import time
-from threading import Thread
+from concurrent.futures import wait
 
 from . import progress
+from . import scheduler
 from .compat import *
 
 
 class threadWrapper(object):
-    def __init__(self, func):
+    def __init__(self, func, kind=scheduler.GENERAL):
         self.func = func
-        self.results = queue.Queue()
+        self.kind = kind
+        self.future = None
 
     def run(self, *args, **kwargs):
 
-        # create a thread to run the function in
-        self.thread = Thread(target=self.f, args=args, kwargs=kwargs)
-
-        # start the thread
-        self.thread.start()
-
-    def f(self, *args, **kwargs):
-        res = self.func(*args, **kwargs)
-        self.results.put(res)
+        # run the function on the shared scheduler
+        self.future = scheduler.shared().submit(self.func, args, kwargs,
+                                                kind=self.kind)
 
     def close(self):
-        self.thread.join()
+        self.join()
+
+    def result(self, timeout=None):
+        # raises the exception of the function, if it failed
+        return self.future.result(timeout)
 
-    def result(self):
-        results = None
-        if not self.results.empty():
-            results = self.results.get()
-        return results
+    def cancel(self):
+        return self.future.cancel()
 
     def isAlive(self):
-        return self.thread.is_alive()
+        return not self.future.done()
+
+    def join(self, timeout=None):
+        wait([self.future], timeout)
 
-    def join(self):
-        self.thread.join()
 
 def runThreadedFunction(msg, success, func, *args, **kwargs):
 
     pbar = progress.progressBar(msg, type='dial',
                                 finish_message=success)
 
-    # create a thread for the function
-    threaded_func = threadWrapper(func)
-    threaded_func.run(*args, **kwargs)
+    # run the function on the shared scheduler
+    future = scheduler.shared().submit(func, args, kwargs)
 
     # print message while the function is running
-    while(threaded_func.isAlive()):
-        time.sleep(.2)
+    while not future.done():
+        wait([future], .2)
         pbar.writeprogress()
 
-    # join the thread
-    threaded_func.join()
+    try:
+        res = future.result()
+    except Exception:
+        pbar.error()
+        raise
     pbar.success()
 
-    res = threaded_func.result()
-
     return res
@@ -1,6 +1,8 @@
 from __future__ import print_function
 import os
-import glob
+import sys
+from . import inventory
+from . import localindex
 from .compat import *
 
 
@@ -12,28 +14,40 @@ def sizeof_fmt(num, suffix='B'):
     return "%.1f%s%s" % (num, 'Yi', suffix)
 
 
-def get_hs_content(resid):
+def get_hs_content(resid, download_dir=None):
 
-    resdir = find_resource_directory(resid)
+    download_dir = download_dir or os.environ.get('JUPYTER_DOWNLOADS',
+                                                  'hs_downloads')
 
-    content = {}
-    for f in glob.glob('%s/*/data/contents/*' % resdir):
-        fname = os.path.basename(f)
-        content[fname] = f
+    # content files are listed in the index of the download directory
+    return localindex.index_for(download_dir).content(resid)
 
-    return content
 
+def find_resource_directory(resid, download_dir=None):
 
-def find_resource_directory(resid):
+    download_dir = download_dir or os.environ.get('JUPYTER_DOWNLOADS',
+                                                  'hs_downloads')
 
-    download_dir = os.environ.get('JUPYTER_DOWNLOADS', 'hs_downloads')
+    # look up the resource in the index of the download directory, which
+    # is refreshed only if the resource is not indexed
+    return localindex.index_for(download_dir).find(resid)
 
-    # loop over all the files in userspace
-    for dirpath, dirnames, filenames in os.walk(download_dir):
-        for dirname in [d for d in dirnames]:
-            if dirname == resid:
-                return os.path.join(dirpath, dirname)
-    return None
+
+def read_resource_ids(path):
+
+    # resource identifiers are listed one per line, text following "#" is
+    # ignored. "-" reads them from stdin
+    f = sys.stdin if path == '-' else open(path, 'r')
+    try:
+        resids = []
+        for line in f:
+            line = line.split('#')[0].strip()
+            if line:
+                resids.append(line)
+        return resids
+    finally:
+        if f is not sys.stdin:
+            f.close()
 
 
 def check_for_ipynb(content_files):
@@ -141,25 +155,34 @@ def _realname(path, root=None):
     return result
 
 
-def tree(startpath, depth=-1):
-    prefix = 0
-    if startpath != '/':
-        if startpath.endswith('/'):
-            startpath = startpath[:-1]
-        prefix = len(startpath)
+def _entryname(entry):
+    if entry.is_link:
+        return '%s -> %s' % (entry.name, entry.target)
+    return entry.name
+
+
+def tree(startpath, depth=-1, jobs=1):
+    if startpath != '/' and startpath.endswith('/'):
+        startpath = startpath[:-1]
 
-    for root, dirs, files in os.walk(startpath):
-        level = root[prefix:].count(os.sep)
-        if depth > -1 and level > depth:
-            continue
+    # directories below depth are never listed
+    for listing in inventory.walk(startpath,
+                                  depth=depth if depth > -1 else None,
+                                  jobs=jobs):
+        level = listing.level
         indent = subindent = ''
         if level > 0:
             indent = '|   ' * (level-1) + '|-- '
         subindent = '|   ' * (level) + '|-- '
-        print('{}{}/'.format(indent, _realname(root)))
+        # only the root can be a symbolic link, links below it are not
+        # followed
+        name = os.path.basename(listing.path)
+        if level == 0:
+            name = _realname(listing.path)
+        print('{}{}/'.format(indent, name))
         # print dir only if symbolic link; otherwise, will be printed as root
-        for d in dirs:
-            if os.path.islink(os.path.join(root, d)):
-                print('{}{}'.format(subindent, _realname(d, root=root)))
-        for f in files:
-            print('{}{}'.format(subindent, _realname(f, root=root)))
+        for d in listing.dirs:
+            if d.is_link:
+                print('{}{}'.format(subindent, _entryname(d)))
+        for f in listing.files:
+            print('{}{}'.format(subindent, _entryname(f)))
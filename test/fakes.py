@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+"""
+Stand-ins for HydroShare that are shared by the tests, so that the
+hydroshare class can be tested without authenticating or connecting to
+HydroShare.
+"""
+
+import os
+from unittest import mock
+from hstools import hydroshare as hs_hydroshare
+
+
+class FakeResponse(object):
+    """
+    a response of the HydroShare api, with a json document (data) or a
+    binary body (content)
+    """
+
+    def __init__(self, status_code, content=b'', data=None, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.data = data
+        self.headers = {'Content-Length': str(len(content))}
+        self.headers.update(headers or {})
+
+    def json(self):
+        return self.data
+
+    def iter_content(self, size):
+        for i in range(0, len(self.content), size):
+            yield self.content[i:i+size]
+
+    def close(self):
+        pass
+
+
+def hydroshare(client, download_dir='.'):
+    """
+    creates an hstools.hydroshare.hydroshare instance that makes its
+    requests using client, a stand-in for hs_restclient.HydroShare,
+    without authenticating
+    """
+
+    hs = hs_hydroshare.hydroshare.__new__(hs_hydroshare.hydroshare)
+    hs.hs = client
+    hs.download_dir = download_dir
+    hs.progress = None
+    hs.content = {}
+    return hs
+
+
+def use_cache_dir(test, path):
+    """
+    points the hstools cache directory to path until test finished
+    """
+
+    patcher = mock.patch.dict(os.environ, {'HS_CACHE_DIR': path})
+    patcher.start()
+    test.addCleanup(patcher.stop)
@@ -1,8 +1,19 @@
 #!/usr/bin/env python3
 
 import os
+import time
+import types
+import shutil
+import zipfile
+import tempfile
+import threading
 import unittest
+import requests
+from unittest import mock
+from hs_restclient import HydroShareException
 from hstools import hydroshare
+from hstools.funcs import add
+from test import fakes
 
 
 class TestAdd(unittest.TestCase):
@@ -99,5 +110,174 @@ class TestAdd(unittest.TestCase):
         hs.close()
 
 
+class TestUploadPlan(unittest.TestCase):
+    remote = ['a.txt', 'data/b.txt', 'data/raw/c.txt']
+
+    def test_conflicts(self):
+        files = [('a.txt', 'a.txt'), ('b.txt', 'data/b.txt'),
+                 ('d.txt', 'data/d.txt')]
+
+        plan = add.UploadPlan(files, self.remote)
+        self.assertEqual(plan.skipped, ['a.txt', 'data/b.txt'])
+        self.assertEqual(plan.uploads, [('d.txt', 'data/d.txt')])
+        self.assertEqual(plan.replace, [])
+
+        plan = add.UploadPlan(files, self.remote, overwrite=True)
+        self.assertEqual(plan.skipped, [])
+        self.assertEqual(plan.replace, ['a.txt', 'data/b.txt'])
+        self.assertEqual(plan.uploads, files)
+
+    def test_folders(self):
+        files = [('x', 'data/raw/x'),
+                 ('y', 'data/new/deep/y'),
+                 ('z', 'data/new/z'),
+                 ('w', 'other/w')]
+
+        # only missing folders and their missing parents, parents first
+        plan = add.UploadPlan(files, self.remote)
+        self.assertEqual(plan.folders, ['other', 'data/new', 'data/new/deep'])
+
+        plan = add.UploadPlan(files, self.remote, create_folders=False)
+        self.assertEqual(plan.folders, [])
+
+
+class FakeUploadClient(object):
+    """
+    stands in for hs_restclient.HydroShare, recording the uploads and how
+    many of them run at once
+    """
+
+    def __init__(self, errors={}, unzip_status=200):
+        self.errors = dict(errors)
+        self.unzip_status = unzip_status
+        self.uploads = []
+        self.archives = {}
+        self.unzipped = []
+        self.deleted = []
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.session = requests.Session()
+
+    def addResourceFile(self, resid, source, target=None,
+                        progress_callback=None):
+        with self.lock:
+            self.uploads.append(target)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(.02)
+        with self.lock:
+            self.active -= 1
+        if target in self.errors:
+            raise self.errors[target]
+        if target.endswith('.zip'):
+            with zipfile.ZipFile(source) as z:
+                self.archives[target] = {n: z.read(n) for n in z.namelist()}
+        return resid
+
+    def resource(self, resid):
+
+        def unzip(payload):
+            self.unzipped.append(payload)
+            r = requests.Response()
+            r.status_code = self.unzip_status
+            r.request = requests.Request(
+                    'POST', f'https://www.hydroshare.org/hsapi/resource/'
+                            f'{resid}/functions/unzip/').prepare()
+            return r
+        return types.SimpleNamespace(
+                functions=types.SimpleNamespace(unzip=unzip))
+
+    def deleteResourceFile(self, resid, name):
+        self.deleted.append(name)
+
+
+class TestAddFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        fakes.use_cache_dir(self, os.path.join(self.d, 'cache'))
+        self.files = []
+        for i in range(8):
+            path = os.path.join(self.d, f'{i}.txt')
+            with open(path, 'w') as f:
+                f.write(str(i))
+            self.files.append((path, f'data/{i}.txt'))
+
+    def tearDown(self):
+        shutil.rmtree(self.d)
+
+    def test_failed_uploads_are_not_repeated(self):
+        # the server may have processed a POST that failed, repeating it
+        # could create duplicate files
+        client = FakeUploadClient({'data/1.txt': HydroShareException('500'),
+                                   'data/2.txt': requests.ConnectionError()})
+        hs = fakes.hydroshare(client)
+        results = list(hs.addFilesToExistingResource('abc', self.files[:3]))
+
+        errors = {tar: err for src, tar, err in results}
+        self.assertIsNone(errors['data/0.txt'])
+        self.assertIsInstance(errors['data/1.txt'], HydroShareException)
+        self.assertIsInstance(errors['data/2.txt'], requests.ConnectionError)
+        self.assertEqual(sorted(client.uploads),
+                         ['data/0.txt', 'data/1.txt', 'data/2.txt'])
+
+    def test_parallel_uploads(self):
+        client = FakeUploadClient()
+        hs = fakes.hydroshare(client)
+        results = list(hs.addFilesToExistingResource('abc', self.files,
+                                                     max_workers=3))
+
+        # every file is uploaded once, at most max_workers at a time
+        self.assertEqual(sorted(tar for src, tar, err in results),
+                         sorted(tar for src, tar in self.files))
+        self.assertTrue(all(err is None for src, tar, err in results))
+        self.assertEqual(sorted(client.uploads),
+                         sorted(tar for src, tar in self.files))
+        self.assertEqual(client.peak, 3)
+
+    def test_bundle(self):
+        client = FakeUploadClient()
+        hs = fakes.hydroshare(client)
+        tmp = os.path.join(self.d, 'tmp')
+        os.makedirs(tmp)
+        with mock.patch('tempfile.tempdir', tmp):
+            hs.addBundleToExistingResource('abc', self.files, overwrite=True)
+
+        # one upload, unzipped in place and removed by HydroShare
+        self.assertEqual(len(client.uploads), 1)
+        name = client.uploads[0]
+        self.assertEqual(client.archives[name],
+                         {f'data/{i}.txt': str(i).encode()
+                          for i in range(8)})
+        self.assertEqual(client.unzipped,
+                         [{'zip_with_rel_path': name,
+                           'remove_original_zip': 'true',
+                           'overwrite': 'true'}])
+        self.assertEqual(client.deleted, [])
+
+        # the local archive is removed
+        self.assertEqual(os.listdir(tmp), [])
+
+    def test_bundle_unzip_fails(self):
+        client = FakeUploadClient(unzip_status=500)
+        hs = fakes.hydroshare(client)
+        with self.assertRaises(HydroShareException):
+            hs.addBundleToExistingResource('abc', self.files)
+
+        # the uploaded archive is not left behind in the resource
+        self.assertEqual(client.deleted, client.uploads)
+        self.assertEqual(len(client.deleted), 1)
+
+    def test_bundle_missing_file(self):
+        client = FakeUploadClient()
+        hs = fakes.hydroshare(client)
+        files = self.files + [(os.path.join(self.d, 'missing.txt'),
+                               'data/missing.txt')]
+        with self.assertRaises(Exception):
+            hs.addBundleToExistingResource('abc', files)
+        self.assertEqual(client.uploads, [])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import sys
+import json
+import stat
+import time
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+import contextlib
+from unittest import mock
+from hstools import agent
+
+
+class TestAgent(unittest.TestCase):
+
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        self.path = os.path.join(self.d, 'agent.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.d)
+
+    def test_should_forward(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('HS_NO_AGENT', None)
+            self.assertTrue(agent.should_forward(['ls', '-s']))
+            self.assertFalse(agent.should_forward([]))
+            for cmd in agent.LOCAL_COMMANDS:
+                self.assertFalse(agent.should_forward([cmd]))
+
+            # the agent cannot read stdin
+            self.assertFalse(agent.should_forward(['get', '-f', '-']))
+
+            os.environ['HS_NO_AGENT'] = '1'
+            self.assertFalse(agent.should_forward(['ls', '-s']))
+
+    def test_run_command(self):
+        cwd = os.getcwd()
+        env = dict(os.environ)
+        seen = {}
+
+        def main(argv):
+            seen['argv'] = argv
+            seen['cwd'] = os.getcwd()
+            seen['env'] = dict(os.environ)
+            print('hello')
+            sys.stderr.write('oops\n')
+            raise SystemExit(3)
+
+        client, server = socket.socketpair()
+        a = agent.Agent(self.path)
+        with mock.patch('hstools.cli.main', main):
+            t = threading.Thread(target=a._handle, args=(server,))
+            t.start()
+            with client, client.makefile('r') as f:
+                agent._send(client, {'argv': ['ls'],
+                                     'cwd': self.d,
+                                     'env': {'HS_TEST': '1'}})
+                msgs = [json.loads(line) for line in f]
+            t.join(5)
+
+        self.assertEqual(seen, {'argv': ['ls'],
+                                'cwd': os.path.realpath(self.d),
+                                'env': {'HS_TEST': '1'}})
+        self.assertEqual(''.join(m.get('out', '') for m in msgs), 'hello\n')
+        self.assertEqual(''.join(m.get('err', '') for m in msgs), 'oops\n')
+        self.assertEqual(msgs[-1], {'exit': 3})
+        self.assertEqual(a.commands, 1)
+
+        # the state of the agent process is restored
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(dict(os.environ), env)
+
+    def test_serve(self):
+        a = agent.Agent(self.path, idle_timeout=0)
+        with mock.patch.object(agent.Agent, '_warm_up'):
+            t = threading.Thread(target=a.serve)
+            t.start()
+            try:
+                for i in range(100):
+                    status = agent.request({'cmd': 'status'}, self.path)
+                    if status is not None:
+                        break
+                    time.sleep(.02)
+
+                self.assertEqual(status['pid'], os.getpid())
+                self.assertEqual(status['socket'], self.path)
+
+                # only the user can connect
+                mode = stat.S_IMODE(os.stat(self.path).st_mode)
+                self.assertEqual(mode, 0o600)
+            finally:
+                self.assertEqual(agent.request({'cmd': 'stop'}, self.path),
+                                 {'stopping': True})
+                t.join(5)
+        self.assertFalse(t.is_alive())
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIsNone(agent.request({'cmd': 'status'}, self.path))
+
+    def test_forward(self):
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(1)
+        received = []
+
+        def serve():
+            conn, _ = server.accept()
+            with conn, conn.makefile('r') as f:
+                received.append(json.loads(f.readline()))
+                for msg in [{'out': 'a'}, {'err': 'b'}, {'exit': 2}]:
+                    agent._send(conn, msg)
+
+        t = threading.Thread(target=serve)
+        t.start()
+        out, err = io.StringIO(), io.StringIO()
+        with mock.patch.dict(os.environ, {'HS_AGENT_SOCKET': self.path}), \
+                contextlib.redirect_stdout(out), \
+                contextlib.redirect_stderr(err):
+            code = agent.forward(['ls', '-s'])
+        t.join(5)
+        server.close()
+
+        self.assertEqual(code, 2)
+        self.assertEqual(out.getvalue(), 'a')
+        self.assertEqual(err.getvalue(), 'b')
+        self.assertEqual(received[0]['argv'], ['ls', '-s'])
+        self.assertEqual(received[0]['cwd'], os.getcwd())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+import time
+import asyncio
+import threading
+import unittest
+from concurrent.futures import CancelledError
+from hstools import aio, scheduler
+
+
+class FakeHydroShare(object):
+    """
+    stands in for hstools.hydroshare.hydroshare, recording how many calls
+    run at once
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.cancelled = []
+        self.closed = []
+
+    def _enter(self):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def _exit(self):
+        with self.lock:
+            self.active -= 1
+
+    def getResourceMetadata(self, resid, cached=False):
+        self._enter()
+        time.sleep(.02)
+        self._exit()
+        return {'resid': resid}
+
+    def getResource(self, resid, stream=False, members=None, verify=False,
+                    cancel=None):
+        # a transfer that only stops when it is cancelled
+        while not cancel.wait(.01):
+            pass
+        self.cancelled.append(resid)
+        return None
+
+    def _downloadResource(self, resid, stream=False, members=None,
+                          verify=False, cancel=None):
+        if resid == 'bad':
+            raise Exception('not found')
+        return f'/tmp/{resid}'
+
+    def close(self):
+        self.closed.append('hydroshare')
+
+    def iterResources(self, filters={}, count=None):
+        try:
+            for i in range(count):
+                yield {'resource_id': str(i)}
+        finally:
+            self.closed.append('iterResources')
+
+
+class TestAsyncHydroShare(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.fake = FakeHydroShare()
+        self.hs = aio.hydroshare(self.fake, max_requests=3)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_close_restores_scheduler_caps(self):
+        limits = dict(scheduler.shared().limits)
+        hs = [aio.hydroshare(self.fake, max_requests=100, max_transfers=50)
+              for _ in range(2)]
+        self.assertEqual(scheduler.shared().limits[scheduler.GENERAL], 100)
+        self.assertEqual(scheduler.shared().limits[scheduler.TRANSFER], 50)
+
+        for client in hs:
+            self.run_async(client.close())
+            self.run_async(client.close())
+        self.assertEqual(self.fake.closed, ['hydroshare'] * 4)
+        self.run_async(self.hs.close())
+        self.assertEqual(scheduler.shared().limits, limits)
+
+        # the caps of open clients are kept
+        self.hs = aio.hydroshare(self.fake, max_requests=100)
+        hs = aio.hydroshare(self.fake, max_requests=100)
+        self.run_async(hs.close())
+        self.assertEqual(scheduler.shared().limits[scheduler.GENERAL], 100)
+        self.run_async(self.hs.close())
+        self.assertEqual(scheduler.shared().limits, limits)
+
+    def test_bounded_requests(self):
+        async def main():
+            return await asyncio.gather(*[self.hs.getResourceMetadata(str(i))
+                                          for i in range(12)])
+
+        results = self.run_async(main())
+        self.assertEqual([r['resid'] for r in results],
+                         [str(i) for i in range(12)])
+        self.assertLessEqual(self.fake.peak, 3)
+        self.assertGreater(self.fake.peak, 1)
+
+    def test_cancel_transfer(self):
+        async def main():
+            task = asyncio.ensure_future(self.hs.getResource('abc'))
+            await asyncio.sleep(.05)
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, CancelledError):
+                pass
+
+        self.run_async(main())
+        deadline = time.time() + 2
+        while len(self.fake.cancelled) == 0 and time.time() < deadline:
+            time.sleep(.01)
+        self.assertEqual(self.fake.cancelled, ['abc'])
+
+    def test_get_resources(self):
+        async def main():
+            return [r async for r in self.hs.getResources(['a', 'bad', 'a'])]
+
+        results = sorted(self.run_async(main()))
+        self.assertEqual(results[0], ('a', '/tmp/a', None))
+        self.assertEqual(results[1][:2], ('bad', None))
+        self.assertIsInstance(results[1][2], Exception)
+
+    def test_stream(self):
+        async def main(n):
+            ids = []
+            resources = self.hs.iterResources(count=1000)
+            try:
+                async for r in resources:
+                    ids.append(r['resource_id'])
+                    if len(ids) == n:
+                        break
+            finally:
+                await resources.aclose()
+            return ids
+
+        self.assertEqual(self.run_async(main(None)),
+                         [str(i) for i in range(1000)])
+
+        # stopping early closes the blocking generator
+        self.fake.closed.clear()
+        self.assertEqual(self.run_async(main(5)), ['0', '1', '2', '3', '4'])
+        deadline = time.time() + 2
+        while len(self.fake.closed) == 0 and time.time() < deadline:
+            time.sleep(.01)
+        self.assertEqual(self.fake.closed, ['iterResources'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
 
 import os
+import json
+import stat
+import time
+import base64
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 from hstools import auth
+from test import fakes
 
 
 class TestAuth(unittest.TestCase):
@@ -34,5 +42,73 @@ class TestAuth(unittest.TestCase):
         hs.session.close()
 
 
+class TestCachedAuthorization(unittest.TestCase):
+    user_info = {'username': 'test', 'id': 1}
+
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        fakes.use_cache_dir(self, os.path.join(self.d, 'cache'))
+
+        # a basic auth file, sessions are restored without contacting
+        # HydroShare
+        self.authfile = os.path.join(self.d, 'hs_auth')
+        creds = json.dumps({'usr': 'test', 'pwd': 'secret'})
+        with open(self.authfile, 'w') as f:
+            f.write(base64.b64encode(creds.encode()).decode())
+        self.hs = auth._basic_client(self.authfile)
+
+    def tearDown(self):
+        self.hs.session.close()
+        shutil.rmtree(self.d)
+
+    def load(self, ttl=60):
+        cached = auth.load_cached_authorization(self.authfile, ttl=ttl)
+        if cached is not None:
+            cached[0].session.close()
+        return cached
+
+    def test_restores_session(self):
+        self.assertIsNone(self.load())
+        auth.save_cached_authorization(self.authfile, 'basic', self.hs,
+                                       self.user_info)
+        self.assertEqual(self.load()[1], self.user_info)
+
+        auth.clear_cached_authorization(self.authfile)
+        self.assertIsNone(self.load())
+
+    def test_ttl(self):
+        auth.save_cached_authorization(self.authfile, 'basic', self.hs,
+                                       self.user_info)
+        self.assertIsNotNone(self.load(ttl=60))
+        self.assertIsNone(self.load(ttl=0))
+
+        now = time.time()
+        with mock.patch('hstools.auth.time.time', return_value=now + 61):
+            self.assertIsNone(self.load(ttl=60))
+            self.assertIsNotNone(self.load(ttl=120))
+
+    def test_auth_file_changes(self):
+        auth.save_cached_authorization(self.authfile, 'basic', self.hs,
+                                       self.user_info)
+        self.assertIsNotNone(self.load())
+
+        st = os.stat(self.authfile)
+        os.utime(self.authfile, (st.st_atime, st.st_mtime + 10))
+        self.assertIsNone(self.load())
+
+        # the session is cached again once it is validated
+        auth.save_cached_authorization(self.authfile, 'basic', self.hs,
+                                       self.user_info)
+        self.assertIsNotNone(self.load())
+
+    def test_permissions(self):
+        auth.save_cached_authorization(self.authfile, 'basic', self.hs,
+                                       self.user_info)
+        path = auth._cache_file(self.authfile)
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+        self.assertEqual(stat.S_IMODE(os.stat(os.path.dirname(path))
+                                      .st_mode), 0o700)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import hashlib
+import tempfile
+import unittest
+from hstools import bagit
+
+
+def md5(data):
+    return hashlib.md5(data).hexdigest()
+
+
+class TestBagit(unittest.TestCase):
+    payload = {'data/contents/a.txt': b'a',
+               'data/contents/b.txt': b'bb'}
+
+    def setUp(self):
+        self.bag = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.bag, 'data/contents'))
+        for rel, data in self.payload.items():
+            self.write(rel, data)
+        bagit.write_manifest(bagit.manifest_path(self.bag),
+                             {k: md5(v) for k, v in self.payload.items()})
+        self.write('bagit.txt', b'BagIt-Version: 0.96\n')
+        self.write('bag-info.txt', b'Source-Organization: x\n'
+                                   b'Payload-Oxum: 3.2\n')
+        bagit.write_manifest(bagit.manifest_path(self.bag, tag=True),
+                             {'bagit.txt': '0', 'bag-info.txt': '0'})
+
+    def tearDown(self):
+        shutil.rmtree(self.bag)
+
+    def write(self, rel, data):
+        with open(os.path.join(self.bag, rel), 'wb') as f:
+            f.write(data)
+
+    def read(self, rel):
+        with open(os.path.join(self.bag, rel), 'rb') as f:
+            return f.read()
+
+    def test_update(self):
+        self.assertEqual(bagit.manifest_algorithms(self.bag), ['md5'])
+
+        self.write('data/contents/b.txt', b'changed')
+        self.write('data/contents/c.txt', b'new')
+        os.remove(os.path.join(self.bag, 'data/contents/a.txt'))
+
+        entries = bagit.update_manifests(
+                self.bag, changed=['data/contents/b.txt',
+                                   'data/contents/c.txt'],
+                removed=['data/contents/a.txt'], jobs=1)
+        self.assertEqual(entries, {'data/contents/b.txt': md5(b'changed'),
+                                   'data/contents/c.txt': md5(b'new')})
+
+        bagit.update_bag_info(self.bag, entries)
+        info = self.read('bag-info.txt').decode()
+        self.assertIn('Source-Organization: x\n', info)
+        self.assertIn('Payload-Oxum: 10.2\n', info)
+        self.assertIn('Bagging-Date: ', info)
+
+        # every tag file, including the payload manifest, is listed
+        bagit.update_tag_manifests(self.bag)
+        tags = bagit.read_manifest(bagit.manifest_path(self.bag, tag=True))
+        self.assertEqual(sorted(tags), ['bag-info.txt', 'bagit.txt',
+                                        'manifest-md5.txt'])
+        for rel, digest in tags.items():
+            self.assertEqual(md5(self.read(rel)), digest)
+
+    def test_verify(self):
+        bagit.update_tag_manifests(self.bag)
+        report = bagit.verify_bag(self.bag, jobs=2)
+        self.assertTrue(report['valid'])
+        self.assertEqual(report['files'], 5)
+
+        self.write('data/contents/a.txt', b'x')
+        self.write('data/contents/extra.txt', b'x')
+        os.remove(os.path.join(self.bag, 'data/contents/b.txt'))
+        report = bagit.verify_bag(self.bag, jobs=2)
+        self.assertFalse(report['valid'])
+        errors = {e['path']: e['error'] for e in report['errors']}
+        self.assertEqual(errors, {'data/contents/a.txt': 'checksum mismatch',
+                                  'data/contents/b.txt': 'missing',
+                                  'data/contents/extra.txt':
+                                  'not listed in manifest'})
+
+        # partially extracted bags only check the files that exist
+        report = bagit.verify_bag(self.bag, missing_ok=True)
+        self.assertEqual(len(report['errors']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import subprocess
+import unittest
+from hstools import cli
+
+
+def imported_modules(argv):
+    """
+    builds the parser in a new interpreter and returns the modules that
+    were imported
+    """
+
+    code = ('import sys, json\n'
+            'from hstools import cli\n'
+            f'cli.build_parser({argv!r})\n'
+            'print(json.dumps(sorted(sys.modules)))\n')
+    out = subprocess.check_output([sys.executable, '-c', code])
+    return set(json.loads(out))
+
+
+class TestCli(unittest.TestCase):
+
+    def test_imports_invoked_command_only(self):
+        modules = imported_modules(['get', 'abc'])
+        commands = {m for m in modules if m.startswith('hstools.funcs.')}
+        self.assertEqual(commands, {'hstools.funcs.get'})
+
+        # heavy dependencies are imported when the command runs
+        self.assertNotIn('hs_restclient', modules)
+        self.assertNotIn('requests', modules)
+
+    def test_help_imports_all_commands(self):
+        modules = imported_modules([])
+        commands = {m for m in modules if m.startswith('hstools.funcs.')}
+        self.assertEqual(commands, set(cli.COMMANDS.values()))
+        self.assertNotIn('hs_restclient', modules)
+        self.assertNotIn('requests', modules)
+
+    def test_usage_lists_all_commands(self):
+        parser = cli.build_parser(['get', 'abc'])
+        for name in cli.COMMANDS:
+            self.assertIn(name, parser.usage)
+
+        args = parser.parse_args(['get', 'abc'])
+        self.assertEqual(args.resource_id, ['abc'])
+        self.assertEqual(args.func.__module__, 'hstools.funcs.get')
+
+    def test_parse_importtime(self):
+        lines = ['import time: self [us] | cumulative | imported package',
+                 'import time:       120 |        120 |     _io',
+                 'import time:      1500 |       2000 | hstools.cli',
+                 'some other output']
+        self.assertEqual(cli.parse_importtime(lines),
+                         [('_io', 120, 120, 2),
+                          ('hstools.cli', 1500, 2000, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import json
+import time
+import argparse
+import tempfile
+import threading
+import unittest
+import contextlib
+from unittest import mock
+from hs_restclient import HydroShareNotFound
+from hstools import utilities
+from hstools.funcs import delete
+
+
+class FakeClient(object):
+
+    def __init__(self, resources):
+        self.resources = resources
+
+    def getSystemMetadata(self, resid):
+        if resid not in self.resources:
+            raise HydroShareNotFound((resid,))
+        return {'resource_title': self.resources[resid]}
+
+
+class FakeHydroShare(object):
+    """
+    stands in for hstools.hydroshare.hydroshare
+    """
+
+    def __init__(self, resources):
+        self.hs = FakeClient(resources)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.deleted = []
+
+    def setConnectionPoolSize(self, size):
+        pass
+
+    def deleteResource(self, resid):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(.02)
+        with self.lock:
+            self.active -= 1
+        if resid == 'locked':
+            raise Exception('not authorized')
+        if resid not in self.hs.resources:
+            raise HydroShareNotFound((resid,))
+        del self.hs.resources[resid]
+        with self.lock:
+            self.deleted.append(resid)
+        return True
+
+
+class TestDelete(unittest.TestCase):
+
+    def test_read_ids(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt',
+                                         delete=False) as f:
+            f.write('a\n\n# scratch resources\nb  # old\na\n')
+        try:
+            self.assertEqual(utilities.read_resource_ids(f.name),
+                             ['a', 'b', 'a'])
+        finally:
+            os.remove(f.name)
+
+    def test_delete_resources(self):
+        hs = FakeHydroShare({str(i): f'title {i}' for i in range(8)})
+        resids = [str(i) for i in range(8)] + ['missing', 'locked']
+
+        results = [(r, None, e)
+                   for r, e in delete.delete_resources(hs, resids, jobs=4)]
+        self.assertEqual(hs.peak, 4)
+
+        summary = delete.summarize(results, 2)
+        self.assertEqual(sorted(summary['deleted']),
+                         [str(i) for i in range(8)])
+        self.assertEqual(summary['missing'], ['missing'])
+        self.assertEqual(summary['failed'],
+                         [{'resource_id': 'locked',
+                           'error': 'not authorized'}])
+        self.assertEqual(summary['rate'], 5)
+        self.assertEqual(hs.hs.resources, {})
+
+    def test_dry_run(self):
+        hs = FakeHydroShare({'a': 'scratch a', 'b': 'scratch b'})
+        results = list(delete.resolve_titles(hs, ['a', 'b', 'c'], jobs=3))
+        summary = delete.summarize(results, 1, dry_run=True)
+        self.assertEqual(summary['resources'], {'a': 'scratch a',
+                                                'b': 'scratch b'})
+        self.assertEqual(summary['missing'], ['c'])
+        self.assertEqual(summary['deleted'], [])
+        self.assertEqual(len(hs.hs.resources), 2)
+
+    def test_read_ids_from_stdin(self):
+        with mock.patch('sys.stdin', io.StringIO('b\na # dup\n\nc\n')):
+            self.assertEqual(utilities.read_resource_ids('-'),
+                             ['b', 'a', 'c'])
+
+
+class TestDeleteCommand(unittest.TestCase):
+
+    def run_command(self, argv, resources, stdin=''):
+        parser = argparse.ArgumentParser()
+        delete.add_arguments(parser)
+        args = parser.parse_args(argv)
+
+        hs = FakeHydroShare(resources)
+        out = io.StringIO()
+        code = 0
+        with mock.patch('hstools.hydroshare.hydroshare', return_value=hs), \
+                mock.patch('sys.stdin', io.StringIO(stdin)), \
+                contextlib.redirect_stdout(out):
+            try:
+                delete.main(args)
+            except SystemExit as e:
+                code = e.code
+        return hs, out.getvalue(), code
+
+    def test_delete(self):
+        hs, out, code = self.run_command(['a', 'b', 'a', 'missing',
+                                          '-i', '-', '-j', '2', '--json'],
+                                         {'a': 'a', 'b': 'b', 'c': 'c'},
+                                         stdin='b\nc\n')
+
+        # each resource is deleted once, missing resources do not fail
+        self.assertEqual(code, 0)
+        self.assertEqual(sorted(hs.deleted), ['a', 'b', 'c'])
+        summary = json.loads(out)
+        self.assertEqual(sorted(summary['deleted']), ['a', 'b', 'c'])
+        self.assertEqual(summary['missing'], ['missing'])
+        self.assertEqual(summary['failed'], [])
+
+    def test_failures(self):
+        hs, out, code = self.run_command(['a', 'locked', 'missing'],
+                                         {'a': 'a'})
+        self.assertEqual(code, 1)
+        self.assertEqual(hs.deleted, ['a'])
+        self.assertIn('  not authorized', out)
+        self.assertIn('deleted: 1, missing: 1, failed: 1', out)
+
+    def test_dry_run(self):
+        hs, out, code = self.run_command(['a', 'b', 'missing', '--dry-run'],
+                                         {'a': 'scratch a', 'b': 'scratch b'})
+        self.assertEqual(code, 0)
+        self.assertEqual(hs.deleted, [])
+        self.assertEqual(len(hs.hs.resources), 2)
+        self.assertIn('  a  scratch a', out)
+        self.assertIn('  b  scratch b', out)
+        self.assertIn('- missing: not found', out)
+        self.assertIn('found: 2, missing: 1, failed: 0', out)
+
+    def test_no_ids(self):
+        with self.assertRaises(Exception):
+            self.run_command(['-i', '-'], {}, stdin='# nothing\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import io
+import time
+import types
+import argparse
+import threading
+import unittest
+import contextlib
+from unittest import mock
+from hstools.funcs import describe
+
+
+class TestFileTree(unittest.TestCase):
+    files = [('z.txt', 1),
+             ('dir/b.txt', 2),
+             ('dir/sub/c.txt', 4),
+             ('a.txt', 8),
+             ('dir/a.txt', 16)]
+
+    def render(self, **kwargs):
+        out = io.StringIO()
+        root = describe.build_tree(self.files)
+        describe.render_tree(root, out=out, **kwargs)
+        return out.getvalue().splitlines()
+
+    def test_build(self):
+        root = describe.build_tree(self.files)
+        self.assertEqual(root.count, 5)
+        self.assertEqual(root.size, 31)
+        self.assertEqual(root.dirs['dir'].count, 3)
+        self.assertEqual(root.dirs['dir'].dirs['sub'].size, 4)
+
+    def test_render(self):
+        self.assertEqual(self.render(),
+                         [' a.txt',
+                          ' z.txt',
+                          ' dir',
+                          ' └── a.txt',
+                          ' └── b.txt',
+                          ' └── sub',
+                          '  └── c.txt'])
+
+    def test_depth_and_collapse(self):
+        self.assertEqual(self.render(depth=1),
+                         [' a.txt', ' z.txt', ' dir [3 files, 22.0B]'])
+        self.assertEqual(self.render(collapse=2)[-1], ' dir [3 files, 22.0B]')
+        self.assertEqual(self.render(depth=2)[-1], ' └── sub [1 files, 4.0B]')
+
+    def test_stream(self):
+        out = io.StringIO()
+        describe.stream_tree(sorted(p for p, _ in self.files), out=out)
+        self.assertEqual(out.getvalue().splitlines(),
+                         [' a.txt',
+                          ' dir',
+                          ' └── a.txt',
+                          ' └── b.txt',
+                          ' └── sub',
+                          '  └── c.txt',
+                          ' z.txt'])
+
+
+class FakeHydroShare(object):
+    """
+    stands in for hstools.hydroshare.hydroshare, the first resources are
+    the slowest to describe so that requests finish out of order
+    """
+
+    def __init__(self, resids):
+        self.resids = resids
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def setConnectionPoolSize(self, size):
+        pass
+
+    def _request(self, resid):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(.01 * (len(self.resids) - self.resids.index(resid)))
+        with self.lock:
+            self.active -= 1
+        if resid == 'missing':
+            raise Exception(f'- {resid} not found')
+
+    def getResourceMetadata(self, resid, cached=False):
+        self._request(resid)
+        return types.SimpleNamespace(title=f'title of {resid}',
+                                     abstract='abstract',
+                                     authors=['a'],
+                                     creators=[{'name': 'a'}],
+                                     date_created='2020-01-01')
+
+    def getResourceFiles(self, resid, cached=False, max_workers=1):
+        self._request(resid)
+        return [{'url': f'https://www.hydroshare.org/resource/{resid}/'
+                        f'data/contents/{resid}.csv', 'size': 1}]
+
+
+class TestDescribe(unittest.TestCase):
+
+    def test_concurrent_descriptions(self):
+        resids = [f'res{i}' for i in range(6)] + ['missing', 'res6']
+        hs = FakeHydroShare(resids)
+
+        parser = argparse.ArgumentParser()
+        describe.add_arguments(parser)
+        args = parser.parse_args(resids + ['--jobs', '3'])
+
+        out = io.StringIO()
+        with mock.patch('hstools.hydroshare.hydroshare', return_value=hs), \
+                contextlib.redirect_stdout(out):
+            describe.main(args)
+        out = out.getvalue()
+
+        # descriptions are printed in input order
+        titles = [line.split('title of ')[1] for line in out.splitlines()
+                  if line.startswith('title: ')]
+        self.assertEqual(titles, [r for r in resids if r != 'missing'])
+        files = [line.strip()[:-len('.csv')] for line in out.splitlines()
+                 if line.endswith('.csv')]
+        self.assertEqual(files, titles)
+
+        # a failed resource does not stop the others
+        self.assertIn('- missing not found', out)
+        self.assertLess(out.index('title of res5'),
+                        out.index('- missing not found'))
+
+        # three resources at once, two requests each
+        self.assertGreater(hs.peak, 3)
+        self.assertLessEqual(hs.peak, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
 
+import io
 import os
 import shutil
+import zipfile
+import tempfile
 import unittest
-from hstools import hydroshare
+import requests
+from unittest import mock
+from hstools import hydroshare, download, log
+from test import fakes
 
 
 class TestDownload(unittest.TestCase):
@@ -63,5 +69,175 @@ class TestDownload(unittest.TestCase):
         shutil.rmtree(d)
 
 
+class FakeResponse(object):
+    def __init__(self, status_code, data=b'', headers={}, fail_after=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = dict(headers)
+        self.fail_after = fail_after
+
+    def iter_content(self, size):
+        for i in range(0, len(self.data), 10):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise ConnectionError('connection reset')
+            yield self.data[i:i+10]
+
+    def close(self):
+        pass
+
+
+class FakeServer(object):
+    """
+    serves a byte string, honoring Range and If-Range request headers
+    """
+
+    def __init__(self, data, etag):
+        self.data = data
+        self.etag = etag
+        self.fail_after = None
+        self.requests = []
+
+    def _request(self, method, url, headers={}, stream=False):
+        self.requests.append(dict(headers))
+        fail_after, self.fail_after = self.fail_after, None
+        rng = headers.get('Range')
+        if rng and headers.get('If-Range') == self.etag:
+            start = int(rng.split('=')[1].rstrip('-'))
+            body = self.data[start:]
+            return FakeResponse(206, body,
+                                {'ETag': self.etag,
+                                 'Content-Length': str(len(body)),
+                                 'Content-Range': f'bytes {start}-'
+                                                  f'{len(self.data)-1}/'
+                                                  f'{len(self.data)}'},
+                                fail_after)
+        return FakeResponse(200, self.data,
+                            {'ETag': self.etag,
+                             'Content-Length': str(len(self.data))},
+                            fail_after)
+
+
+class TestResumableDownload(unittest.TestCase):
+    url = 'https://www.hydroshare.org/hsapi/resource/abc/'
+
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        self.path = os.path.join(self.d, 'abc.zip')
+
+    def tearDown(self):
+        shutil.rmtree(self.d)
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_download(self):
+        server = FakeServer(os.urandom(1000), '"v1"')
+        download.download(server, self.url, self.path)
+        self.assertEqual(self.read(), server.data)
+        self.assertEqual(os.listdir(self.d), ['abc.zip'])
+
+    def test_resume(self):
+        server = FakeServer(os.urandom(1000), '"v1"')
+        server.fail_after = 600
+        with self.assertRaises(ConnectionError):
+            download.download(server, self.url, self.path)
+        self.assertTrue(os.path.exists(f'{self.path}.part.json'))
+
+        download.download(server, self.url, self.path)
+        self.assertEqual(server.requests[-1]['Range'], 'bytes=600-')
+        self.assertEqual(self.read(), server.data)
+        self.assertFalse(os.path.exists(f'{self.path}.part.json'))
+
+    def test_restart_when_changed(self):
+        server = FakeServer(os.urandom(1000), '"v1"')
+        server.fail_after = 600
+        with self.assertRaises(ConnectionError):
+            download.download(server, self.url, self.path)
+
+        server.data = os.urandom(800)
+        server.etag = '"v2"'
+        download.download(server, self.url, self.path)
+        self.assertEqual(server.requests[-1]['If-Range'], '"v1"')
+        self.assertEqual(self.read(), server.data)
+
+
+class FakeBagServer(object):
+    """
+    serves the zipped bags of resources, resources that are not in bags
+    are not found
+    """
+
+    url_base = 'https://www.hydroshare.org/hsapi'
+
+    def __init__(self, bags):
+        self.bags = {}
+        for resid, files in bags.items():
+            buf = io.BytesIO()
+            with zipfile.ZipFile(buf, 'w') as z:
+                for name, data in files.items():
+                    z.writestr(f'{resid}/{name}', data)
+            self.bags[resid] = buf.getvalue()
+        self.sessions = 0
+        self.session = None
+        self._initializeSession()
+
+    def _initializeSession(self):
+        self.sessions += 1
+        self.session = requests.Session()
+
+    def _request(self, method, url, headers={}, stream=False):
+        resid = url[len(f'{self.url_base}/resource/'):].strip('/')
+        if resid not in self.bags:
+            return fakes.FakeResponse(404)
+        return fakes.FakeResponse(200, self.bags[resid])
+
+
+class TestGetResources(unittest.TestCase):
+
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        fakes.use_cache_dir(self, os.path.join(self.d, 'cache'))
+        self.server = FakeBagServer({'a': {'data/a.txt': b'a'},
+                                     'b': {'data/b.txt': b'b'}})
+        self.hs = fakes.hydroshare(self.server, self.d)
+
+    def tearDown(self):
+        shutil.rmtree(self.d)
+
+    def test_one_fails(self):
+        with mock.patch.object(log.logger, 'error') as error:
+            results = {resid: (path, err) for resid, path, err
+                       in self.hs.getResources(['a', 'missing', 'b', 'a'],
+                                               max_workers=3)}
+
+        self.assertEqual(sorted(results), ['a', 'b', 'missing'])
+        for resid in ['a', 'b']:
+            path, err = results[resid]
+            self.assertIsNone(err)
+            self.assertEqual(path, os.path.join(self.d, resid))
+            with open(os.path.join(path, 'data', f'{resid}.txt'), 'rb') as f:
+                self.assertEqual(f.read(), resid.encode())
+
+        path, err = results['missing']
+        self.assertIsNone(path)
+        self.assertIsNotNone(err)
+
+        # the failure is reported by the caller, not logged here
+        error.assert_not_called()
+
+    def test_pool_size_survives_new_session(self):
+        self.hs.setConnectionPoolSize(6)
+        self.hs.setConnectionPoolSize(3)
+
+        # hs_restclient creates a new session after a connection error
+        self.server._initializeSession()
+        self.assertEqual(self.server.sessions, 2)
+        for prefix in ['https://', 'http://']:
+            adapter = self.server.session.get_adapter(prefix)
+            self.assertEqual(adapter._pool_maxsize, 3)
+            self.assertEqual(adapter._pool_connections, 3)
+
+
 if __name__ == '__main__':
     unittest.main()
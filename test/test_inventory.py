@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import unittest
+from hstools import inventory
+
+
+class TestInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        for rel in ['a/b/c/deep.txt', 'a/one.txt', 'top.txt', 'z/two.txt']:
+            path = os.path.join(self.dir, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(rel)
+        os.symlink(os.path.join(self.dir, 'a'), os.path.join(self.dir, 'l'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_walk_matches_os_walk(self):
+        for jobs in [1, 4]:
+            ours = {l.rel: ([d.name for d in l.dirs],
+                            [f.name for f in l.files])
+                    for l in inventory.walk(self.dir, jobs=jobs)}
+            theirs = {}
+            for root, dirs, files in os.walk(self.dir):
+                rel = os.path.relpath(root, self.dir).replace(os.sep, '/')
+                theirs['' if rel == '.' else rel] = (sorted(dirs),
+                                                     sorted(files))
+            self.assertEqual(ours, theirs)
+
+        rels = [l.rel for l in inventory.walk(self.dir, jobs=4)]
+        self.assertEqual(rels, ['', 'a', 'a/b', 'a/b/c', 'z'])
+
+    def test_depth(self):
+        listings = list(inventory.walk(self.dir, depth=1))
+        self.assertEqual([l.rel for l in listings], ['', 'a', 'z'])
+        self.assertEqual(listings[0].dirs[1].target,
+                         os.path.join(self.dir, 'a'))
+        self.assertTrue(listings[0].dirs[1].is_link)
+
+    def test_sizes(self):
+        files = dict(inventory.iter_files(self.dir, jobs=2, sizes=True))
+        self.assertEqual(sorted(files), ['a/b/c/deep.txt', 'a/one.txt',
+                                         'top.txt', 'z/two.txt'])
+        self.assertEqual(files['top.txt'].size, len('top.txt'))
+        self.assertEqual(inventory.total_size(self.dir),
+                         (4, sum(len(r) for r in files)))
+
+    def test_linked_file_sizes(self):
+        os.symlink(os.path.join(self.dir, 'a', 'b', 'c', 'deep.txt'),
+                   os.path.join(self.dir, 'link.txt'))
+        os.symlink(os.path.join(self.dir, 'missing.txt'),
+                   os.path.join(self.dir, 'broken.txt'))
+
+        # linked files have the size of the file they point to
+        files = dict(inventory.iter_files(self.dir, sizes=True))
+        self.assertEqual(files['link.txt'].size, len('a/b/c/deep.txt'))
+        self.assertNotIn('broken.txt', files)
+
+
+if __name__ == '__main__':
+    unittest.main()
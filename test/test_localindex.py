@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from hstools import localindex
+from test import fakes
+
+RES_A = 'a' * 32
+RES_B = 'b' * 32
+
+
+class TestResourceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.dir, 'downloads')
+        self.index_path = os.path.join(self.dir, 'index.json')
+        self.make_resource(os.path.join('project', RES_A, RES_A),
+                           ['x.csv', 'y.ipynb'])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def make_resource(self, rel, names):
+        contents = os.path.join(self.root, rel, 'data', 'contents')
+        os.makedirs(contents)
+        for name in names:
+            with open(os.path.join(contents, name), 'w') as f:
+                f.write(name)
+
+    def index(self):
+        return localindex.ResourceIndex(self.root, path=self.index_path)
+
+    def test_find_and_content(self):
+        idx = self.index()
+        resdir = os.path.join(self.root, 'project', RES_A)
+        self.assertEqual(idx.find(RES_A), resdir)
+        self.assertEqual(sorted(idx.content(RES_A)), ['x.csv', 'y.ipynb'])
+        self.assertIsNone(idx.find(RES_B))
+
+        # the index is persisted and reloaded
+        idx = self.index()
+        self.assertIn(RES_A, idx.resources)
+        self.assertEqual(idx.find(RES_A), resdir)
+
+    def test_incremental_refresh(self):
+        idx = self.index()
+        idx.refresh()
+        self.make_resource(RES_B, ['z.txt'])
+        self.assertEqual(idx.content(RES_B),
+                         {'z.txt': os.path.join(self.root, RES_B, 'data',
+                                                'contents', 'z.txt')})
+
+        # changed content is listed again
+        contents = os.path.join(self.root, RES_B, 'data', 'contents')
+        os.remove(os.path.join(contents, 'z.txt'))
+        open(os.path.join(contents, 'w.txt'), 'w').close()
+        self.assertEqual(list(idx.content(RES_B)), ['w.txt'])
+
+        # removed resources are dropped on the next lookup
+        shutil.rmtree(os.path.join(self.root, 'project'))
+        self.assertIsNone(idx.find(RES_A))
+        self.assertNotIn(RES_A, idx.resources)
+
+    def test_add(self):
+        idx = self.index()
+        idx.refresh()
+        self.make_resource(RES_B, ['z.txt'])
+        idx.add(RES_B, os.path.join(self.root, RES_B))
+        self.assertEqual(list(idx.resources[RES_B]['files']), ['z.txt'])
+
+
+    def test_batch_save(self):
+        idx = self.index()
+        self.make_resource(RES_B, ['z.txt'])
+        idx.add(RES_B, os.path.join(self.root, RES_B), save=False)
+        self.assertFalse(os.path.exists(self.index_path))
+        idx.flush()
+        self.assertIn(RES_B, self.index().resources)
+
+    def test_corrupt_index(self):
+        with open(self.index_path, 'w') as f:
+            f.write('[1, 2]')
+        idx = self.index()
+        self.assertEqual(idx.resources, {})
+        self.assertEqual(idx.find(RES_A),
+                         os.path.join(self.root, 'project', RES_A))
+
+    def test_index_errors_do_not_fail_downloads(self):
+        hs = fakes.hydroshare(None, self.root)
+        with mock.patch.object(localindex, 'index_for',
+                               side_effect=PermissionError('read-only')):
+            hs._indexResource(RES_A, os.path.join(self.root, RES_A))
+            hs._saveIndex()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import io
+import time
+import threading
+import unittest
+import contextlib
+from hstools.funcs import ls
+
+
+class FakeHydroShare(object):
+    """
+    stands in for hstools.hydroshare.hydroshare, later resources are
+    faster to look up so that lookups finish out of order
+    """
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def setConnectionPoolSize(self, size):
+        pass
+
+    def getResourceFiles(self, resid, cached=False):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(.01 * (len(self.sizes) - list(self.sizes).index(resid)))
+        with self.lock:
+            self.active -= 1
+        if self.sizes[resid] is None:
+            raise Exception('not found')
+        return [{'size': str(s)} for s in self.sizes[resid]]
+
+
+class TestListSizes(unittest.TestCase):
+
+    def test_sizes_in_listing_order(self):
+        sizes = {f'res{i}': [1024 * i, 512] for i in range(12)}
+        sizes['res3'] = None
+        sizes['res5'] = []
+        hs = FakeHydroShare(sizes)
+        resources = [{'resource_id': resid, 'resource_title': resid}
+                     for resid in sizes]
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            ls.print_resources_with_size(hs, iter(resources), jobs=4)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[1] for line in lines], list(sizes))
+        self.assertIn('res0 [512 B]', lines[0])
+        self.assertIn('res2 [2.5 KB]', lines[2])
+        self.assertIn('res3 [ERROR]', lines[3])
+        self.assertIn('res5 [?]', lines[5])
+        self.assertGreater(hs.peak, 1)
+        self.assertLessEqual(hs.peak, 4)
+
+    def test_humansize(self):
+        self.assertEqual(ls.humansize(512), '512 B')
+        self.assertEqual(ls.humansize(1536), '1.5 KB')
+        self.assertEqual(ls.humansize(3 * 1024 ** 3), '3 GB')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from hstools import metacache
+from test import fakes
+
+
+class FakeListingClient(object):
+    """
+    serves a paginated resource listing
+    """
+
+    url_base = 'https://www.hydroshare.org/hsapi'
+
+    def __init__(self, count):
+        self.resources = [{'resource_id': str(i), 'date_last_updated': 'd'}
+                          for i in range(count)]
+
+    def _request(self, method, url, params=None):
+        size, page = params['count'], params['page']
+        results = self.resources[(page - 1) * size:page * size]
+        more = page * size < len(self.resources)
+        return fakes.FakeResponse(200, data={'count': len(self.resources),
+                                  'next': f'{url}?page={page + 1}'
+                                          if more else None,
+                                  'results': results})
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.mc = metacache.MetadataCache(os.path.join(self.dir, 'm.sqlite'))
+
+    def tearDown(self):
+        self.mc.close()
+        shutil.rmtree(self.dir)
+
+    def test_documents_follow_modified_date(self):
+        self.mc.set_modified('abc', '2020-01-01')
+        self.mc.put('abc', metacache.FILES, '2020-01-01', [{'size': 1}])
+        self.assertEqual(self.mc.get('abc', metacache.FILES, '2020-01-01'),
+                         [{'size': 1}])
+        self.assertIsNone(self.mc.get('abc', metacache.FILES, '2020-02-01'))
+
+        # a newer modified date drops the stale documents
+        self.mc.set_modified('abc', '2020-02-01')
+        self.assertIsNone(self.mc.get('abc', metacache.FILES))
+        self.assertEqual(self.mc.modified('abc'), '2020-02-01')
+        self.assertIsNone(self.mc.modified('abc', max_age=-1))
+
+        self.mc.remove('abc')
+        self.assertIsNone(self.mc.modified('abc'))
+
+    def test_listing(self):
+        filters = {'owner': 'me'}
+        resources = [{'resource_id': str(i), 'date_last_updated': 'd'}
+                     for i in range(5)]
+        for r in resources:
+            self.mc.set_modified(r['resource_id'], 'd', listing=r)
+
+        self.mc.put_listing(filters, ['0', '1', '2'], complete=False)
+        self.assertEqual(self.mc.get_listing(filters, 2), resources[:2])
+        self.assertIsNone(self.mc.get_listing(filters, 4))
+
+        self.mc.put_listing(filters, [r['resource_id'] for r in resources])
+        self.assertEqual(self.mc.get_listing(filters), resources)
+        self.assertIsNone(self.mc.get_listing({'owner': 'you'}))
+
+        # modified dates from other calls keep the listing
+        self.mc.set_modified('0', 'd')
+        self.assertEqual(self.mc.get_listing(filters), resources)
+
+    def test_listing_pages(self):
+        filters = {'owner': 'me'}
+        self.mc.put_listing(filters, ['old'])
+
+        # ids are added page by page, the listing is used once finished
+        self.mc.start_listing(filters)
+        self.assertIsNone(self.mc.get_listing(filters))
+        resources = [{'resource_id': str(i), 'date_last_updated': 'd'}
+                     for i in range(4)]
+        for r in resources:
+            self.mc.set_modified(r['resource_id'], 'd', listing=r)
+        self.mc.add_to_listing(filters, 0, ['0', '1'])
+        self.mc.add_to_listing(filters, 2, ['2', '3'])
+        self.assertIsNone(self.mc.get_listing(filters))
+        self.mc.finish_listing(filters)
+        self.assertEqual(self.mc.get_listing(filters), resources)
+        self.assertEqual(self.mc.get_listing(filters, 3), resources[:3])
+
+    def test_iter_resources(self):
+        hs = fakes.hydroshare(FakeListingClient(25))
+        filters = {'owner': 'me'}
+
+        with mock.patch('hstools.metacache.shared', return_value=self.mc):
+            listed = list(hs.iterResources(filters, page_size=10))
+            self.assertEqual(listed, hs.hs.resources)
+            self.assertEqual(self.mc.get_listing(filters), listed)
+
+            # a truncated listing is only used for as many resources
+            listed = list(hs.iterResources(filters, count=12,
+                                           page_size=10))
+            self.assertEqual(listed, hs.hs.resources[:12])
+            self.assertEqual(self.mc.get_listing(filters, 12), listed)
+            self.assertIsNone(self.mc.get_listing(filters, 13))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import time
+import itertools
+import threading
+import unittest
+from urllib.parse import urlparse, parse_qs
+from hstools import paging
+from test import fakes
+
+
+class FakeListing(object):
+    """
+    serves the paginated file listing of a resource, with next links
+    like the HydroShare api
+    """
+
+    url_base = 'https://www.hydroshare.org/hsapi'
+    use_https = True
+
+    def __init__(self, resid, count, page_size=10, delay=.02):
+        self.url = f'{self.url_base}/resource/{resid}/files/'
+        self.count = count
+        self.page_size = page_size
+        self.delay = delay
+        self.pages = []
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def _request(self, method, url, params=None):
+        params = dict(params or {})
+        query = parse_qs(urlparse(url).query)
+        params.update({k: v[0] for k, v in query.items()})
+        url = url.split('?')[0]
+        if url != self.url:
+            return fakes.FakeResponse(404)
+
+        page = int(params.get('page', 1))
+        with self.lock:
+            self.pages.append(page)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+
+        start = (page - 1) * self.page_size
+        stop = min(start + self.page_size, self.count)
+        nxt = None
+        if stop < self.count:
+            # the api returns http links behind its proxy
+            nxt = f'{self.url}?page={page + 1}'.replace('https', 'http', 1)
+        return fakes.FakeResponse(200, data={'count': self.count,
+                                  'next': nxt,
+                                  'results': [{'url': f'file{i}'}
+                                              for i in range(start, stop)]})
+
+
+class TestPageSize(unittest.TestCase):
+
+    def test_grows_on_aligned_offsets(self):
+        sizer = paging.AdaptivePageSize(25, maximum=100)
+
+        # 25 is not a multiple of 50, so the size cannot change yet
+        sizer.observe(25, 0.01)
+        self.assertEqual(sizer.size, 25)
+
+        sizer.observe(50, 0.01)
+        self.assertEqual(sizer.size, 50)
+        self.assertEqual(sizer.page(50), (2, 50))
+
+        sizer.observe(100, 0.01)
+        self.assertEqual(sizer.size, 100)
+
+        # never above the maximum
+        sizer.observe(200, 0.01)
+        self.assertEqual(sizer.size, 100)
+
+    def test_shrinks_when_slow(self):
+        sizer = paging.AdaptivePageSize(40, minimum=10, maximum=100)
+        sizer.observe(40, 5)
+        self.assertEqual(sizer.size, 20)
+        sizer.observe(60, 5)
+        self.assertEqual(sizer.size, 10)
+        sizer.observe(70, 5)
+        self.assertEqual(sizer.size, 10)
+
+    def test_limit(self):
+        sizer = paging.AdaptivePageSize(100, maximum=200)
+        sizer.limit(100, 40)
+        self.assertEqual(sizer.size, 20)
+        self.assertEqual(sizer.page(100), (6, 20))
+        sizer.observe(120, 0.01)
+        self.assertEqual(sizer.size, 40)
+        sizer.observe(160, 0.01)
+        self.assertEqual(sizer.size, 40)
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def test_order_and_bound(self):
+        fetched = []
+
+        def pages():
+            for i in range(10):
+                fetched.append(i)
+                yield [i]
+
+        it = paging.prefetch(pages(), depth=2)
+        self.assertEqual(next(it), [0])
+        time.sleep(.2)
+
+        # one page with the caller, two buffered, one waiting to be put
+        self.assertLessEqual(len(fetched), 4)
+        self.assertEqual(list(it), [[i] for i in range(1, 10)])
+
+    def test_errors_are_raised(self):
+
+        def pages():
+            yield [1]
+            raise ValueError('page failed')
+
+        it = paging.prefetch(pages(), depth=2)
+        self.assertEqual(next(it), [1])
+        with self.assertRaises(ValueError):
+            next(it)
+
+
+class TestResourceFiles(unittest.TestCase):
+    resid = 'a' * 32
+
+    def names(self, count):
+        return [f'file{i}' for i in range(count)]
+
+    def test_follows_next_links(self):
+        client = FakeListing(self.resid, 45)
+        hs = fakes.hydroshare(client)
+        files = [f['url'] for f in hs.iterResourceFiles(self.resid)]
+        self.assertEqual(files, self.names(45))
+        self.assertEqual(client.pages, [1, 2, 3, 4, 5])
+        self.assertEqual(client.peak, 1)
+
+    def test_concurrent_pages(self):
+        client = FakeListing(self.resid, 95)
+        hs = fakes.hydroshare(client)
+        files = [f['url'] for f in hs.iterResourceFiles(self.resid,
+                                                        max_workers=4)]
+
+        # pages are fetched at once but yielded in order
+        self.assertEqual(files, self.names(95))
+        self.assertEqual(sorted(client.pages), list(range(1, 11)))
+        self.assertGreater(client.peak, 1)
+        self.assertLessEqual(client.peak, 4)
+
+    def test_single_page(self):
+        client = FakeListing(self.resid, 7)
+        hs = fakes.hydroshare(client)
+        files = [f['url'] for f in hs.iterResourceFiles(self.resid,
+                                                        max_workers=4)]
+        self.assertEqual(files, self.names(7))
+        self.assertEqual(client.pages, [1])
+
+    def test_stops_early(self):
+        client = FakeListing(self.resid, 1000)
+        hs = fakes.hydroshare(client)
+        it = hs.iterResourceFiles(self.resid, max_workers=2)
+        files = [f['url'] for f in itertools.islice(it, 15)]
+        it.close()
+        self.assertEqual(files, self.names(15))
+
+        # queued pages are cancelled
+        time.sleep(.1)
+        self.assertLessEqual(len(client.pages), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import io
+import logging
+import unittest
+import threading
+from hstools import progress
+
+
+class TestTransferProgress(unittest.TestCase):
+
+    def test_batch_output(self):
+        out = io.StringIO()
+        p = progress.TransferProgress(out=out, interval=0, tty=False)
+
+        def work(i):
+            with p.transfer(f'file{i}', 1000) as t:
+                for _ in range(10):
+                    t.update(100)
+
+        threads = [threading.Thread(target=work, args=(i,))
+                   for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        p.close()
+
+        lines = out.getvalue().splitlines()
+        self.assertTrue(all(l.startswith('progress: ') for l in lines))
+        self.assertIn('4/4 transfer(s), 3.9KiB/3.9KiB (100%)', lines[-2])
+        self.assertIn('4 transfer(s), 3.9KiB in', lines[-1])
+
+        # nothing is drawn after the progress is closed
+        p.transfer('late', 1).update(1)
+        self.assertEqual(out.getvalue().splitlines(), lines)
+
+    def test_resumed_and_failed(self):
+        out = io.StringIO()
+        p = progress.TransferProgress(out=out, interval=3600, tty=False)
+        t = p.transfer('a', 100, done=60)
+        t.set(100)
+        t.finish()
+        p.transfer('b').finish(Exception('failed'))
+        self.assertEqual(p._totals(), (40, 40))
+        self.assertEqual(p.failed, 1)
+        self.assertEqual(out.getvalue(), '')
+
+    def test_terminal_redraw(self):
+        out = io.StringIO()
+        p = progress.TransferProgress(out=out, interval=0, tty=True)
+        t = p.transfer('a', 100)
+        t.update(50)
+        p.write('message\n')
+        t.finish()
+        p.close()
+
+        text = out.getvalue()
+        self.assertIn('\x1b[2F\x1b[Jmessage\n', text)
+        self.assertIn('+ a: 50.0B in', text)
+        self.assertIn('\x1b[J1 transfer(s), 50.0B in 0s (',
+                      text.splitlines()[-1])
+
+    def test_logging_handler(self):
+
+        class Terminal(io.StringIO):
+            def isatty(self):
+                return True
+
+        stream = Terminal()
+        handler = logging.StreamHandler(stream)
+        p = progress.TransferProgress(out=io.StringIO(), tty=True,
+                                      handler=handler)
+        self.assertIs(handler.stream, p)
+        p.close()
+        self.assertIs(handler.stream, stream)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import time
+import calendar
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib3
+import requests
+from hstools import retry, download
+
+
+def response(status, headers={}, body=b''):
+    r = requests.Response()
+    r.status_code = status
+    r.headers.update(headers)
+    r.raw = io.BytesIO(body)
+    return r
+
+
+class FakeClient(object):
+    """
+    stands in for hs_restclient.HydroShare, replaying a list of responses
+    and exceptions
+    """
+
+    url_base = 'https://www.hydroshare.org/hsapi'
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = []
+
+    def _request(self, method, url, params=None, data=None, headers=None,
+                 stream=False):
+        self.calls.append((method, url, headers))
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        if callable(result):
+            return result(headers)
+        return result
+
+
+class TestRetry(unittest.TestCase):
+
+    url = 'https://www.hydroshare.org/hsapi/resource/abc/'
+
+    def setUp(self):
+        self.delays = []
+        self.now = 0
+        self.policy = retry.RetryPolicy(retries=3, backoff=1, threshold=0,
+                                        sleep=self.sleep,
+                                        clock=lambda: self.now)
+
+    def sleep(self, seconds):
+        self.delays.append(seconds)
+        self.now += seconds
+
+    def client(self, results):
+        return retry.install(FakeClient(results), self.policy)
+
+    def test_retries_transient_failures(self):
+        hs = self.client([response(503),
+                          requests.ConnectionError('reset'),
+                          response(200)])
+        self.assertEqual(hs._request('GET', self.url).status_code, 200)
+        self.assertEqual(len(hs.calls), 3)
+
+        # exponential backoff with jitter
+        self.assertEqual(len(self.delays), 2)
+        self.assertTrue(.5 <= self.delays[0] <= 1)
+        self.assertTrue(1 <= self.delays[1] <= 2)
+
+        # installing twice does not retry twice
+        self.assertIs(retry.install(hs), hs)
+
+    def test_gives_up(self):
+        hs = self.client([response(500)] * 4)
+        self.assertEqual(hs._request('GET', self.url).status_code, 500)
+        self.assertEqual(len(hs.calls), 4)
+
+        hs = self.client([requests.ConnectionError('reset')] * 4)
+        with self.assertRaises(requests.ConnectionError):
+            hs._request('DELETE', self.url)
+
+        # other errors are not retried
+        hs = self.client([ValueError('bad'), response(200)])
+        with self.assertRaises(ValueError):
+            hs._request('GET', self.url)
+
+    def test_retry_after(self):
+        hs = self.client([response(429, {'Retry-After': '7'}),
+                          response(200)])
+        self.assertEqual(hs._request('GET', self.url).status_code, 200)
+        self.assertEqual(self.delays, [7])
+
+        r = response(503, {'Retry-After': 'Wed, 21 Oct 2015 07:28:10 GMT'})
+        now = calendar.timegm((2015, 10, 21, 7, 28, 0))
+        self.assertEqual(retry.retry_after(r, now=now), 10)
+        self.assertIsNone(retry.retry_after(response(503)))
+
+    def test_only_safe_requests(self):
+        # the server may have processed the request
+        hs = self.client([response(500), response(200)])
+        self.assertEqual(hs._request('POST', self.url, data={'a': 1})
+                         .status_code, 500)
+
+        # rate limited requests were not processed
+        hs = self.client([response(429), response(201)])
+        self.assertEqual(hs._request('POST', self.url, data={'a': 1})
+                         .status_code, 201)
+
+        # unless the body was streamed
+        hs = self.client([response(429), response(201)])
+        self.assertEqual(hs._request('POST', self.url,
+                                     data=io.BytesIO(b'file')).status_code,
+                         429)
+
+        hs = self.client([requests.ConnectionError('reset'), response(201)])
+        with self.assertRaises(requests.ConnectionError):
+            hs._request('POST', self.url)
+
+        # requests that failed while connecting were never sent
+        refused = urllib3.exceptions.NewConnectionError(
+                None, 'Connection refused')
+        hs = self.client([requests.ConnectionError(
+                              urllib3.exceptions.MaxRetryError(
+                                  None, self.url, refused)),
+                          requests.exceptions.ConnectTimeout('timeout'),
+                          response(201)])
+        self.assertEqual(hs._request('POST', self.url,
+                                     data=io.BytesIO(b'file')).status_code,
+                         201)
+        self.assertEqual(len(hs.calls), 3)
+
+    def test_circuit_breaker(self):
+        breaker = retry.CircuitBreaker(threshold=2, cooldown=.05)
+        self.assertFalse(breaker.acquire())
+        breaker.failure()
+        breaker.failure()
+        self.assertTrue(breaker.is_open)
+
+        # one request probes the server once the cooldown passed, the
+        # others wait for its result
+        st = time.time()
+        self.assertTrue(breaker.acquire())
+        self.assertGreaterEqual(time.time() - st, .04)
+
+        acquired = []
+        waiter = threading.Thread(
+                target=lambda: acquired.append(breaker.acquire()))
+        waiter.start()
+        time.sleep(.05)
+        self.assertEqual(acquired, [])
+
+        breaker.success(probe=True)
+        waiter.join(1)
+        self.assertEqual(acquired, [False])
+        self.assertFalse(breaker.is_open)
+
+    def test_resume_interrupted_download(self):
+        body = b'x' * (3 * download.CHUNK_SIZE)
+
+        def interrupted(headers):
+            # sends one chunk, then the connection is reset
+            r = response(200, {'Content-Length': str(len(body)),
+                               'ETag': '"v1"'})
+
+            def chunks(size):
+                yield body[:size]
+                raise requests.exceptions.ChunkedEncodingError('reset')
+            r.iter_content = chunks
+            return r
+
+        def resumed(headers):
+            start = int(headers['Range'][len('bytes='):-1])
+            return response(206, {'Content-Length': str(len(body) - start),
+                                  'Content-Range': f'bytes {start}-'
+                                                   f'{len(body) - 1}/'
+                                                   f'{len(body)}',
+                                  'ETag': '"v1"'}, body[start:])
+
+        d = tempfile.mkdtemp()
+        try:
+            hs = self.client([interrupted, resumed])
+            path = os.path.join(d, 'file.txt')
+            download.download(hs, f'{self.url}file.txt', path)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), body)
+            self.assertEqual(hs.calls[1][2]['Range'],
+                             f'bytes={download.CHUNK_SIZE}-')
+            self.assertEqual(len(self.delays), 1)
+        finally:
+            shutil.rmtree(d)
+
+
+if __name__ == '__main__':
+    unittest.main()
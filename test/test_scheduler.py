@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+import unittest
+from hstools import scheduler
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.s = scheduler.Scheduler({scheduler.TRANSFER: 2,
+                                      scheduler.METADATA: 3})
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+
+    def tearDown(self):
+        self.s.shutdown()
+
+    def work(self, kind, delay=.02):
+        with self.lock:
+            self.active[kind] = self.active.get(kind, 0) + 1
+            self.peak[kind] = max(self.peak.get(kind, 0), self.active[kind])
+        time.sleep(delay)
+        with self.lock:
+            self.active[kind] -= 1
+        return kind
+
+    def test_limits(self):
+        futures = [self.s.submit(self.work, (k,), kind=k)
+                   for k in [scheduler.TRANSFER] * 6 +
+                   [scheduler.METADATA] * 6]
+        self.assertEqual([f.result() for f in futures][-1],
+                         scheduler.METADATA)
+        self.assertEqual(self.peak, {scheduler.TRANSFER: 2,
+                                     scheduler.METADATA: 3})
+
+        with self.assertRaises(ValueError):
+            self.s.submit(self.work, ('x',), kind='unknown')
+
+    def test_exceptions(self):
+        future = self.s.submit(lambda: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            future.result()
+
+    def test_priority_and_deadline(self):
+        order = []
+        blockers = [self.s.submit(self.work, ('block', .1),
+                                  kind=scheduler.TRANSFER)
+                    for _ in range(2)]
+        while self.active.get('block', 0) < 2:
+            time.sleep(.001)
+        late = self.s.submit(order.append, (-1,), kind=scheduler.TRANSFER,
+                             timeout=.01)
+        for p in range(4):
+            self.s.submit(order.append, (p,), kind=scheduler.TRANSFER,
+                          priority=p)
+        for f in blockers:
+            f.result()
+        with self.assertRaises(scheduler.TimeoutError):
+            late.result()
+        time.sleep(.05)
+        self.assertEqual(order, [3, 2, 1, 0])
+
+    def test_group(self):
+        group = self.s.group(scheduler.METADATA, limit=2)
+        with group:
+            for _ in range(6):
+                group.submit(self.work, 'group')
+        self.assertTrue(all(f.done() for f in group.futures))
+        self.assertEqual(self.peak['group'], 2)
+
+        # a group above the cap of its kind raises the cap
+        self.s.group(scheduler.TRANSFER, limit=5)
+        self.assertEqual(self.s.limits[scheduler.TRANSFER], 5)
+
+    def test_group_cancel(self):
+        group = self.s.group(scheduler.TRANSFER, limit=1)
+        with self.assertRaises(KeyError):
+            with group:
+                first = group.submit(self.work, 'cancel', .05)
+                time.sleep(.01)
+                rest = [group.submit(self.work, 'cancel')
+                        for _ in range(4)]
+                raise KeyError()
+        self.assertTrue(all(f.cancelled() for f in rest))
+
+        # leaving the block waits for the task that was running
+        self.assertEqual(self.active.get('cancel', 0), 0)
+        self.assertLessEqual(self.peak.get('cancel', 0), 1)
+        self.assertTrue(first.done())
+
+    def test_nested(self):
+
+        def parent(i):
+            group = self.s.group(scheduler.METADATA, limit=2)
+            with group:
+                for _ in range(3):
+                    group.submit(self.work, 'child', .001)
+            return i
+
+        futures = [self.s.submit(parent, (i,)) for i in range(20)]
+        self.assertEqual(sum(f.result(timeout=10) for f in futures), 190)
+
+    def test_reserve_and_release(self):
+        self.s.reserve(scheduler.TRANSFER, 6)
+        self.s.reserve(scheduler.TRANSFER, 4)
+        self.assertEqual(self.s.limits[scheduler.TRANSFER], 6)
+
+        futures = [self.s.submit(self.work, (scheduler.TRANSFER,),
+                                 kind=scheduler.TRANSFER)
+                   for _ in range(12)]
+        [f.result() for f in futures]
+        self.assertEqual(self.peak[scheduler.TRANSFER], 6)
+
+        # the cap drops back to the remaining reservation, then the
+        # default
+        self.s.release(scheduler.TRANSFER, 6)
+        self.assertEqual(self.s.limits[scheduler.TRANSFER], 4)
+        self.s.release(scheduler.TRANSFER, 4)
+        self.assertEqual(self.s.limits[scheduler.TRANSFER], 2)
+        self.s.release(scheduler.TRANSFER, 4)
+        self.assertEqual(self.s.limits[scheduler.TRANSFER], 2)
+
+    def test_task_options_are_not_arguments(self):
+
+        def call(timeout=None, kind=None, priority=None):
+            return timeout, kind, priority
+
+        future = self.s.submit(call, kwargs={'timeout': 1, 'kind': 'x',
+                                             'priority': 2},
+                               kind=scheduler.METADATA, timeout=5)
+        self.assertEqual(future.result(), (1, 'x', 2))
+
+        with self.s.group(scheduler.METADATA, limit=1, timeout=5) as group:
+            futures = [group.submit(call, timeout=1),
+                       group.submit(call, kind='x', priority=2)]
+        self.assertEqual([f.result() for f in futures],
+                         [(1, None, None), (None, 'x', 2)])
+
+    def test_processes(self):
+        futures = [self.s.submit(pow, (2, i), kind=scheduler.CPU)
+                   for i in range(4)]
+        self.assertEqual([f.result() for f in futures], [1, 2, 4, 8])
+
+
+if __name__ == '__main__':
+    unittest.main()
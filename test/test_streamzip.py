@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import shutil
+import zipfile
+import tempfile
+import unittest
+from hstools import streamzip
+
+
+class Unseekable(io.RawIOBase):
+    """
+    forces zipfile to write data descriptors, as it does for
+    archives that are streamed over http
+    """
+
+    def __init__(self):
+        self.buf = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        return self.buf.write(b)
+
+
+class TestStreamZip(unittest.TestCase):
+    files = {'abc/bagit.txt': b'BagIt-Version: 0.96',
+             'abc/data/contents/a.csv': b'x,y\n1,2\n' * 1000,
+             'abc/data/contents/sub/b.csv': b'',
+             'abc/data/contents/c.txt': os.urandom(50000)}
+
+    def setUp(self):
+        self.dst = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dst)
+
+    def make_zip(self, compression, seekable=True):
+        f = io.BytesIO() if seekable else Unseekable()
+        with zipfile.ZipFile(f, 'w', compression=compression) as z:
+            z.writestr('abc/data/', b'')
+            for name, data in self.files.items():
+                z.writestr(name, data)
+        return f.getvalue() if seekable else f.buf.getvalue()
+
+    def chunks(self, data, size):
+        return [data[i:i+size] for i in range(0, len(data), size)]
+
+    def assert_extracted(self, names):
+        for name in names:
+            with open(os.path.join(self.dst, name), 'rb') as f:
+                self.assertEqual(f.read(), self.files[name])
+
+    def test_extract_deflated(self):
+        data = self.make_zip(zipfile.ZIP_DEFLATED)
+        paths = streamzip.extract(self.chunks(data, 7), self.dst)
+        self.assertEqual(len(paths), len(self.files))
+        self.assert_extracted(self.files.keys())
+
+    def test_extract_stored(self):
+        data = self.make_zip(zipfile.ZIP_STORED)
+        streamzip.extract(self.chunks(data, 4096), self.dst)
+        self.assert_extracted(self.files.keys())
+
+    def test_extract_data_descriptors(self):
+        data = self.make_zip(zipfile.ZIP_DEFLATED, seekable=False)
+        streamzip.extract(self.chunks(data, 1000), self.dst)
+        self.assert_extracted(self.files.keys())
+
+    def test_extract_members(self):
+        data = self.make_zip(zipfile.ZIP_DEFLATED)
+        paths = streamzip.extract([data], self.dst, members=['*.csv'])
+        self.assertEqual(len(paths), 2)
+        self.assert_extracted(['abc/data/contents/a.csv',
+                               'abc/data/contents/sub/b.csv'])
+        self.assertFalse(os.path.exists(os.path.join(self.dst,
+                                                     'abc/bagit.txt')))
+
+    def test_bad_crc(self):
+        data = bytearray(self.make_zip(zipfile.ZIP_STORED))
+        offset = data.index(b'BagIt-Version')
+        data[offset] = ord('b')
+        with self.assertRaises(zipfile.BadZipFile):
+            streamzip.extract([bytes(data)], self.dst)
+        self.assertEqual(os.listdir(os.path.join(self.dst, 'abc')), ['data'])
+
+    def test_truncated(self):
+        data = self.make_zip(zipfile.ZIP_DEFLATED)
+        with self.assertRaises(zipfile.BadZipFile):
+            streamzip.extract([data[:len(data) // 2]], self.dst)
+
+
+if __name__ == '__main__':
+    unittest.main()
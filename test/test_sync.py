@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import hashlib
+import tempfile
+import unittest
+from hstools.funcs import sync
+
+
+class TestSyncPlan(unittest.TestCase):
+    files = {'same.txt': b'same',
+             'changed.txt': b'local',
+             'resized.txt': b'longer',
+             'nochecksum.txt': b'abc',
+             'sub/new.txt': b'new'}
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        for name, data in self.files.items():
+            path = os.path.join(self.dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_plan(self):
+        md5 = lambda b: hashlib.md5(b).hexdigest()
+        remote = {'same.txt': (4, md5(b'same')),
+                  'changed.txt': (5, md5(b'other')),
+                  'resized.txt': (3, md5(b'old')),
+                  'nochecksum.txt': (3, None),
+                  'orphan.txt': (1, md5(b'x'))}
+
+        local = sync.local_files(self.dir)
+        self.assertEqual(sorted(local), sorted(self.files))
+
+        plan = sync.SyncPlan(local, remote, hash_jobs=2)
+        self.assertEqual(plan.new, ['sub/new.txt'])
+        self.assertEqual(sorted(plan.changed), ['changed.txt', 'resized.txt'])
+        self.assertEqual(sorted(plan.unchanged),
+                         ['nochecksum.txt', 'same.txt'])
+        self.assertEqual(plan.orphans, ['orphan.txt'])
+        self.assertEqual([tar for src, tar in plan.uploads(local)],
+                         ['changed.txt', 'resized.txt', 'sub/new.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import hashlib
+import tempfile
+import unittest
+import requests
+from hstools import bagit, cli
+from test import fakes
+
+
+class FakeClient(object):
+    """
+    serves the file listing, files and metadata documents of one resource
+    """
+
+    url_base = 'https://www.hydroshare.org/hsapi'
+    use_https = True
+
+    def __init__(self, resid, files, documents):
+        self.resid = resid
+        self.files = files
+        self.documents = documents
+        self.session = requests.Session()
+
+    def _request(self, method, url, params=None, headers=None, stream=False):
+        base = f'{self.url_base}/resource/{self.resid}/files/'
+        if url == base:
+            results = [{'url': f'{base}data/contents/{name}',
+                        'size': len(data),
+                        'checksum': hashlib.md5(data).hexdigest()}
+                       for name, data in self.files.items()]
+            return fakes.FakeResponse(200, data={'count': len(results),
+                                           'next': None,
+                                           'results': results})
+        if url.startswith(base):
+            return fakes.FakeResponse(200, self.files[url[len(base):]])
+        if url in self.documents:
+            return fakes.FakeResponse(200, self.documents[url])
+        return fakes.FakeResponse(404)
+
+
+class TestUpdateResource(unittest.TestCase):
+    resid = 'a' * 32
+
+    def setUp(self):
+        self.d = tempfile.mkdtemp()
+        fakes.use_cache_dir(self, os.path.join(self.d, 'cache'))
+        self.bagdir = os.path.join(self.d, self.resid)
+
+        # a downloaded bag, with one stale file and one changed file
+        for rel, data in [('data/contents/a.txt', b'old'),
+                          ('data/contents/stale.txt', b'stale'),
+                          ('data/resourcemetadata.xml', b'<old/>'),
+                          ('data/resourcemap.xml', b'<old/>'),
+                          ('bag-info.txt', b'Bagging-Date: 2020-01-01\n')]:
+            path = os.path.join(self.bagdir, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+        bagit.update_manifests(self.bagdir, ['data/contents/a.txt',
+                                             'data/contents/stale.txt',
+                                             'data/resourcemetadata.xml',
+                                             'data/resourcemap.xml'])
+        bagit.write_manifest(bagit.manifest_path(self.bagdir, tag=True),
+                             {'bag-info.txt': None})
+        bagit.update_tag_manifests(self.bagdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.d)
+
+    def test_update_rewrites_metadata_documents(self):
+        base = FakeClient.url_base
+        scimeta = '<?xml version="1.0" encoding="UTF-8"?>\n' \
+                  '<rdf:RDF>Río Grande</rdf:RDF>\n'.encode('utf-8')
+        resmap = b'<?xml version="1.0"?>\n<rdf:RDF/>\n'
+        client = FakeClient(self.resid,
+                            {'a.txt': b'new', 'b.txt': b'added'},
+                            {f'{base}/scimeta/{self.resid}/': scimeta,
+                             f'{base}/resource/{self.resid}/map/': resmap})
+
+        hs = fakes.hydroshare(client, self.d)
+        hs.updateResource(self.resid, max_workers=2)
+
+        def read(rel):
+            with open(os.path.join(self.bagdir, rel), 'rb') as f:
+                return f.read()
+
+        self.assertEqual(read('data/resourcemetadata.xml'), scimeta)
+        self.assertEqual(read('data/resourcemap.xml'), resmap)
+        self.assertEqual(read('data/contents/a.txt'), b'new')
+        self.assertEqual(read('data/contents/b.txt'), b'added')
+        self.assertFalse(os.path.exists(
+                os.path.join(self.bagdir, 'data/contents/stale.txt')))
+        self.assertTrue(bagit.verify_bag(self.bagdir)['valid'])
+
+
+class TestUpdateArguments(unittest.TestCase):
+
+    def check(self, argv):
+        parser = cli.build_parser(argv)
+        args = parser.parse_args(argv)
+        self.assertFalse(hasattr(args, 'parser'))
+        cli.check_arguments(parser, argv, args)
+
+    def test_bag_options_are_rejected(self):
+        self.check(['get', 'abc', '-u', '--verify'])
+        self.check(['get', 'abc', '-f', '--stream', '--include', '*.csv'])
+        for flags in [['-f'], ['--stream'], ['--include', '*.csv']]:
+            with self.assertRaises(SystemExit):
+                self.check(['get', 'abc', '-u'] + flags)
+
+
+if __name__ == '__main__':
+    unittest.main()